@@ -0,0 +1,232 @@
+"""
+Incremental aggregation of the admin dashboard KPIs
+
+The dashboard reads ``HourlyKpi`` / ``DailyKpi`` rows only. ``aggregate_kpis()``
+keeps them current without rescanning ``Trip`` or ``Booking``:
+
+1. Rows changed since the last run are found through a watermark per source
+   table. Trips and bookings use ``updated_at``, and negotiation events use
+   their append-only id. Each changed row marks the hours its timestamps fall
+   in as touched.
+2. Only the touched hours are recomputed, with one grouped query per metric
+   restricted to those hours, and written back with an upsert. Recomputing a
+   whole hour is idempotent, so re-reading rows in the overlap window or
+   running twice is harmless. Deleting a trip, booking or negotiation event
+   records its hours as ``KpiDirtyHour`` rows, which are folded in and
+   cleared here too.
+3. Each day that owns a touched hour is re-summed from its 24 hourly rows,
+   and its distinct active drivers and riders are recounted.
+
+Run it every minute with ``manage.py aggregate_kpis``. The first run backfills
+all history.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from lets_go.models import Booking, NegotiationEvent, Trip
+
+from .models import DailyKpi, HourlyKpi, KpiCounters, KpiDirtyHour, KpiWatermark
+
+# Changed rows are re-read this far behind the watermark, to catch
+# transactions that committed after a later timestamp was already seen
+WATERMARK_OVERLAP = timedelta(minutes=2)
+HOUR = timedelta(hours=1)
+SCAN_CHUNK_SIZE = 2000
+
+FLAG_ACTIONS = ('BLOCK', 'BLACKLIST')
+ACCEPT_ACTIONS = ('ACCEPT', 'PASSENGER_ACCEPT')
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """Start of the UTC hour containing an aware datetime"""
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bounds(day):
+    """Aware [start, end) of a local calendar day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _spans(hours):
+    """Merge sorted hour buckets into contiguous [start, end) spans"""
+    spans = []
+    for hour in sorted(hours):
+        if spans and spans[-1][1] == hour:
+            spans[-1][1] = hour + HOUR
+        else:
+            spans.append([hour, hour + HOUR])
+    return spans
+
+
+def _in_spans(field, spans):
+    q = Q()
+    for start, end in spans:
+        q |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return q
+
+
+def _watermark(source):
+    return KpiWatermark.objects.select_for_update().get_or_create(source=source)[0]
+
+
+def _touch(touched, *values):
+    for value in values:
+        if value is not None:
+            touched.add(hour_bucket(value))
+
+
+def _scan_updated(model, watermark, fields, touched):
+    """Touch the hours of rows updated since the watermark and advance it"""
+    rows = model.objects.all()
+    if watermark.last_seen_at is not None:
+        rows = rows.filter(updated_at__gt=watermark.last_seen_at - WATERMARK_OVERLAP)
+    newest = watermark.last_seen_at
+    for values in rows.values_list('updated_at', *fields).iterator(chunk_size=SCAN_CHUNK_SIZE):
+        _touch(touched, *values[1:])
+        if newest is None or values[0] > newest:
+            newest = values[0]
+    watermark.last_seen_at = newest
+
+
+def _scan_events(watermark, touched):
+    newest = watermark.last_seen_id
+    rows = NegotiationEvent.objects.filter(id__gt=watermark.last_seen_id).values_list('id', 'created_at')
+    for event_id, created_at in rows.iterator(chunk_size=SCAN_CHUNK_SIZE):
+        _touch(touched, created_at)
+        newest = max(newest, event_id)
+    watermark.last_seen_id = newest
+
+
+def _take_dirty_hours(touched):
+    """Touch the hours recorded by deletes and clear exactly those records"""
+    dirty = list(KpiDirtyHour.objects.values_list('id', 'bucket'))
+    _touch(touched, *(bucket for _, bucket in dirty))
+    if dirty:
+        KpiDirtyHour.objects.filter(id__in=[pk for pk, _ in dirty]).delete()
+
+
+def _grouped(queryset, field, spans, **aggregates):
+    """{hour: {name: value}} for rows of queryset whose field falls in spans"""
+    return {
+        row.pop('hour'): row
+        for row in queryset.filter(_in_spans(field, spans))
+        .annotate(hour=TruncHour(field, tzinfo=dt_timezone.utc))
+        .values('hour')
+        .annotate(**aggregates)
+    }
+
+
+def compute_hours(hours):
+    """Unsaved HourlyKpi rows recomputed from source tables for these hour buckets"""
+    spans = _spans(hours)
+    if not spans:
+        return []
+
+    requests = _grouped(Booking.objects, 'booked_at', spans, ride_requests=Count('id'))
+    safety = Q(bargaining_status='BLOCKED')
+    driver = ~safety & (Q(bargaining_status='REJECTED') | Q(trip__trip_status='CANCELLED'))
+    cancellations = _grouped(
+        Booking.objects.filter(booking_status='CANCELLED'), 'cancelled_at', spans,
+        booking_cancellations=Count('id'),
+        cancel_safety=Count('id', filter=safety),
+        cancel_driver=Count('id', filter=driver),
+        cancel_user=Count('id', filter=~safety & ~driver),
+    )
+    posted = _grouped(Trip.objects, 'created_at', spans, trips_posted=Count('id'))
+    completed = _grouped(Trip.objects.filter(trip_status='COMPLETED'), 'completed_at', spans, completed_trips=Count('id'))
+    cancelled = _grouped(Trip.objects.filter(trip_status='CANCELLED'), 'cancelled_at', spans, cancelled_trips=Count('id'))
+    accept = Q(action__in=ACCEPT_ACTIONS, booking__isnull=False)
+    events = _grouped(
+        NegotiationEvent.objects, 'created_at', spans,
+        flagged_incidents=Count('id', filter=Q(action__in=FLAG_ACTIONS)),
+        accepted_requests=Count('id', filter=accept),
+        wait=Sum(
+            ExpressionWrapper(F('created_at') - F('booking__booked_at'), output_field=DurationField()),
+            filter=accept,
+        ),
+    )
+
+    rows = []
+    for hour in sorted(hours):
+        counters = {}
+        for source in (requests, cancellations, posted, completed, cancelled, events):
+            counters.update(source.get(hour, {}))
+        wait = counters.pop('wait', None)
+        counters['wait_seconds_total'] = max(wait.total_seconds(), 0.0) if wait else 0.0
+        counters['cancel_other'] = max(
+            counters.get('booking_cancellations', 0)
+            - counters.get('cancel_user', 0) - counters.get('cancel_driver', 0) - counters.get('cancel_safety', 0),
+            0,
+        )
+        rows.append(HourlyKpi(bucket=hour, **counters))
+    return rows
+
+
+def compute_days(days):
+    """Unsaved DailyKpi rows summed from stored hourly rows, with distinct active users"""
+    rows = []
+    for day in sorted(days):
+        start, end = day_bounds(day)
+        totals = HourlyKpi.objects.filter(bucket__gte=start, bucket__lt=end).aggregate(
+            **{name: Sum(name) for name in KpiCounters.COUNTER_FIELDS}
+        )
+        drivers = set(
+            Trip.objects.filter(created_at__gte=start, created_at__lt=end).values_list('driver_id', flat=True).distinct()
+        )
+        riders = set(
+            Booking.objects.filter(booked_at__gte=start, booked_at__lt=end).values_list('passenger_id', flat=True).distinct()
+        )
+        rows.append(DailyKpi(
+            day=day,
+            active_drivers=len(drivers),
+            active_riders=len(riders),
+            active_users=len(drivers | riders),
+            **{name: value or 0 for name, value in totals.items()},
+        ))
+    return rows
+
+
+def _upsert(model, rows, unique_field):
+    if rows:
+        model.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=[unique_field],
+            update_fields=[
+                f.name for f in model._meta.concrete_fields if f.name not in ('id', unique_field)
+            ],
+        )
+
+
+def aggregate_kpis():
+    """Fold rows changed since the last run into the hourly and daily rollups.
+
+    Returns {'hours': n, 'days': n} recomputed.
+    """
+    with transaction.atomic():
+        trips_mark = _watermark('trips')
+        bookings_mark = _watermark('bookings')
+        events_mark = _watermark('negotiation_events')
+
+        touched = set()
+        _scan_updated(Trip, trips_mark, ('created_at', 'completed_at', 'cancelled_at'), touched)
+        _scan_updated(Booking, bookings_mark, ('booked_at', 'cancelled_at'), touched)
+        _scan_events(events_mark, touched)
+        _take_dirty_hours(touched)
+
+        _upsert(HourlyKpi, compute_hours(touched), 'bucket')
+        days = {timezone.localdate(hour) for hour in touched}
+        _upsert(DailyKpi, compute_days(days), 'day')
+
+        for mark in (trips_mark, bookings_mark, events_mark):
+            mark.save()
+    return {'hours': len(touched), 'days': len(days)}
+
+
+def last_aggregated_at():
+    return KpiWatermark.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from administration.kpi_rollups import aggregate_kpis
+
+
+class Command(BaseCommand):
+    help = "Fold trips, bookings and negotiation events changed since the last run into the dashboard KPI rollups (run every minute)"
+
+    def handle(self, *args, **options):
+        result = aggregate_kpis()
+        self.stdout.write(f"Recomputed {result['hours']} hourly and {result['days']} daily KPI buckets")
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ride_requests', models.PositiveIntegerField(default=0, help_text='Bookings requested')),
+                ('booking_cancellations', models.PositiveIntegerField(default=0)),
+                ('cancel_user', models.PositiveIntegerField(default=0, help_text='Cancelled or withdrawn by the passenger')),
+                ('cancel_driver', models.PositiveIntegerField(default=0, help_text='Rejected by the driver or trip cancelled')),
+                ('cancel_safety', models.PositiveIntegerField(default=0, help_text='Passenger blocked')),
+                ('cancel_other', models.PositiveIntegerField(default=0)),
+                ('trips_posted', models.PositiveIntegerField(default=0)),
+                ('completed_trips', models.PositiveIntegerField(default=0)),
+                ('cancelled_trips', models.PositiveIntegerField(default=0)),
+                ('flagged_incidents', models.PositiveIntegerField(default=0, help_text='Block and blacklist actions')),
+                ('accepted_requests', models.PositiveIntegerField(default=0, help_text='Accepts counted in the wait time')),
+                ('wait_seconds_total', models.FloatField(default=0, help_text='Request-to-accept time summed over accepts')),
+                ('day', models.DateField(unique=True)),
+                ('active_drivers', models.PositiveIntegerField(default=0, help_text='Drivers who posted a trip')),
+                ('active_riders', models.PositiveIntegerField(default=0, help_text='Passengers who requested a booking')),
+                ('active_users', models.PositiveIntegerField(default=0, help_text='Distinct drivers and riders')),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyKpi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ride_requests', models.PositiveIntegerField(default=0, help_text='Bookings requested')),
+                ('booking_cancellations', models.PositiveIntegerField(default=0)),
+                ('cancel_user', models.PositiveIntegerField(default=0, help_text='Cancelled or withdrawn by the passenger')),
+                ('cancel_driver', models.PositiveIntegerField(default=0, help_text='Rejected by the driver or trip cancelled')),
+                ('cancel_safety', models.PositiveIntegerField(default=0, help_text='Passenger blocked')),
+                ('cancel_other', models.PositiveIntegerField(default=0)),
+                ('trips_posted', models.PositiveIntegerField(default=0)),
+                ('completed_trips', models.PositiveIntegerField(default=0)),
+                ('cancelled_trips', models.PositiveIntegerField(default=0)),
+                ('flagged_incidents', models.PositiveIntegerField(default=0, help_text='Block and blacklist actions')),
+                ('accepted_requests', models.PositiveIntegerField(default=0, help_text='Accepts counted in the wait time')),
+                ('wait_seconds_total', models.FloatField(default=0, help_text='Request-to-accept time summed over accepts')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour (UTC)', unique=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.CreateModel(
+            name='KpiWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, help_text='Newest updated_at already aggregated', null=True)),
+                ('last_seen_id', models.BigIntegerField(default=0, help_text='Newest id already aggregated (append-only tables)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:10
+
+from django.db import migrations
+
+
+def reset_kpi_rollups(apps, schema_editor):
+    """Drop rollups that bucketed cancellations by updated_at; the next aggregate_kpis run rebuilds all history"""
+    for name in ('HourlyKpi', 'DailyKpi', 'KpiWatermark'):
+        apps.get_model('administration', name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0001_kpi_rollups'),
+        ('lets_go', '0025_booking_cancelled_at_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_kpi_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0002_rebuild_kpi_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiDirtyHour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour (UTC)')),
+            ],
+        ),
+    ]
@@ -1,3 +1,113 @@
+from datetime import timezone as dt_timezone
+
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 
 # Create your models here.
+
+
+class KpiWatermark(models.Model):
+    """How far the KPI aggregator has read each source table"""
+    source = models.CharField(max_length=50, unique=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True, help_text="Newest updated_at already aggregated")
+    last_seen_id = models.BigIntegerField(default=0, help_text="Newest id already aggregated (append-only tables)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ {self.last_seen_at or self.last_seen_id}"
+
+
+class KpiDirtyHour(models.Model):
+    """An hour whose source rows were deleted; the next aggregate_kpis run recomputes and clears it
+
+    Deletes never move a watermark, so without this the hour would keep
+    counting rows that no longer exist.
+    """
+    bucket = models.DateTimeField(help_text="Start of the hour (UTC)")
+
+    def __str__(self):
+        return f"Dirty KPI hour {self.bucket:%Y-%m-%d %H}:00"
+
+    @classmethod
+    def mark(cls, *values):
+        buckets = {
+            value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+            for value in values if value is not None
+        }
+        if buckets:
+            cls.objects.bulk_create([cls(bucket=bucket) for bucket in buckets])
+
+
+class KpiCounters(models.Model):
+    """Counters shared by the hourly and daily rollups"""
+    ride_requests = models.PositiveIntegerField(default=0, help_text="Bookings requested")
+    booking_cancellations = models.PositiveIntegerField(default=0)
+    cancel_user = models.PositiveIntegerField(default=0, help_text="Cancelled or withdrawn by the passenger")
+    cancel_driver = models.PositiveIntegerField(default=0, help_text="Rejected by the driver or trip cancelled")
+    cancel_safety = models.PositiveIntegerField(default=0, help_text="Passenger blocked")
+    cancel_other = models.PositiveIntegerField(default=0)
+    trips_posted = models.PositiveIntegerField(default=0)
+    completed_trips = models.PositiveIntegerField(default=0)
+    cancelled_trips = models.PositiveIntegerField(default=0)
+    flagged_incidents = models.PositiveIntegerField(default=0, help_text="Block and blacklist actions")
+    accepted_requests = models.PositiveIntegerField(default=0, help_text="Accepts counted in the wait time")
+    wait_seconds_total = models.FloatField(default=0, help_text="Request-to-accept time summed over accepts")
+
+    class Meta:
+        abstract = True
+
+    COUNTER_FIELDS = (
+        'ride_requests', 'booking_cancellations', 'cancel_user', 'cancel_driver', 'cancel_safety',
+        'cancel_other', 'trips_posted', 'completed_trips', 'cancelled_trips', 'flagged_incidents',
+        'accepted_requests', 'wait_seconds_total',
+    )
+
+    @property
+    def avg_wait_minutes(self):
+        if not self.accepted_requests:
+            return 0.0
+        return round(self.wait_seconds_total / self.accepted_requests / 60, 2)
+
+
+class HourlyKpi(KpiCounters):
+    """Dashboard counters for one UTC hour"""
+    bucket = models.DateTimeField(unique=True, help_text="Start of the hour (UTC)")
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['bucket']
+
+    def __str__(self):
+        return f"KPIs {self.bucket:%Y-%m-%d %H}:00"
+
+
+class DailyKpi(KpiCounters):
+    """Dashboard counters for one local day, summed from its hours, plus distinct active users"""
+    day = models.DateField(unique=True)
+    active_drivers = models.PositiveIntegerField(default=0, help_text="Drivers who posted a trip")
+    active_riders = models.PositiveIntegerField(default=0, help_text="Passengers who requested a booking")
+    active_users = models.PositiveIntegerField(default=0, help_text="Distinct drivers and riders")
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"KPIs {self.day}"
+
+
+@receiver(post_delete, sender='lets_go.Trip')
+def _trip_deleted(sender, instance, **kwargs):
+    KpiDirtyHour.mark(instance.created_at, instance.completed_at, instance.cancelled_at)
+
+
+@receiver(post_delete, sender='lets_go.Booking')
+def _booking_deleted(sender, instance, **kwargs):
+    # Runs for queryset and cascade deletes too (delete_trip, removed users)
+    KpiDirtyHour.mark(instance.booked_at, instance.cancelled_at)
+
+
+@receiver(post_delete, sender='lets_go.NegotiationEvent')
+def _negotiation_event_deleted(sender, instance, **kwargs):
+    KpiDirtyHour.mark(instance.created_at)
@@ -1,10 +1,22 @@
-async function loadUsers() {
+let nextCursor = null;
+
+function usersUrl(cursor) {
+  const params = new URLSearchParams();
+  const q = document.getElementById('userSearch').value.trim();
+  const status = document.getElementById('userStatus').value;
+  if (q) params.set('q', q);
+  if (status) params.set('status', status);
+  if (cursor) params.set('cursor', cursor);
+  return `${window.USERS_API}?${params}`;
+}
+
+async function loadUsers(cursor = null) {
   try {
-    const response = await fetch(window.USERS_API);
+    const response = await fetch(usersUrl(cursor));
     if (!response.ok) throw new Error('Network response was not ok');
-    const { users } = await response.json();
+    const { users, next_cursor, has_more } = await response.json();
     const tbody = document.querySelector('#usersTable tbody');
-    tbody.innerHTML = '';
+    if (!cursor) tbody.innerHTML = '';
     users.forEach(u => {
       const row = document.createElement('tr');
       row.innerHTML = `
@@ -17,9 +29,20 @@ async function loadUsers() {
         </td>`;
       tbody.appendChild(row);
     });
+    nextCursor = next_cursor;
+    document.getElementById('loadMoreUsers').hidden = !has_more;
   } catch (error) {
     console.error('Error loading users:', error);
   }
 }
 
-document.addEventListener('DOMContentLoaded', loadUsers);
\ No newline at end of file
+let searchTimer = null;
+document.addEventListener('DOMContentLoaded', () => {
+  document.getElementById('userSearch').addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => loadUsers(), 300);
+  });
+  document.getElementById('userStatus').addEventListener('change', () => loadUsers());
+  document.getElementById('loadMoreUsers').addEventListener('click', () => loadUsers(nextCursor));
+  loadUsers();
+});
\ No newline at end of file
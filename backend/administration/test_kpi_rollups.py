@@ -0,0 +1,84 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from lets_go.models import Booking, Route, RouteStop, Trip, UsersData
+
+from .kpi_rollups import aggregate_kpis, hour_bucket
+from .models import DailyKpi, HourlyKpi, KpiDirtyHour
+
+
+class AggregateKpisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        driver = UsersData.objects.create(
+            name='Driver', username='driver', email='driver@example.com', password='x', address='a',
+            phone_no='+923001234567', cnic_no='12345-1234567-1', gender='male',
+        )
+        cls.passenger = UsersData.objects.create(
+            name='Passenger', username='passenger', email='passenger@example.com', password='x', address='a',
+            phone_no='+923001234568', cnic_no='12345-1234567-2', gender='female',
+        )
+        route = Route.objects.create(route_id='R-KPI', route_name='A to B')
+        cls.stops = [RouteStop.objects.create(route=route, stop_name=name, stop_order=order) for order, name in ((1, 'A'), (2, 'B'))]
+        cls.trip = Trip.objects.create(
+            trip_id='T-KPI', route=route, driver=driver, trip_date=date(2030, 1, 7),
+            departure_time=time(8, 0), estimated_arrival_time=time(9, 0),
+            total_seats=4, available_seats=4, base_fare=Decimal('500.00'),
+        )
+
+    def setUp(self):
+        self.hour = hour_bucket(timezone.now() - timedelta(hours=3))
+        at = self.hour + timedelta(minutes=10)
+        for booking_id in ('B-1', 'B-2'):
+            Booking.objects.create(
+                booking_id=booking_id, trip=self.trip, passenger=self.passenger,
+                from_stop=self.stops[0], to_stop=self.stops[1], total_fare=Decimal('250.00'),
+            )
+        Booking.objects.update(booked_at=at, updated_at=at)
+        Booking.objects.filter(booking_id='B-2').update(
+            booking_status='CANCELLED', bargaining_status='REJECTED', cancelled_at=at,
+        )
+
+    def counters(self):
+        return list(HourlyKpi.objects.order_by('bucket').values_list(
+            'bucket', 'ride_requests', 'booking_cancellations', 'cancel_driver', 'trips_posted',
+        ))
+
+    def test_running_twice_changes_nothing(self):
+        aggregate_kpis()
+        first = self.counters()
+        aggregate_kpis()
+        self.assertEqual(self.counters(), first)
+
+        hour = HourlyKpi.objects.get(bucket=self.hour)
+        self.assertEqual((hour.ride_requests, hour.booking_cancellations, hour.cancel_driver), (2, 1, 1))
+        day = DailyKpi.objects.get(day=timezone.localdate(self.hour))
+        self.assertEqual(day.ride_requests, 2)
+
+    def test_later_update_keeps_the_cancellation_in_its_hour(self):
+        aggregate_kpis()
+        booking = Booking.objects.get(booking_id='B-2')
+        booking.driver_response = 'Edited later'
+        booking.save()
+        aggregate_kpis()
+
+        self.assertEqual(HourlyKpi.objects.get(bucket=self.hour).booking_cancellations, 1)
+        self.assertEqual(HourlyKpi.objects.aggregate(n=Sum('booking_cancellations'))['n'], 1)
+
+    def test_deleted_rows_leave_their_hour(self):
+        aggregate_kpis()
+        Booking.objects.filter(booking_id='B-2').delete()
+        aggregate_kpis()
+
+        hour = HourlyKpi.objects.get(bucket=self.hour)
+        self.assertEqual((hour.ride_requests, hour.booking_cancellations), (1, 0))
+        self.assertFalse(KpiDirtyHour.objects.exists())
+
+        self.trip.delete()
+        aggregate_kpis()
+        self.assertEqual(HourlyKpi.objects.get(bucket=self.hour).ride_requests, 0)
+        self.assertEqual(HourlyKpi.objects.aggregate(n=Sum('trips_posted'))['n'], 0)
@@ -22,6 +22,7 @@ urlpatterns = [
     path('users/<int:user_id>/view/', views.user_detail_view, name='user_detail'),
     path('users/<int:user_id>/view/api/', views.api_user_detail, name='api_user_detail'),
     path('users/<int:user_id>/view/status/', views.update_user_status_view, name='update_user_status'),
+    path('users/<int:user_id>/image/<str:field>/', views.user_image, name='user_image'),
 
     # Edit page
     path('users/<int:user_id>/edit/', views.user_edit_view, name='user_edit'),
@@ -0,0 +1,90 @@
+"""
+Signed, lazily loaded user document images for the admin pages
+
+``api_user_detail`` returns short-lived signed URLs instead of inlining base64
+blobs. Each image is read on its own, one column, when the browser requests
+it. Thumbnails are made with Pillow and cached per image version. Only real
+thumbnails are cached: if Pillow is missing or cannot decode an image, the
+thumbnail URL serves the original, read fresh each time.
+"""
+import io
+
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+
+from lets_go.models import UsersData
+
+try:
+    from PIL import Image
+except ImportError:  # Listed in requirements.txt; without it thumbnails fall back to the original image
+    Image = None
+
+USER_IMAGE_FIELDS = (
+    'accountqr', 'profile_photo', 'live_photo', 'cnic_front_image', 'cnic_back_image',
+    'driving_license_front', 'driving_license_back',
+)
+IMAGE_SIZES = ('full', 'thumb')
+IMAGE_URL_MAX_AGE = 15 * 60
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_CACHE_SECONDS = 24 * 60 * 60
+
+_signer = signing.TimestampSigner(salt='administration.user_image')
+
+
+def signed_image_url(user_id, field, size='full'):
+    """URL of one user image, valid for IMAGE_URL_MAX_AGE seconds"""
+    token = _signer.sign(f"{user_id}:{field}:{size}")
+    path = reverse('administration:user_image', args=[user_id, field])
+    return f"{path}?size={size}&token={token}"
+
+
+def verify_image_token(token, user_id, field, size):
+    try:
+        return _signer.unsign(token or '', max_age=IMAGE_URL_MAX_AGE) == f"{user_id}:{field}:{size}"
+    except signing.BadSignature:
+        return False
+
+
+def image_content_type(data):
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def load_image(user_id, field):
+    """The raw bytes of one image column (None if empty); only that column is read"""
+    data = UsersData.objects.values_list(field, flat=True).get(pk=user_id)
+    return bytes(data) if data else None
+
+
+def _thumbnail(data):
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(out, format='JPEG', quality=80)
+    return out.getvalue()
+
+
+def load_thumbnail(user_id, field):
+    """(bytes, content_type) of a thumbnail, cached per image version (originals are never cached)"""
+    updated_at = UsersData.objects.values_list('updated_at', flat=True).get(pk=user_id)
+    key = f"admin_user_thumb:{user_id}:{field}:{updated_at.timestamp() if updated_at else 0}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    data = load_image(user_id, field)
+    if not data:
+        return None
+    if Image is None:
+        return data, image_content_type(data)
+    try:
+        result = (_thumbnail(data), 'image/jpeg')
+    except (OSError, ValueError):  # Not a decodable image; serve it unchanged
+        return data, image_content_type(data)
+    cache.set(key, result, timeout=THUMBNAIL_CACHE_SECONDS)
+    return result
@@ -3,12 +3,26 @@ from django.http import HttpResponseRedirect , JsonResponse
 from django.contrib.auth import authenticate, login, logout
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt , csrf_protect
-import random
 from django.views.decorators.http import require_http_methods
 from lets_go.models import UsersData
+from lets_go.utils.fare_quote_cache import quote_cache_stats
 import base64
+import json
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.hashers import make_password
+from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Length
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import DailyKpi, HourlyKpi
+from .kpi_rollups import day_bounds, last_aggregated_at
+from .user_images import (
+    IMAGE_SIZES, IMAGE_URL_MAX_AGE, USER_IMAGE_FIELDS, image_content_type, load_image, load_thumbnail,
+    signed_image_url, verify_image_token,
+)
 
 @csrf_protect
 def user_add_view(request):
@@ -59,55 +73,197 @@ def user_add_view(request):
 def admin_view(request):
     return render(request, "administration/index.html")
 
+CHART_DAYS = 7
+
+def _as_of():
+    aggregated_at = last_aggregated_at()
+    return aggregated_at.isoformat() if aggregated_at else None
+
 def api_kpis(request):
-    # Replace with real queries
+    # Today's rollup row, kept current by `manage.py aggregate_kpis`
+    today = DailyKpi.objects.filter(day=timezone.localdate()).first() or DailyKpi()
     data = {
-        "active_users": random.randint(1000, 1500),
-        "rides_today": random.randint(200, 500),
-        "cancellations": random.randint(5, 50),
-        "avg_wait": round(random.uniform(3.5, 5.0), 2),
-        "completed_trips": random.randint(180, 480),
-        "flagged_incidents": random.randint(0, 10),
+        "active_users": today.active_users,
+        "rides_today": today.ride_requests,
+        "cancellations": today.booking_cancellations,
+        "avg_wait": today.avg_wait_minutes,
+        "completed_trips": today.completed_trips,
+        "flagged_incidents": today.flagged_incidents,
+        "fare_quote_cache": quote_cache_stats(),
+        "as_of": _as_of(),
     }
     return JsonResponse(data)
 
 def api_chart_data(request):
-    # Include other datasets if needed
+    # Last CHART_DAYS daily rollups plus today's hourly rollups
+    today = timezone.localdate()
+    days = [today - timedelta(days=n) for n in range(CHART_DAYS - 1, -1, -1)]
+    by_day = {row.day: row for row in DailyKpi.objects.filter(day__gte=days[0], day__lte=today)}
+    daily = [by_day.get(day) or DailyKpi(day=day) for day in days]
+    start, end = day_bounds(today)
+    by_hour = dict(
+        HourlyKpi.objects.filter(bucket__gte=start, bucket__lt=end).values_list('bucket', 'ride_requests')
+    )
     return JsonResponse({
-        "tsRides": [300, 320, 310, 340, 360, 380, 400],
-        "byHour": [15, 45, 190, 340, 260, 110, 25],
-        "drivers": [800, 820, 830, 850, 870, 900, 920],
-        "riders": [600, 620, 640, 660, 680, 700, 730],
-        "cancelReasons": [12, 8, 5, 2],
-        "completedTrips": [300,320,310,340,360,380,400],
-        "avgWait": [5,4.8,4.9,4.6,4.4,4.3,4.2],
+        "labels": [day.strftime('%a') for day in days],
+        "tsRides": [row.ride_requests for row in daily],
+        "byHour": [by_hour.get(start + timedelta(hours=h), 0) for h in range(24)],
+        "drivers": [row.active_drivers for row in daily],
+        "riders": [row.active_riders for row in daily],
+        "cancelReasons": [
+            sum(row.cancel_user for row in daily),
+            sum(row.cancel_driver for row in daily),
+            sum(row.cancel_safety for row in daily),
+            sum(row.cancel_other for row in daily),
+        ],
+        "completedTrips": [row.completed_trips for row in daily],
+        "avgWait": [row.avg_wait_minutes for row in daily],
+        "as_of": _as_of(),
     })
 
 def user_list_view(request):
     return render(request, 'administration/users_list.html')
+USERS_PAGE_SIZE = 50
+USERS_MAX_PAGE_SIZE = 1000
+USERS_STREAM_CHUNK = 200
+USER_LIST_FIELDS = ('id', 'name', 'email', 'phone_no', 'status', 'driver_rating', 'passenger_rating', 'created_at')
+USER_SORT_FIELDS = ('created_at', 'name', 'email')
+USER_STATUSES = ('PENDING', 'VERIFIED', 'REJECTED', 'BANNED')
+
+def _encode_user_cursor(value, user_id):
+    """Opaque keyset cursor over (sort value, id)"""
+    raw = json.dumps([value, user_id], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_user_cursor(cursor, sort_field):
+    value, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if sort_field == 'created_at':
+        value = parse_datetime(value)
+        if value is None:
+            raise ValueError('Invalid cursor')
+    return value, int(user_id)
+
+def _phone_prefix(term):
+    """Stored phone numbers are +92...; accept 0300..., 92300... and +92300... prefixes"""
+    digits = term.replace(' ', '').replace('-', '')
+    if digits.startswith('+'):
+        return digits if digits[1:].isdigit() else None
+    if not digits.isdigit():
+        return None
+    return '+92' + digits[1:] if digits.startswith('0') else '+' + digits
+
+def _stream_users(rows, limit, sort_field, total):
+    """JSON page written in chunks as rows arrive from the database cursor"""
+    head = {'success': True}
+    if total is not None:
+        head['total'] = total
+    yield json.dumps(head)[:-1] + ', "users": ['
+    last, has_more, chunk, emitted = None, False, [], False
+    for count, row in enumerate(rows):
+        if count == limit:
+            has_more = True
+            break
+        chunk.append(json.dumps(row, cls=DjangoJSONEncoder))
+        last = row
+        if len(chunk) == USERS_STREAM_CHUNK:
+            yield (',' if emitted else '') + ','.join(chunk)
+            chunk, emitted = [], True
+    if chunk:
+        yield (',' if emitted else '') + ','.join(chunk)
+    next_cursor = _encode_user_cursor(last[sort_field], last['id']) if has_more else None
+    yield '], ' + json.dumps({'next_cursor': next_cursor, 'has_more': has_more})[1:]
+
 # AJAX API: list users
 def api_users(request):
-    qs = UsersData.objects.all().values(
-        'id','name','email','status','driver_rating','passenger_rating','created_at'
-    )
-    return JsonResponse({'users': list(qs)})
+    """GET: one page of users, streamed.
+    Params: limit (default 50, max 1000), cursor (next_cursor of the previous page),
+    sort (created_at | name | email, prefix '-' for descending; default -created_at),
+    status (comma-separated), q (prefix of name, email or phone), include_total=1.
+    """
+    sort = request.GET.get('sort') or '-created_at'
+    sort_field = sort.lstrip('-')
+    descending = sort.startswith('-')
+    if sort_field not in USER_SORT_FIELDS:
+        return JsonResponse({'success': False, 'error': f"sort must be one of {', '.join(USER_SORT_FIELDS)}"}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', USERS_PAGE_SIZE)), 1), USERS_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'limit must be an integer'}, status=400)
+
+    qs = UsersData.objects.all()
+    statuses = [s.strip().upper() for s in (request.GET.get('status') or '').split(',') if s.strip()]
+    if any(s not in USER_STATUSES for s in statuses):
+        return JsonResponse({'success': False, 'error': f"status must be among {', '.join(USER_STATUSES)}"}, status=400)
+    if statuses:
+        qs = qs.filter(status__in=statuses)
+    term = (request.GET.get('q') or '').strip()
+    if term:
+        match = Q(name__istartswith=term) | Q(email__istartswith=term)
+        phone = _phone_prefix(term)
+        if phone:
+            match |= Q(phone_no__startswith=phone)
+        qs = qs.filter(match)
+    total = qs.count() if request.GET.get('include_total') == '1' else None
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            value, last_id = _decode_user_cursor(cursor, sort_field)
+        except (ValueError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+        op = 'lt' if descending else 'gt'
+        qs = qs.filter(Q(**{f'{sort_field}__{op}': value}) | Q(**{sort_field: value, f'id__{op}': last_id}))
+    order = [f'-{sort_field}', '-id'] if descending else [sort_field, 'id']
+    rows = qs.order_by(*order).values(*USER_LIST_FIELDS)[:limit + 1].iterator(chunk_size=USERS_STREAM_CHUNK)
+    return StreamingHttpResponse(_stream_users(rows, limit, sort_field, total), content_type='application/json')
 # 2) Detail page
 def user_detail_view(request, user_id):
     # api_user_detail(request, user_id)
     return render(request, 'administration/users_detail.html', {'user_id': user_id})
 # AJAX API: detail JSON
 def api_user_detail(request, user_id):
-    user = get_object_or_404(UsersData, pk=user_id)
+    # Image blobs are not loaded here; only their sizes, to know which ones exist
+    user = get_object_or_404(
+        UsersData.objects.defer(*USER_IMAGE_FIELDS).annotate(
+            **{f'{img}_bytes': Length(img) for img in USER_IMAGE_FIELDS}
+        ),
+        pk=user_id,
+    )
     data = {f: getattr(user, f) for f in [
         'id','name','username','email','address','phone_no','status','gender',
         'driver_rating','passenger_rating','cnic_no','driving_license_no',
         'accountno','bankname','created_at','updated_at'
     ]}
-    # Add all image/binary fields
-    for img in ['accountqr','profile_photo','live_photo','cnic_front_image','cnic_back_image','driving_license_front','driving_license_back']:
-        blob = getattr(user, img)
-        data[img] = f"data:image/jpeg;base64,{base64.b64encode(blob).decode()}" if blob else None
+    # Image fields are short-lived signed URLs, fetched by the browser on demand
+    data['thumbnails'] = {}
+    for img in USER_IMAGE_FIELDS:
+        if getattr(user, f'{img}_bytes'):
+            data[img] = signed_image_url(user.id, img)
+            data['thumbnails'][img] = signed_image_url(user.id, img, 'thumb')
+        else:
+            data[img] = None
     return JsonResponse(data)
+# Serve one user image (full size or thumbnail) from a signed URL
+@require_http_methods(['GET'])
+def user_image(request, user_id, field):
+    size = request.GET.get('size', 'full')
+    if field not in USER_IMAGE_FIELDS or size not in IMAGE_SIZES:
+        raise Http404('Unknown image')
+    if not verify_image_token(request.GET.get('token'), user_id, field, size):
+        return HttpResponse('Image link is invalid or expired', status=403, content_type='text/plain')
+    try:
+        if size == 'thumb':
+            image = load_thumbnail(user_id, field)
+        else:
+            data = load_image(user_id, field)
+            image = (data, image_content_type(data)) if data else None
+    except UsersData.DoesNotExist:
+        raise Http404('User not found')
+    if image is None:
+        raise Http404('Image not found')
+    response = HttpResponse(image[0], content_type=image[1])
+    response['Cache-Control'] = f'private, max-age={IMAGE_URL_MAX_AGE}'
+    return response
 # Update status via HTML form
 @require_http_methods(['POST'])
 def update_user_status_view(request, user_id):
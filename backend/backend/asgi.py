@@ -2,6 +2,8 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Websocket connections and the long-lived realtime HTTP endpoints (SSE and
+long-poll) go to the lets_go realtime handlers; everything else to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up (it loads models)
+from lets_go.views_realtime import (  # noqa: E402
+    is_realtime_http_path,
+    realtime_http_application,
+    websocket_application,
+)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    elif scope['type'] == 'http' and is_realtime_http_path(scope.get('path')):
+        await realtime_http_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
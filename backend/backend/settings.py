@@ -78,6 +78,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# Realtime push broker; the in-process default only reaches clients of the same worker
+REALTIME_BROKER = os.getenv('REALTIME_BROKER', 'lets_go.utils.realtime.InProcessBroker')
 
 
 # Database
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from lets_go.models import Route, Trip, Vehicle
+from lets_go.views_rideposting import create_route, create_trip, update_trip
+
+
+class Command(BaseCommand):
+    help = (
+        "Time create_route, create_trip and update_trip for a long route and report query counts. "
+        "Only rows created by the benchmark are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', type=int, default=60, help='Stops on the benchmark route')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per endpoint')
+
+    def handle(self, *args, **options):
+        stops = options['stops']
+        if stops < 2:
+            raise CommandError('--stops must be at least 2')
+        vehicle = Vehicle.objects.only('id', 'owner_id').first()
+        if vehicle is None:
+            raise CommandError('Needs at least one vehicle (and its owner) in the database')
+
+        factory = RequestFactory()
+        names = [f'Benchmark stop {i + 1}' for i in range(stops)]
+        coordinates = [{'lat': 33.6 + i * 0.01, 'lng': 73.0 + i * 0.01} for i in range(stops)]
+        breakdown = [
+            {
+                'from_stop': i + 1, 'to_stop': i + 2,
+                'from_stop_name': names[i], 'to_stop_name': names[i + 1],
+                'distance': 1.5, 'duration': 3, 'price': 40,
+                'from_coordinates': coordinates[i], 'to_coordinates': coordinates[i + 1],
+            }
+            for i in range(stops - 1)
+        ]
+
+        results = {'create_route': [], 'create_trip': [], 'update_trip': []}
+        for _ in range(options['repeat']):
+            route_id = created_route_id = trip_id = None
+            try:
+                response, stats = self._call(create_route, factory.post(
+                    '/', json.dumps({'coordinates': coordinates, 'location_names': names}),
+                    content_type='application/json',
+                ))
+                payload = json.loads(response.content)
+                route_id = payload['route']['id']
+                # create_route returns an existing route with the same geometry instead of a copy
+                if not payload['route'].get('reused'):
+                    created_route_id = route_id
+                results['create_route'].append(stats)
+
+                response, stats = self._call(create_trip, factory.post(
+                    '/', json.dumps({
+                        'route_id': route_id, 'vehicle_id': vehicle.id, 'driver_id': vehicle.owner_id,
+                        'departure_time': '08:00', 'trip_date': '2099-01-01', 'total_seats': 4,
+                        'custom_price': 500, 'stop_breakdown': breakdown,
+                    }),
+                    content_type='application/json',
+                ))
+                trip_id = json.loads(response.content)['trip_id']
+                results['create_trip'].append(stats)
+
+                _, stats = self._call(update_trip, factory.put(
+                    '/', json.dumps({'stop_breakdown': breakdown}), content_type='application/json',
+                ), trip_id)
+                results['update_trip'].append(stats)
+            finally:
+                if trip_id:
+                    Trip.objects.filter(trip_id=trip_id).delete()
+                if created_route_id:
+                    Route.objects.filter(route_id=created_route_id).delete()
+
+        self.stdout.write(f"{stops} stops, {stops - 1} stop breakdowns, {options['repeat']} runs")
+        for name, runs in results.items():
+            if not runs:
+                continue
+            queries = max(q for q, _ in runs)
+            best = min(ms for _, ms in runs)
+            self.stdout.write(f"  {name:<13} {queries:>4} queries  {best:8.1f} ms (best)")
+
+    def _call(self, view, request, *args):
+        with CaptureQueriesContext(connection) as ctx, contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            response = view(request, *args)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise CommandError(f'{view.__name__} failed: {response.content.decode()}')
+        return response, (len(ctx.captured_queries), elapsed)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from lets_go.utils.trip_templates import materialize_due_templates, MATERIALIZE_HORIZON_DAYS
+
+
+class Command(BaseCommand):
+    help = "Generate upcoming trips for all active recurring trip templates (run daily)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=MATERIALIZE_HORIZON_DAYS,
+            help='How many days ahead trips should exist',
+        )
+
+    def handle(self, *args, **options):
+        created = materialize_due_templates(options['days'])
+        total = sum(created.values())
+        self.stdout.write(f"Materialized {total} trips from {len(created)} templates")
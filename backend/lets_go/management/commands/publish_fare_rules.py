@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lets_go.models import FareRuleSet
+from lets_go.utils.fare_rules import DEFAULT_FARE_RULES, FARE_RULES_V0, get_fare_rules
+
+
+class Command(BaseCommand):
+    help = "Publish fare rules from a JSON file as the next active version, or print the active rules"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='JSON file with the rules (keys as in DEFAULT_FARE_RULES; missing keys are taken from it)')
+        parser.add_argument('--notes', default=None, help='What changed in this version')
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            active = FareRuleSet.objects.filter(is_active=True).first()
+            rules = active.rules if active else FARE_RULES_V0
+            self.stdout.write(f"Active version {active.version if active else 0}")
+            self.stdout.write(json.dumps(rules, indent=2))
+            return
+
+        try:
+            with open(options['path']) as f:
+                rules = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f"Cannot read rules: {e}")
+        if not isinstance(rules, dict):
+            raise CommandError('Rules file must contain a JSON object')
+        unknown = set(rules) - set(DEFAULT_FARE_RULES)
+        if unknown:
+            raise CommandError(f"Unknown rule keys: {', '.join(sorted(unknown))}")
+
+        try:
+            rule_set = FareRuleSet.publish(rules, notes=options['notes'])
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            raise CommandError(f"Invalid rules: {e}")
+        get_fare_rules()
+        self.stdout.write(f"Published fare rules v{rule_set.version}")
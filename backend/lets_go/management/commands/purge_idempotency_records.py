@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from lets_go.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records and locks left by crashed requests (run daily)"
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted, _ = IdempotencyRecord.objects.filter(
+            Q(expires_at__lte=now) | Q(status_code__isnull=True, locked_until__lte=now)
+        ).delete()
+        self.stdout.write(f"Deleted {deleted} expired idempotency records")
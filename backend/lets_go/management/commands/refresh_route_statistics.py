@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from lets_go.models import Route, RouteStatistics
+
+
+class Command(BaseCommand):
+    help = "Recompute stale route statistics rollups (run every few minutes), or all of them with --all"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every route, including ones without a rollup row')
+        parser.add_argument('--batch-size', type=int, default=500, help='Routes recomputed per batch')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            route_ids = list(Route.objects.values_list('id', flat=True))
+        else:
+            route_ids = list(RouteStatistics.stale_route_ids())
+        batch_size = max(1, options['batch_size'])
+        refreshed = 0
+        for start in range(0, len(route_ids), batch_size):
+            refreshed += RouteStatistics.refresh(route_ids[start:start + batch_size])
+        self.stdout.write(f"Refreshed statistics for {refreshed} routes")
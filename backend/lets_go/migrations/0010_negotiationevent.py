@@ -0,0 +1,97 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+
+def _to_decimal(value):
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def backfill_negotiation_events(apps, schema_editor):
+    """Copy Trip.bargaining_history JSON arrays into NegotiationEvent rows"""
+    Trip = apps.get_model('lets_go', 'Trip')
+    Booking = apps.get_model('lets_go', 'Booking')
+    UsersData = apps.get_model('lets_go', 'UsersData')
+    NegotiationEvent = apps.get_model('lets_go', 'NegotiationEvent')
+    valid_actions = {'ACCEPT', 'REJECT', 'COUNTER', 'BLOCK', 'BLACKLIST'}
+
+    trips = (
+        Trip.objects.exclude(bargaining_history=[])
+        .exclude(bargaining_history__isnull=True)
+        .only('id', 'bargaining_history')
+    )
+    for trip in trips.iterator(chunk_size=500):
+        entries = trip.bargaining_history if isinstance(trip.bargaining_history, list) else []
+        booking_ids = {e.get('booking_id') for e in entries if isinstance(e, dict) and e.get('booking_id')}
+        passenger_ids = {e.get('passenger_id') for e in entries if isinstance(e, dict) and e.get('passenger_id')}
+        existing = set(Booking.objects.filter(id__in=booking_ids, trip_id=trip.id).values_list('id', flat=True))
+        existing_passengers = set(UsersData.objects.filter(id__in=passenger_ids).values_list('id', flat=True))
+        events = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            # Entries without an action were written by handle_ride_booking_request (passenger offers)
+            action = str(entry.get('action') or 'OFFER').upper()
+            if action not in valid_actions:
+                action = 'OFFER'
+            created_at = parse_datetime(str(entry.get('ts') or entry.get('timestamp') or ''))
+            if created_at is None:
+                created_at = django.utils.timezone.now()
+            elif django.utils.timezone.is_naive(created_at):
+                created_at = django.utils.timezone.make_aware(created_at)
+            events.append(NegotiationEvent(
+                trip_id=trip.id,
+                booking_id=entry.get('booking_id') if entry.get('booking_id') in existing else None,
+                passenger_id=entry.get('passenger_id') if entry.get('passenger_id') in existing_passengers else None,
+                action=action,
+                amount=_to_decimal(entry.get('counter_fare', entry.get('proposed_fare'))),
+                original_fare=_to_decimal(entry.get('original_fare')),
+                reason=entry.get('reason'),
+                created_at=created_at,
+            ))
+        NegotiationEvent.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0009_tripuserblock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NegotiationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('OFFER', 'Passenger Offer'), ('ACCEPT', 'Driver Accepted'), ('REJECT', 'Driver Rejected'), ('COUNTER', 'Driver Counter Offer'), ('BLOCK', 'Driver Blocked Passenger'), ('BLACKLIST', 'Driver Blacklisted Passenger'), ('PASSENGER_ACCEPT', 'Passenger Accepted'), ('PASSENGER_COUNTER', 'Passenger Counter Offer'), ('WITHDRAW', 'Passenger Withdrew')], max_length=20)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, help_text='Fare offered or countered in this event', max_digits=10, null=True)),
+                ('original_fare', models.DecimalField(blank=True, decimal_places=2, help_text='Fare before negotiation, for offers', max_digits=10, null=True)),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='negotiation_events', to='lets_go.booking')),
+                ('passenger', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='negotiation_events', to='lets_go.usersdata')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='negotiation_events', to='lets_go.trip')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='negotiationevent',
+            index=models.Index(fields=['trip', 'id'], name='lets_go_neg_trip_id_acb82f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='negotiationevent',
+            index=models.Index(fields=['booking', 'id'], name='lets_go_neg_booking_88f848_idx'),
+        ),
+        migrations.RunPython(backfill_negotiation_events, migrations.RunPython.noop),
+    ]
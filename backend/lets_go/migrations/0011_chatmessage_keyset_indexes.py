@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0010_negotiationevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['chat_group', 'id'], name='lets_go_cha_chat_gr_50786a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['chat_group', 'updated_at', 'id'], name='lets_go_cha_chat_gr_7ec33e_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:07
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """Seed watermarks from MessageReadStatus, then count messages after them as the runtime does"""
+    ChatGroupMember = apps.get_model('lets_go', 'ChatGroupMember')
+    ChatMessage = apps.get_model('lets_go', 'ChatMessage')
+    MessageReadStatus = apps.get_model('lets_go', 'MessageReadStatus')
+
+    for member in ChatGroupMember.objects.all().iterator():
+        if member.last_read_message_id is None:
+            member.last_read_message_id = MessageReadStatus.objects.filter(
+                user_id=member.user_id, message__chat_group_id=member.chat_group_id
+            ).aggregate(m=Max('message_id'))['m']
+        unread = ChatMessage.objects.filter(
+            chat_group_id=member.chat_group_id, is_deleted=False
+        ).exclude(sender_id=member.user_id)
+        if member.last_read_message_id is not None:
+            unread = unread.filter(id__gt=member.last_read_message_id)
+        member.unread_count = unread.count()
+        member.save(update_fields=['last_read_message', 'unread_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0011_chatmessage_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatgroupmember',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, help_text='Messages from others after last_read_message; kept in step on send, delete and read'),
+        ),
+        migrations.AddIndex(
+            model_name='chatgroupmember',
+            index=models.Index(fields=['user', 'is_active'], name='lets_go_cha_user_id_0fb19b_idx'),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
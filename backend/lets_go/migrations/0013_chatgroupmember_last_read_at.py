@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:08
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_last_read_at(apps, schema_editor):
+    """Take last_read_at from the newest legacy receipt of each member"""
+    ChatGroupMember = apps.get_model('lets_go', 'ChatGroupMember')
+    MessageReadStatus = apps.get_model('lets_go', 'MessageReadStatus')
+
+    for member in ChatGroupMember.objects.filter(last_read_message__isnull=False).iterator():
+        member.last_read_at = MessageReadStatus.objects.filter(
+            user_id=member.user_id, message__chat_group_id=member.chat_group_id
+        ).aggregate(m=Max('read_at'))['m']
+        if member.last_read_at is not None:
+            member.save(update_fields=['last_read_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0012_chatgroupmember_unread_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatgroupmember',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, help_text='When last_read_message was last advanced', null=True),
+        ),
+        migrations.RunPython(backfill_last_read_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:15
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0013_chatgroupmember_last_read_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTripTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.JSONField(default=list, help_text='Days of week the trip runs, 0=Monday … 6=Sunday')),
+                ('departure_time', models.TimeField(help_text='Scheduled departure time')),
+                ('estimated_arrival_time', models.TimeField(help_text='Expected arrival time')),
+                ('start_date', models.DateField(help_text='First date trips may be generated for')),
+                ('end_date', models.DateField(blank=True, help_text='Last date, open-ended if empty', null=True)),
+                ('total_seats', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('base_fare', models.DecimalField(decimal_places=2, help_text='Fare calculated once when the template was saved', max_digits=10, validators=[django.core.validators.MinValueValidator(0.01)])),
+                ('total_distance_km', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('total_duration_minutes', models.IntegerField(blank=True, null=True)),
+                ('fare_calculation', models.JSONField(blank=True, default=dict)),
+                ('stop_breakdown', models.JSONField(blank=True, default=list, help_text="Per-segment breakdown payload (same shape as create_trip's stop_breakdown)")),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('gender_preference', models.CharField(choices=[('Male', 'Male'), ('Female', 'Female'), ('Any', 'Any')], default='Any', max_length=10)),
+                ('is_negotiable', models.BooleanField(default=True)),
+                ('minimum_acceptable_fare', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, help_text='Trips exist for every occurrence up to this date', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_templates', to='lets_go.usersdata')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_templates', to='lets_go.route')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='lets_go.vehicle')),
+            ],
+            options={
+                'ordering': ['departure_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='recurring_template',
+            field=models.ForeignKey(blank=True, help_text='Template this trip was generated from, if any', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trips', to='lets_go.recurringtriptemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring_template__isnull', False)), fields=('recurring_template', 'trip_date'), name='unique_template_trip_per_date'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtriptemplate',
+            index=models.Index(fields=['driver'], name='lets_go_rec_driver__675370_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtriptemplate',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='lets_go_rec_is_acti_e953b7_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+from lets_go.utils.route_geometry import route_geometry_hash
+
+
+def backfill_geometry_hash(apps, schema_editor):
+    """Hash existing routes; where several share a geometry only the oldest active one gets it"""
+    Route = apps.get_model('lets_go', 'Route')
+    RouteStop = apps.get_model('lets_go', 'RouteStop')
+
+    points = {}
+    for route_id, lat, lng in (
+        RouteStop.objects.order_by('route_id', 'stop_order').values_list('route_id', 'latitude', 'longitude')
+    ):
+        points.setdefault(route_id, []).append((lat, lng))
+
+    taken = set()
+    for route in Route.objects.order_by('-is_active', 'created_at', 'id').only('id'):
+        stops = points.get(route.id) or []
+        if len(stops) < 2 or any(lat is None or lng is None for lat, lng in stops):
+            continue
+        geometry_hash = route_geometry_hash(stops)
+        if geometry_hash in taken:
+            continue
+        taken.add(geometry_hash)
+        Route.objects.filter(pk=route.pk).update(geometry_hash=geometry_hash)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0014_recurringtriptemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='geometry_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the quantized stop sequence, used to reuse identical routes', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_geometry_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+from lets_go.utils.route_geometry import build_polyline_levels, encode_polyline
+
+
+def backfill_route_polylines(apps, schema_editor):
+    """Existing routes only have their stops, so the stop sequence becomes the path"""
+    Route = apps.get_model('lets_go', 'Route')
+    RouteStop = apps.get_model('lets_go', 'RouteStop')
+
+    points = {}
+    for route_id, lat, lng in (
+        RouteStop.objects.exclude(latitude=None).exclude(longitude=None)
+        .order_by('route_id', 'stop_order').values_list('route_id', 'latitude', 'longitude')
+    ):
+        points.setdefault(route_id, []).append((lat, lng))
+
+    for route_id, path in points.items():
+        if len(path) < 2:
+            continue
+        Route.objects.filter(pk=route_id).update(
+            route_polyline=encode_polyline(path),
+            polyline_levels=build_polyline_levels(path),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0015_route_geometry_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='polyline_levels',
+            field=models.JSONField(blank=True, default=dict, help_text='Simplified encoded polylines keyed by map zoom level'),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='route_polyline',
+            field=models.TextField(blank=True, help_text='Full-resolution route path as an encoded polyline', null=True),
+        ),
+        migrations.RunPython(backfill_route_polylines, migrations.RunPython.noop),
+    ]
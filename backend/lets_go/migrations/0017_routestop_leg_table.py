@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:23
+
+import django.core.validators
+from django.db import migrations, models
+
+from lets_go.utils.route_legs import leg_table
+
+
+def backfill_leg_table(apps, schema_editor):
+    """Cumulative distance and ETA for every stop of routes whose stops all have coordinates"""
+    RouteStop = apps.get_model('lets_go', 'RouteStop')
+
+    by_route = {}
+    for stop in RouteStop.objects.order_by('route_id', 'stop_order').only('id', 'route_id', 'latitude', 'longitude'):
+        by_route.setdefault(stop.route_id, []).append(stop)
+
+    for stops in by_route.values():
+        if any(s.latitude is None or s.longitude is None for s in stops):
+            continue
+        for stop, (km, minutes) in zip(stops, leg_table([(s.latitude, s.longitude) for s in stops])):
+            stop.distance_from_start_km = km
+            stop.estimated_time_from_start = minutes
+        RouteStop.objects.bulk_update(stops, ['distance_from_start_km', 'estimated_time_from_start'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0016_route_polyline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routestop',
+            name='distance_from_start_km',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Cumulative route distance from the first stop to this stop', max_digits=8, null=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.RunPython(backfill_leg_table, migrations.RunPython.noop),
+    ]
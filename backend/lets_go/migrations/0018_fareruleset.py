@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0017_routestop_leg_table'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareRuleSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(help_text='Increasing rule version, quoted with every fare', unique=True)),
+                ('rules', models.JSONField(help_text='Rates, multipliers and tiers (see utils/fare_rules.py DEFAULT_FARE_RULES)')),
+                ('is_active', models.BooleanField(default=False, help_text='Whether new quotes use this version')),
+                ('notes', models.TextField(blank=True, help_text='What changed in this version', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+                'indexes': [models.Index(fields=['is_active'], name='lets_go_far_is_acti_db26e3_idx')],
+            },
+        ),
+    ]
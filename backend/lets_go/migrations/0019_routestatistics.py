@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0018_fareruleset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteStatistics',
+            fields=[
+                ('route', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistics', serialize=False, to='lets_go.route')),
+                ('total_stops', models.PositiveIntegerField(default=0)),
+                ('total_fare_segments', models.PositiveIntegerField(default=0)),
+                ('total_trips', models.PositiveIntegerField(default=0)),
+                ('scheduled_trips', models.PositiveIntegerField(default=0)),
+                ('in_progress_trips', models.PositiveIntegerField(default=0)),
+                ('completed_trips', models.PositiveIntegerField(default=0)),
+                ('cancelled_trips', models.PositiveIntegerField(default=0)),
+                ('trip_fare_total', models.DecimalField(decimal_places=2, default=0, help_text='Sum of trip base fares', max_digits=14)),
+                ('total_bookings', models.PositiveIntegerField(default=0)),
+                ('confirmed_bookings', models.PositiveIntegerField(default=0, help_text='Confirmed or completed bookings')),
+                ('cancelled_bookings', models.PositiveIntegerField(default=0)),
+                ('booking_revenue', models.DecimalField(decimal_places=2, default=0, help_text='Sum of booking total fares', max_digits=14)),
+                ('avg_base_fare', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('avg_peak_fare', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('avg_off_peak_fare', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('changes', models.PositiveBigIntegerField(default=0, help_text='Bumped by every write that affects this route')),
+                ('refreshed_changes', models.PositiveBigIntegerField(default=0, help_text='Value of changes when last recomputed')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'route statistics',
+            },
+        ),
+    ]
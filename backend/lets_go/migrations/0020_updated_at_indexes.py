@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0019_routestatistics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='lets_go_boo_updated_4b6967_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['updated_at'], name='lets_go_tri_updated_262ee4_idx'),
+        ),
+    ]
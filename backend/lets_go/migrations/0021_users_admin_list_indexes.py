@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+# name/email istartswith compiles to UPPER(col::text) LIKE UPPER('term%') on
+# PostgreSQL, which only an expression index with pattern ops can serve.
+PREFIX_INDEXES = [
+    ('usersdata_name_prefix_idx', 'UPPER("name"::text) text_pattern_ops'),
+    ('usersdata_email_prefix_idx', 'UPPER("email"::text) text_pattern_ops'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, expression in PREFIX_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON lets_go_usersdata ({expression})')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0020_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersdata',
+            index=models.Index(fields=['status', 'created_at'], name='lets_go_use_status_8efaf4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersdata',
+            index=models.Index(fields=['created_at'], name='lets_go_use_created_903105_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersdata',
+            index=models.Index(fields=['status', 'name'], name='lets_go_use_status_e360a5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersdata',
+            index=models.Index(fields=['name'], name='lets_go_use_name_5075a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usersdata',
+            index=models.Index(fields=['phone_no'], name='usersdata_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0021_users_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('fingerprint', models.CharField(help_text='Digest of the request body', max_length=32)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, help_text='Empty while the first request runs', null=True)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('content', models.BinaryField(blank=True, help_text='zlib-compressed response body', null=True)),
+                ('locked_until', models.DateTimeField(help_text='A running first request holds the key until then')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
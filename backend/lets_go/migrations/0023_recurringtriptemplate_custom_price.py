@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:53
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0022_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recurringtriptemplate',
+            name='custom_price',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text="Driver's fixed fare for every generated trip, instead of a per-date quote", max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0.01)]),
+        ),
+        migrations.AlterField(
+            model_name='recurringtriptemplate',
+            name='base_fare',
+            field=models.DecimalField(decimal_places=2, help_text='Fare of the first occurrence; each generated trip is quoted for its own date', max_digits=10, validators=[django.core.validators.MinValueValidator(0.01)]),
+        ),
+    ]
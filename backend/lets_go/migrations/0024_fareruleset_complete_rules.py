@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+from lets_go.utils.fare_rules import FARE_RULES_V0, merge_fare_rules
+
+
+def complete_stored_rules(apps, schema_editor):
+    """Store each version's complete rules, filling what it left out from the frozen version 0"""
+    FareRuleSet = apps.get_model('lets_go', 'FareRuleSet')
+    for rule_set in FareRuleSet.objects.all():
+        rule_set.rules = merge_fare_rules(rule_set.rules, base=FARE_RULES_V0)
+        rule_set.save(update_fields=['rules'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0023_recurringtriptemplate_custom_price'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fareruleset',
+            name='rules',
+            field=models.JSONField(help_text='Complete rates, multipliers and tiers (see utils/fare_rules.py DEFAULT_FARE_RULES)'),
+        ),
+        migrations.RunPython(complete_stored_rules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:10
+
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_cancelled_at(apps, schema_editor):
+    """Rejected, withdrawn and blocked bookings never got cancelled_at; use their last update"""
+    Booking = apps.get_model('lets_go', 'Booking')
+    Booking.objects.filter(booking_status='CANCELLED', cancelled_at__isnull=True).update(cancelled_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lets_go', '0024_fareruleset_complete_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_cancelled_at, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
 from .models_userdata import UsersData
 from .models_vehicle import Vehicle
 from .models_route import Route, RouteStop, FareMatrix
+from .models_route_statistics import RouteStatistics
 from .models_trip import Trip, TripVehicleHistory, TripStopBreakdown
 from .models_booking import Booking, SeatAssignment
 from .models_chat import TripChatGroup, ChatGroupMember, ChatMessage, MessageReadStatus
-from .models_payment import TripPayment, PaymentRefund
\ No newline at end of file
+from .models_payment import TripPayment, PaymentRefund
+from .models_negotiation import NegotiationEvent
+from .models_trip_template import RecurringTripTemplate
+from .models_fare_rules import FareRuleSet
+from .models_idempotency import IdempotencyRecord
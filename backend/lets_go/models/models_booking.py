@@ -3,6 +3,9 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from ..utils.money import Money
+from .models_route_statistics import RouteStatistics
+
 class Booking(models.Model):
     """Model for passenger bookings with multiple seats"""
     BOOKING_STATUS_CHOICES = [
@@ -150,6 +153,7 @@ class Booking(models.Model):
             models.Index(fields=['booking_status']),
             models.Index(fields=['payment_status']),
             models.Index(fields=['booked_at']),
+            models.Index(fields=['updated_at']),
         ]
         ordering = ['-booked_at']
 
@@ -171,6 +175,13 @@ class Booking(models.Model):
         """Check if booking can be cancelled"""
         return self.booking_status == 'CONFIRMED' and self.trip.trip_status == 'SCHEDULED'
     
+    @property
+    def passenger_offer_total(self):
+        """Passenger's per-seat offer times the seats, as Money (None without an offer)"""
+        if self.passenger_offer is None or not self.number_of_seats:
+            return None
+        return Money.from_decimal(self.passenger_offer) * int(self.number_of_seats)
+    
     def clean(self):
         """Validate booking data"""
         if self.number_of_seats <= 0:
@@ -191,6 +202,9 @@ class Booking(models.Model):
         if self.trip.available_seats < self.number_of_seats:
             raise ValidationError(f'Only {self.trip.available_seats} seats available, but {self.number_of_seats} requested.')
     
+    # Fields that feed the route statistics rollup
+    ROUTE_STATISTICS_FIELDS = frozenset({'trip', 'trip_id', 'booking_status', 'total_fare'})
+    
     def save(self, *args, **kwargs):
         """Override save to update trip's available seats"""
         if self.pk is None:  # New booking
@@ -200,13 +214,14 @@ class Booking(models.Model):
                 self.trip.save()
                 
                 # Add passenger to chat group
-                try:
-                    self.trip.chat_group.add_member(self.passenger, 'PASSENGER')
-                    self.trip.chat_group.send_system_message(f"👋 {self.passenger.name} joined the trip!")
-                except:
-                    pass  # Chat group might not exist yet
+                from ..utils.system_messages import member_joined, system_message
+                member_joined(self.trip, self.passenger, 'PASSENGER')
+                system_message(self.trip, f"👋 {self.passenger.name} joined the trip!")
         
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.ROUTE_STATISTICS_FIELDS.intersection(update_fields):
+            RouteStatistics.mark_trips_stale([self.trip_id])
     
     def cancel_booking(self, reason=None):
         """Cancel the booking"""
@@ -222,11 +237,9 @@ class Booking(models.Model):
         self.trip.save()
         
         # Remove from chat group
-        try:
-            self.trip.chat_group.remove_member(self.passenger)
-            self.trip.chat_group.send_system_message(f"❌ {self.passenger.name} cancelled their booking")
-        except:
-            pass
+        from ..utils.system_messages import member_left, system_message
+        member_left(self.trip, self.passenger)
+        system_message(self.trip, f"❌ {self.passenger.name} cancelled their booking")
     
     def complete_booking(self):
         """Mark booking as completed"""
@@ -323,10 +336,8 @@ class SeatAssignment(models.Model):
             self.save()
             
             # Send notification to chat
-            try:
-                self.trip.chat_group.send_system_message(f"✅ {self.passenger_name} has boarded (Seat {self.seat_number})")
-            except:
-                pass
+            from ..utils.system_messages import system_message
+            system_message(self.trip, f"✅ {self.passenger_name} has boarded (Seat {self.seat_number})")
     
     def mark_as_unoccupied(self):
         """Mark seat as unoccupied"""
@@ -1,4 +1,7 @@
+from collections import Counter
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -38,6 +41,25 @@ class TripChatGroup(models.Model):
     def __str__(self):
         return f"Chat Group: {self.group_name} - Trip {self.trip.trip_id}"
     
+    @classmethod
+    def get_or_create_for_trip(cls, trip):
+        """Get or create the chat group for a trip (needs trip.route loaded)"""
+        chat_group, created = cls.objects.get_or_create(
+            trip=trip,
+            defaults={
+                'group_name': f"Trip {trip.trip_id} - {trip.route.route_name}"[:100],
+                'group_description': f"Group chat for trip {trip.trip_id}",
+                'created_by_id': trip.driver_id,
+            }
+        )
+        if created:
+            ChatGroupMember.objects.get_or_create(
+                chat_group=chat_group,
+                user_id=trip.driver_id,
+                defaults={'member_type': 'DRIVER'}
+            )
+        return chat_group
+    
     @property
     def members(self):
         """Get all active members"""
@@ -60,6 +82,8 @@ class TripChatGroup(models.Model):
             user=user,
             defaults={'member_type': member_type}
         )
+        if created and self.chat_messages.exists():
+            member.refresh_unread_count()
         return member
     
     def remove_member(self, user):
@@ -87,7 +111,11 @@ class TripChatGroup(models.Model):
         self.save()
     
     def get_unread_count(self, user):
-        """Get number of unread messages for a user"""
+        """Get number of unread messages for a user (O(1) for members)"""
+        unread = self.chat_members.filter(user=user).values_list('unread_count', flat=True).first()
+        if unread is not None:
+            return unread
+        # Not a member: fall back to counting
         return self.messages.exclude(
             sender=user
         ).exclude(
@@ -118,6 +146,15 @@ class ChatGroupMember(models.Model):
         blank=True,
         help_text="Last message read by this member"
     )
+    last_read_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When last_read_message was last advanced"
+    )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Messages from others after last_read_message; kept in step on send, delete and read"
+    )
     
     # Member preferences
     notifications_enabled = models.BooleanField(
@@ -136,21 +173,82 @@ class ChatGroupMember(models.Model):
             models.Index(fields=['chat_group']),
             models.Index(fields=['user']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['user', 'is_active']),
         ]
 
     def __str__(self):
         return f"{self.user.name} ({self.member_type}) in {self.chat_group.group_name}"
     
+    @classmethod
+    def unread_counts_for_user(cls, user_id):
+        """Unread counts for all of a user's active chat groups in one query: {chat_group_id: count}"""
+        return dict(
+            cls.objects.filter(user_id=user_id, is_active=True)
+            .values_list('chat_group_id', 'unread_count')
+        )
+    
+    @classmethod
+    def _unread_subquery(cls, after_id):
+        """Correlated count of visible messages from others after after_id"""
+        messages = ChatMessage.objects.filter(
+            chat_group_id=OuterRef('chat_group_id'),
+            is_deleted=False,
+        ).exclude(sender_id=OuterRef('user_id'))
+        if after_id is not None:
+            messages = messages.filter(id__gt=after_id)
+        counted = messages.order_by().values('chat_group_id').annotate(c=Count('id')).values('c')
+        return Coalesce(Subquery(counted, output_field=models.IntegerField()), Value(0))
+    
+    def refresh_unread_count(self):
+        """Recount unread messages after the watermark (repairs drifted counters)"""
+        ChatGroupMember.objects.filter(pk=self.pk).update(
+            unread_count=self._unread_subquery(self.last_read_message_id)
+        )
+        self.refresh_from_db(fields=['unread_count'])
+        return self.unread_count
+    
     def leave_group(self):
         """Leave the chat group"""
         self.is_active = False
         self.left_at = timezone.now()
         self.save()
     
+    def mark_read_up_to(self, message_id=None):
+        """
+        Mark every message up to message_id (default: the latest) as read
+        
+        One UPDATE regardless of how many messages are covered. The watermark
+        only moves forward and is clamped to the group's newest message.
+        
+        Returns:
+            True if the watermark moved
+        """
+        latest_id = ChatMessage.objects.filter(chat_group_id=self.chat_group_id).order_by('-id').values_list('id', flat=True).first()
+        if latest_id is None:
+            return False
+        target_id = latest_id if message_id is None else min(message_id, latest_id)
+        # Single UPDATE so a message sent concurrently is either counted or behind the watermark
+        moved = ChatGroupMember.objects.filter(pk=self.pk).filter(
+            Q(last_read_message__isnull=True) | Q(last_read_message_id__lt=target_id)
+        ).update(
+            last_read_message_id=target_id,
+            last_read_at=timezone.now(),
+            unread_count=self._unread_subquery(target_id)
+        )
+        self.refresh_from_db(fields=['last_read_message', 'last_read_at', 'unread_count'])
+        return bool(moved)
+    
+    def has_read(self, message):
+        """Whether this member has read message (watermark, or a legacy receipt row)"""
+        if message.sender_id == self.user_id:
+            return True
+        if self.last_read_message_id is not None and message.id <= self.last_read_message_id:
+            return True
+        return MessageReadStatus.objects.filter(message_id=message.id, user_id=self.user_id).exists()
+    
     def update_last_read(self, message):
-        """Update last read message"""
-        self.last_read_message = message
-        self.save()
+        """Move the read watermark forward to message"""
+        self.mark_read_up_to(message.id)
     
     def is_muted(self):
         """Check if member has muted notifications"""
@@ -209,23 +307,42 @@ class ChatMessage(models.Model):
             models.Index(fields=['created_at']),
             models.Index(fields=['message_type']),
             models.Index(fields=['is_deleted']),
+            # Keyset pagination and incremental sync
+            models.Index(fields=['chat_group', 'id']),
+            models.Index(fields=['chat_group', 'updated_at', 'id']),
         ]
         ordering = ['created_at']
 
     def __str__(self):
         return f"Message from {self.sender.name} in {self.chat_group.group_name}"
     
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+        if is_new and not self.is_deleted:
+            # Bump every other active member's unread counter in one UPDATE
+            ChatGroupMember.objects.filter(
+                chat_group_id=self.chat_group_id, is_active=True
+            ).exclude(user_id=self.sender_id).update(unread_count=F('unread_count') + 1)
+            from ..utils.realtime import publish_chat_message
+            publish_chat_message(self)
+    
+    def _read_by_filter(self):
+        """Members whose watermark has passed this message, or with a legacy receipt row"""
+        return (
+            Q(last_read_message_id__gte=self.id)
+            | Q(user_id__in=self.message_read_status.values('user_id'))
+        )
+    
     @property
     def read_by(self):
-        """Get users who have read this message"""
-        return self.message_read_status.all()
+        """Get members (excluding the sender) who have read this message"""
+        return self.chat_group.members.exclude(user_id=self.sender_id).filter(self._read_by_filter())
     
     @property
     def unread_by(self):
-        """Get users who haven't read this message"""
-        group_members = self.chat_group.members.exclude(user=self.sender)
-        read_users = set(self.read_by.values_list('user_id', flat=True))
-        return group_members.exclude(user_id__in=read_users)
+        """Get members (excluding the sender) who haven't read this message"""
+        return self.chat_group.members.exclude(user_id=self.sender_id).exclude(self._read_by_filter())
     
     @property
     def is_system_message(self):
@@ -233,13 +350,34 @@ class ChatMessage(models.Model):
         return self.message_type == 'SYSTEM'
     
     def mark_as_read(self, user):
-        """Mark message as read by a user"""
+        """Mark message (and everything before it) as read by a user"""
+        member = self.chat_group.chat_members.filter(user=user).first()
+        if member is not None:
+            member.mark_read_up_to(self.id)
+            return
+        # Non-members have no watermark; keep a per-message receipt for them
         MessageReadStatus.objects.get_or_create(
             message=self,
             user=user,
             defaults={'read_at': timezone.now()}
         )
     
+    @classmethod
+    def bulk_send(cls, messages):
+        """Insert many unsaved messages in one query, keeping unread counters and pushes in step"""
+        if not messages:
+            return []
+        created = cls.objects.bulk_create(messages)
+        per_group = Counter((m.chat_group_id, m.sender_id) for m in created)
+        for (chat_group_id, sender_id), count in per_group.items():
+            ChatGroupMember.objects.filter(
+                chat_group_id=chat_group_id, is_active=True
+            ).exclude(user_id=sender_id).update(unread_count=F('unread_count') + count)
+        from ..utils.realtime import publish_chat_message
+        for message in created:
+            publish_chat_message(message)
+        return created
+    
     def edit_message(self, new_text, edited_by):
         """Edit the message"""
         if self.is_deleted:
@@ -267,6 +405,14 @@ class ChatMessage(models.Model):
         self.deleted_at = timezone.now()
         self.deleted_by = deleted_by_user
         self.save()
+        
+        # Members who had not read it yet lose it from their unread count; only
+        # active members were counted when it was sent
+        ChatGroupMember.objects.filter(
+            chat_group_id=self.chat_group_id, is_active=True, unread_count__gt=0
+        ).exclude(user_id=self.sender_id).filter(
+            Q(last_read_message__isnull=True) | Q(last_read_message_id__lt=self.id)
+        ).update(unread_count=F('unread_count') - 1)
     
     def get_display_text(self):
         """Get display text for the message"""
@@ -306,7 +452,7 @@ class ChatMessage(models.Model):
         return None
 
 class MessageReadStatus(models.Model):
-    """Model to track message read status"""
+    """Legacy per-message read receipts; members now use ChatGroupMember.last_read_message"""
     message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='message_read_status')
     user = models.ForeignKey('UsersData', on_delete=models.CASCADE, related_name='read_messages')
     read_at = models.DateTimeField(auto_now_add=True)
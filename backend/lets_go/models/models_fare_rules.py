@@ -0,0 +1,33 @@
+from django.db import models, transaction
+
+class FareRuleSet(models.Model):
+    """Immutable, versioned fare rules; exactly one version is active at a time"""
+    version = models.PositiveIntegerField(unique=True, help_text="Increasing rule version, quoted with every fare")
+    rules = models.JSONField(help_text="Complete rates, multipliers and tiers (see utils/fare_rules.py DEFAULT_FARE_RULES)")
+    is_active = models.BooleanField(default=False, help_text="Whether new quotes use this version")
+    notes = models.TextField(null=True, blank=True, help_text="What changed in this version")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active']),
+        ]
+        ordering = ['-version']
+
+    def __str__(self):
+        return f"Fare rules v{self.version}{' (active)' if self.is_active else ''}"
+
+    @classmethod
+    def publish(cls, rules, notes=None):
+        """Store rules, completed from DEFAULT_FARE_RULES, as the next version and make it the active one"""
+        from ..utils.fare_rules import CompiledFareRules, announce_active_version, merge_fare_rules
+
+        # The merged rules are stored, so later edits to the defaults never reprice this version
+        rules = merge_fare_rules(rules)
+        CompiledFareRules(0, rules)  # Reject rules that do not compile before saving them
+        with transaction.atomic():
+            latest = cls.objects.select_for_update().order_by('-version').values_list('version', flat=True).first()
+            cls.objects.filter(is_active=True).update(is_active=False)
+            rule_set = cls.objects.create(version=(latest or 0) + 1, rules=rules, is_active=True, notes=notes)
+            transaction.on_commit(lambda: announce_active_version(rule_set.version))
+        return rule_set
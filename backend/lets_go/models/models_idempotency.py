@@ -0,0 +1,26 @@
+from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyRecord(models.Model):
+    """Stored response for one Idempotency-Key, shared by every worker through the database.
+
+    A row is inserted before the view runs and acts as the lock. It holds no
+    response until the view finishes. ``key`` is a digest of the endpoint
+    scope, the caller, the path and the client's key.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    fingerprint = models.CharField(max_length=32, help_text="Digest of the request body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while the first request runs")
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    content = models.BinaryField(null=True, blank=True, help_text="zlib-compressed response body")
+    locked_until = models.DateTimeField(help_text="A running first request holds the key until then")
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Idempotency record {self.key[:12]} ({self.status_code or 'running'})"
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
@@ -0,0 +1,118 @@
+from django.db import models
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+class NegotiationEvent(models.Model):
+    """Append-only log of price negotiation actions on a trip's bookings"""
+    ACTION_CHOICES = [
+        ('OFFER', 'Passenger Offer'),
+        ('ACCEPT', 'Driver Accepted'),
+        ('REJECT', 'Driver Rejected'),
+        ('COUNTER', 'Driver Counter Offer'),
+        ('BLOCK', 'Driver Blocked Passenger'),
+        ('BLACKLIST', 'Driver Blacklisted Passenger'),
+        ('PASSENGER_ACCEPT', 'Passenger Accepted'),
+        ('PASSENGER_COUNTER', 'Passenger Counter Offer'),
+        ('WITHDRAW', 'Passenger Withdrew'),
+    ]
+
+    trip = models.ForeignKey('Trip', on_delete=models.CASCADE, related_name='negotiation_events')
+    booking = models.ForeignKey(
+        'Booking',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='negotiation_events'
+    )
+    passenger = models.ForeignKey(
+        'UsersData',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='negotiation_events'
+    )
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Fare offered or countered in this event"
+    )
+    original_fare = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Fare before negotiation, for offers"
+    )
+    reason = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['trip', 'id']),
+            models.Index(fields=['booking', 'id']),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.action} on trip {self.trip_id} (booking {self.booking_id})"
+
+    def save(self, *args, **kwargs):
+        """Events are immutable once written"""
+        if self.pk is not None:
+            raise ValidationError('Negotiation events are append-only.')
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def record(cls, trip, booking, action, amount=None, original_fare=None, reason=None, passenger_id=None):
+        """Append one event; a single INSERT regardless of history length"""
+        event = cls.objects.create(
+            trip=trip,
+            booking=booking,
+            passenger_id=passenger_id if passenger_id is not None else (booking.passenger_id if booking is not None else None),
+            action=action,
+            amount=amount,
+            original_fare=original_fare,
+            reason=reason,
+        )
+        from ..utils.realtime import publish_negotiation_events
+        publish_negotiation_events(trip, [event])
+        return event
+
+    @classmethod
+    def history(cls, trip_id, booking_id=None, after_id=None, limit=100):
+        """
+        Compact negotiation history for a trip (optionally one booking)
+
+        Args:
+            trip_id: Primary key of the trip
+            booking_id: Restrict to one booking
+            after_id: Only events with a larger id (for incremental reads)
+            limit: Maximum number of events returned
+
+        Returns:
+            List of dicts ordered oldest first
+        """
+        qs = cls.objects.filter(trip_id=trip_id)
+        if booking_id is not None:
+            qs = qs.filter(booking_id=booking_id)
+        if after_id is not None:
+            qs = qs.filter(id__gt=after_id)
+        rows = qs.order_by('id').values_list(
+            'id', 'booking_id', 'passenger_id', 'action', 'amount', 'original_fare', 'reason', 'created_at'
+        )[:limit]
+        return [
+            {
+                'id': event_id,
+                'booking_id': b_id,
+                'passenger_id': p_id,
+                'action': action,
+                'amount': float(amount) if amount is not None else None,
+                'original_fare': float(original) if original is not None else None,
+                'reason': reason,
+                'ts': created_at.isoformat(),
+            }
+            for event_id, b_id, p_id, action, amount, original, reason, created_at in rows
+        ]
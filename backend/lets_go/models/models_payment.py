@@ -3,6 +3,8 @@ from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from ..utils.money import Money, ZERO, money_json
+
 class TripPayment(models.Model):
     """Model for individual booking payments"""
     PAYMENT_METHOD_CHOICES = [
@@ -94,6 +96,11 @@ class TripPayment(models.Model):
     def __str__(self):
         return f"Payment {self.transaction_id or self.id} for Booking {self.booking.booking_id}"
     
+    @property
+    def amount_money(self):
+        """Payment amount as Money"""
+        return Money.from_decimal(self.amount)
+    
     @property
     def is_successful(self):
         """Check if payment was successful"""
@@ -116,7 +123,7 @@ class TripPayment(models.Model):
     
     def clean(self):
         """Validate payment data"""
-        if self.amount <= 0:
+        if self.amount_money <= ZERO:
             raise ValidationError({'amount': 'Payment amount must be greater than 0.'})
         
         if self.exchange_rate <= 0:
@@ -166,7 +173,7 @@ class TripPayment(models.Model):
         self.refunded_at = timezone.now()
         
         if refund_amount:
-            self.amount = refund_amount
+            self.amount = Money.parse(refund_amount).to_decimal()
         
         if gateway_response:
             self.gateway_response = gateway_response
@@ -181,7 +188,7 @@ class TripPayment(models.Model):
         return {
             'id': self.id,
             'transaction_id': self.transaction_id,
-            'amount': float(self.amount),
+            'amount': money_json(self.amount),
             'currency': self.currency,
             'payment_method': self.payment_method,
             'payment_status': self.payment_status,
@@ -276,10 +283,11 @@ class PaymentRefund(models.Model):
     
     def clean(self):
         """Validate refund data"""
-        if self.refund_amount <= 0:
+        refund = Money.from_decimal(self.refund_amount)
+        if refund <= ZERO:
             raise ValidationError({'refund_amount': 'Refund amount must be greater than 0.'})
         
-        if self.refund_amount > self.original_payment.amount:
+        if refund > self.original_payment.amount_money:
             raise ValidationError({'refund_amount': 'Refund amount cannot exceed original payment amount.'})
     
     def process_refund(self, refund_transaction_id=None, gateway_response=None):
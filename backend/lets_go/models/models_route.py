@@ -22,6 +22,24 @@ class Route(models.Model):
         help_text="Estimated travel time in minutes"
     )
     is_active = models.BooleanField(default=True, help_text="Whether this route is available for booking")
+    geometry_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Hash of the quantized stop sequence, used to reuse identical routes"
+    )
+    route_polyline = models.TextField(
+        null=True,
+        blank=True,
+        help_text="Full-resolution route path as an encoded polyline"
+    )
+    polyline_levels = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Simplified encoded polylines keyed by map zoom level"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -51,6 +69,20 @@ class Route(models.Model):
         """Get last stop"""
         return self.stops.last()
     
+    def set_path(self, points):
+        """Store a (lat, lng) path as the full polyline and its per-zoom simplifications"""
+        from ..utils.route_geometry import build_polyline_levels, encode_polyline
+        self.route_polyline = encode_polyline(points)
+        self.polyline_levels = build_polyline_levels(points)
+    
+    def polyline_for_zoom(self, zoom=None):
+        """Coarsest stored polyline that is still detailed enough for `zoom` (full path if none)"""
+        if zoom is not None and self.polyline_levels:
+            for level in sorted(self.polyline_levels, key=int):
+                if int(level) >= zoom:
+                    return self.polyline_levels[level]
+        return self.route_polyline
+    
     def clean(self):
         """Validate route data"""
         if self.total_distance_km and self.total_distance_km <= 0:
@@ -82,6 +114,14 @@ class RouteStop(models.Model):
         help_text="GPS longitude coordinate"
     )
     address = models.TextField(null=True, blank=True, help_text="Full address of the stop")
+    distance_from_start_km = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        help_text="Cumulative route distance from the first stop to this stop"
+    )
     estimated_time_from_start = models.IntegerField(
         null=True, 
         blank=True,
@@ -103,6 +143,20 @@ class RouteStop(models.Model):
     def __str__(self):
         return f"{self.route.route_name} - Stop {self.stop_order}: {self.stop_name}"
     
+    def segment_to(self, to_stop):
+        """
+        Distance (km) and duration (minutes) from this stop to a later one on the same route
+
+        Read from the precomputed leg table; None if either stop has not been filled in.
+        """
+        if None in (self.distance_from_start_km, to_stop.distance_from_start_km,
+                    self.estimated_time_from_start, to_stop.estimated_time_from_start):
+            return None
+        return {
+            'distance_km': float(to_stop.distance_from_start_km - self.distance_from_start_km),
+            'duration_minutes': to_stop.estimated_time_from_start - self.estimated_time_from_start,
+        }
+    
     def clean(self):
         """Validate stop data"""
         if self.stop_order <= 0:
@@ -0,0 +1,206 @@
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Avg, Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+# A stale row is recomputed on read at most this often; refresh_route_statistics does the rest
+REFRESH_ON_READ_SECONDS = 60
+
+
+class RouteStatistics(models.Model):
+    """Per-route rollup of trips, bookings, revenue and fares, read as a single row.
+
+    Writes that can change a route's numbers (trip and booking saves and
+    deletes, route stop and fare matrix edits, bulk booking responses,
+    template materialization) bump ``changes`` with one UPDATE. A row is
+    stale while ``changes`` is ahead of ``refreshed_changes``. Stale rows are
+    recomputed with grouped aggregates by ``manage.py
+    refresh_route_statistics``, and by at most one read per
+    REFRESH_ON_READ_SECONDS.
+    """
+    route = models.OneToOneField('Route', on_delete=models.CASCADE, primary_key=True, related_name='statistics')
+
+    total_stops = models.PositiveIntegerField(default=0)
+    total_fare_segments = models.PositiveIntegerField(default=0)
+
+    total_trips = models.PositiveIntegerField(default=0)
+    scheduled_trips = models.PositiveIntegerField(default=0)
+    in_progress_trips = models.PositiveIntegerField(default=0)
+    completed_trips = models.PositiveIntegerField(default=0)
+    cancelled_trips = models.PositiveIntegerField(default=0)
+    trip_fare_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of trip base fares")
+
+    total_bookings = models.PositiveIntegerField(default=0)
+    confirmed_bookings = models.PositiveIntegerField(default=0, help_text="Confirmed or completed bookings")
+    cancelled_bookings = models.PositiveIntegerField(default=0)
+    booking_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Sum of booking total fares")
+
+    avg_base_fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    avg_peak_fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    avg_off_peak_fare = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    changes = models.PositiveBigIntegerField(default=0, help_text="Bumped by every write that affects this route")
+    refreshed_changes = models.PositiveBigIntegerField(default=0, help_text="Value of changes when last recomputed")
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'route statistics'
+
+    def __str__(self):
+        return f"Statistics for route {self.route_id}"
+
+    @property
+    def is_stale(self):
+        return self.changes != self.refreshed_changes
+
+    @classmethod
+    def mark_stale(cls, route_ids):
+        """Flag rollups of these routes for recomputation (one UPDATE)"""
+        route_ids = [r for r in set(route_ids) if r is not None]
+        if route_ids:
+            cls.objects.filter(route_id__in=route_ids).update(changes=F('changes') + 1)
+
+    @classmethod
+    def mark_trips_stale(cls, trip_ids):
+        """mark_stale() for the routes of these trips (one UPDATE with a subquery)"""
+        from .models_trip import Trip
+
+        trip_ids = [t for t in set(trip_ids) if t is not None]
+        if trip_ids:
+            cls.objects.filter(
+                route_id__in=Trip.objects.filter(id__in=trip_ids).values('route_id')
+            ).update(changes=F('changes') + 1)
+
+    @classmethod
+    def stale_route_ids(cls):
+        return cls.objects.filter(changes__gt=F('refreshed_changes')).values_list('route_id', flat=True)
+
+    @classmethod
+    def refresh(cls, route_ids):
+        """Recompute the rollups of these routes with one grouped query per source table.
+
+        Returns the number of rows written. Writes that land while this runs
+        leave ``changes`` ahead of the snapshot, so those rows stay stale.
+        """
+        from .models_route import Route, RouteStop, FareMatrix
+        from .models_trip import Trip
+        from .models_booking import Booking
+        from ..utils.money import Money
+
+        route_ids = list(Route.objects.filter(id__in=set(route_ids)).values_list('id', flat=True))
+        if not route_ids:
+            return 0
+        changes = dict(cls.objects.filter(route_id__in=route_ids).values_list('route_id', 'changes'))
+
+        stops = dict(
+            RouteStop.objects.filter(route_id__in=route_ids)
+            .values('route_id').annotate(n=Count('id')).values_list('route_id', 'n')
+        )
+        trips = {
+            row['route_id']: row for row in
+            Trip.objects.filter(route_id__in=route_ids).values('route_id').annotate(
+                total=Count('id'),
+                scheduled=Count('id', filter=Q(trip_status='SCHEDULED')),
+                in_progress=Count('id', filter=Q(trip_status='IN_PROGRESS')),
+                completed=Count('id', filter=Q(trip_status='COMPLETED')),
+                cancelled=Count('id', filter=Q(trip_status='CANCELLED')),
+                fare_total=Sum('base_fare'),
+            )
+        }
+        bookings = {
+            row['trip__route_id']: row for row in
+            Booking.objects.filter(trip__route_id__in=route_ids).values('trip__route_id').annotate(
+                total=Count('id'),
+                confirmed=Count('id', filter=Q(booking_status__in=['CONFIRMED', 'COMPLETED'])),
+                cancelled=Count('id', filter=Q(booking_status='CANCELLED')),
+                revenue=Sum('total_fare'),
+            )
+        }
+        fares = {
+            row['route_id']: row for row in
+            FareMatrix.objects.filter(route_id__in=route_ids).values('route_id').annotate(
+                segments=Count('id'),
+                avg_base=Avg('base_fare'),
+                avg_peak=Avg('peak_fare'),
+                avg_off_peak=Avg('off_peak_fare'),
+            )
+        }
+
+        def amount(value):
+            return Money.parse(value).to_decimal() if value is not None else 0
+
+        now = timezone.now()
+        rows = []
+        for route_id in route_ids:
+            t, b, f = trips.get(route_id, {}), bookings.get(route_id, {}), fares.get(route_id, {})
+            snapshot = changes.get(route_id, 0)
+            rows.append(cls(
+                route_id=route_id,
+                total_stops=stops.get(route_id, 0),
+                total_fare_segments=f.get('segments', 0),
+                total_trips=t.get('total', 0),
+                scheduled_trips=t.get('scheduled', 0),
+                in_progress_trips=t.get('in_progress', 0),
+                completed_trips=t.get('completed', 0),
+                cancelled_trips=t.get('cancelled', 0),
+                trip_fare_total=amount(t.get('fare_total')),
+                total_bookings=b.get('total', 0),
+                confirmed_bookings=b.get('confirmed', 0),
+                cancelled_bookings=b.get('cancelled', 0),
+                booking_revenue=amount(b.get('revenue')),
+                avg_base_fare=amount(f.get('avg_base')),
+                avg_peak_fare=amount(f.get('avg_peak')),
+                avg_off_peak_fare=amount(f.get('avg_off_peak')),
+                changes=snapshot,
+                refreshed_changes=snapshot,
+                refreshed_at=now,
+            ))
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['route'],
+            update_fields=[
+                f.name for f in cls._meta.concrete_fields if f.name not in ('route', 'changes')
+            ],
+        )
+        return len(rows)
+
+    @classmethod
+    def for_route(cls, route_id):
+        """The route's rollup (None if the route does not exist).
+
+        A missing row is built on the spot. A stale row is served as stored
+        unless it was last recomputed over REFRESH_ON_READ_SECONDS ago; then
+        the one reader that moves ``refreshed_at`` forward recomputes it.
+        """
+        stats = cls.objects.filter(route_id=route_id).first()
+        if stats is None:
+            if not cls.refresh([route_id]):
+                return None
+            return cls.objects.get(route_id=route_id)
+        if not stats.is_stale:
+            return stats
+        now = timezone.now()
+        if stats.refreshed_at is not None and stats.refreshed_at > now - timedelta(seconds=REFRESH_ON_READ_SECONDS):
+            return stats
+        claimed = cls.objects.filter(route_id=route_id, refreshed_at=stats.refreshed_at).update(refreshed_at=now)
+        if claimed and cls.refresh([route_id]):
+            stats = cls.objects.get(route_id=route_id)
+        return stats
+
+
+@receiver(post_delete, sender='lets_go.Booking')
+def _booking_deleted(sender, instance, **kwargs):
+    # Also runs for queryset and cascade deletes, which skip Model.delete()
+    RouteStatistics.mark_trips_stale([instance.trip_id])
+
+
+@receiver(post_save, sender='lets_go.RouteStop')
+@receiver(post_delete, sender='lets_go.RouteStop')
+@receiver(post_save, sender='lets_go.FareMatrix')
+@receiver(post_delete, sender='lets_go.FareMatrix')
+def _route_layout_changed(sender, instance, **kwargs):
+    RouteStatistics.mark_stale([instance.route_id])
@@ -3,6 +3,9 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from .models_route_statistics import RouteStatistics
 
 class Trip(models.Model):
     """Model for individual bus/shuttle trips"""
@@ -96,12 +99,22 @@ class Trip(models.Model):
         blank=True,
         help_text="Minimum fare driver is willing to accept"
     )
+    # Legacy: superseded by NegotiationEvent rows (backfilled in migration 0010), no longer written
     bargaining_history = models.JSONField(
         default=list,
         blank=True,
         help_text="History of price negotiations for this trip"
     )
     
+    recurring_template = models.ForeignKey(
+        'RecurringTripTemplate',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trips',
+        help_text="Template this trip was generated from, if any"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -117,6 +130,14 @@ class Trip(models.Model):
             models.Index(fields=['route', 'trip_date']),
             models.Index(fields=['driver']),
             models.Index(fields=['vehicle']),
+            models.Index(fields=['updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurring_template', 'trip_date'],
+                condition=models.Q(recurring_template__isnull=False),
+                name='unique_template_trip_per_date',
+            ),
         ]
         ordering = ['trip_date', 'departure_time']
 
@@ -138,20 +159,6 @@ class Trip(models.Model):
         """Check if trip is at maximum capacity"""
         return self.available_seats <= 0
     
-    @property
-    def chat_group(self):
-        """Get or create chat group for this trip"""
-        from .models_chat import TripChatGroup
-        chat_group, created = TripChatGroup.objects.get_or_create(
-            trip=self,
-            defaults={
-                'group_name': f"Trip {self.trip_id} - {self.route.route_name}",
-                'group_description': f"Group chat for trip from {self.route.first_stop.stop_name} to {self.route.last_stop.stop_name}",
-                'created_by': self.driver
-            }
-        )
-        return chat_group
-    
     def clean(self):
         """Validate trip data"""
         if self.total_seats <= 0:
@@ -171,11 +178,23 @@ class Trip(models.Model):
             if self.departure_time >= self.estimated_arrival_time:
                 raise ValidationError('Departure time must be before estimated arrival time.')
     
+    # Fields that feed the route statistics rollup
+    ROUTE_STATISTICS_FIELDS = frozenset({'route', 'route_id', 'trip_status', 'base_fare'})
+    
     def save(self, *args, **kwargs):
         """Override save to ensure available_seats doesn't exceed total_seats"""
         if self.available_seats > self.total_seats:
             self.available_seats = self.total_seats
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.ROUTE_STATISTICS_FIELDS.intersection(update_fields):
+            RouteStatistics.mark_stale([self.route_id])
+    
+    def delete(self, *args, **kwargs):
+        route_id = self.route_id
+        result = super().delete(*args, **kwargs)
+        RouteStatistics.mark_stale([route_id])
+        return result
     
     def start_trip(self):
         """Start the trip"""
@@ -186,12 +205,11 @@ class Trip(models.Model):
         self.actual_departure_time = timezone.now().time()
         self.started_at = timezone.now()
         self.save()
+        from ..utils.realtime import publish_trip_status
+        publish_trip_status(self)
         
-        # Send system message to chat
-        try:
-            self.chat_group.send_system_message("🚌 Trip has started!")
-        except:
-            pass  # Chat group might not exist yet
+        from ..utils.system_messages import system_message
+        system_message(self, "🚌 Trip has started!")
     
     def complete_trip(self):
         """Complete the trip"""
@@ -202,13 +220,12 @@ class Trip(models.Model):
         self.actual_arrival_time = timezone.now().time()
         self.completed_at = timezone.now()
         self.save()
+        from ..utils.realtime import publish_trip_status
+        publish_trip_status(self)
         
-        # Archive chat group
-        try:
-            self.chat_group.archive()
-            self.chat_group.send_system_message("✅ Trip completed! This chat will be archived.")
-        except:
-            pass
+        from ..utils.system_messages import archive_chat, system_message
+        system_message(self, "✅ Trip completed! This chat will be archived.")
+        archive_chat(self)
     
     def cancel_trip(self, reason=None):
         """Cancel the trip"""
@@ -219,12 +236,11 @@ class Trip(models.Model):
         self.cancellation_reason = reason
         self.cancelled_at = timezone.now()
         self.save()
+        from ..utils.realtime import publish_trip_status
+        publish_trip_status(self, reason=reason)
         
-        # Send cancellation message to chat
-        try:
-            self.chat_group.send_system_message(f"❌ Trip cancelled: {reason or 'No reason provided'}")
-        except:
-            pass
+        from ..utils.system_messages import system_message
+        system_message(self, f"❌ Trip cancelled: {reason or 'No reason provided'}")
 
 class TripVehicleHistory(models.Model):
     """Model to preserve vehicle data even when vehicle is deleted"""
@@ -282,6 +298,27 @@ class TripVehicleHistory(models.Model):
     def __str__(self):
         return f"Vehicle history for Trip {self.trip.trip_id}"
     
+    @staticmethod
+    def fields_from_vehicle(vehicle):
+        """Snapshot of a vehicle as TripVehicleHistory field values"""
+        return {
+            'vehicle': vehicle,
+            'vehicle_type': vehicle.vehicle_type,
+            'vehicle_model': vehicle.model_number,
+            'vehicle_make': vehicle.company_name,
+            'vehicle_color': vehicle.color,
+            'license_plate': vehicle.plate_number,
+            'vehicle_capacity': vehicle.seats or 1,
+            'fuel_type': vehicle.fuel_type,
+            'engine_number': vehicle.engine_number,
+            'chassis_number': vehicle.chassis_number,
+            'vehicle_features': {
+                'type': vehicle.vehicle_type,
+                'seats': vehicle.seats,
+                'fuel_type': vehicle.fuel_type,
+            },
+        }
+    
     def copy_from_vehicle(self, vehicle):
         """Copy data from a vehicle object"""
         self.vehicle = vehicle
@@ -384,6 +421,70 @@ class TripStopBreakdown(models.Model):
     def __str__(self):
         return f"Trip {self.trip.trip_id}: {self.from_stop_name} → {self.to_stop_name} (₨{self.price})"
     
+    @staticmethod
+    def _first_present(stop_data, *keys, default=None):
+        for key in keys:
+            if stop_data.get(key) is not None:
+                return stop_data[key]
+        return default
+    
+    @classmethod
+    def from_payload(cls, trip, stop_data):
+        """Unsaved breakdown row from one entry of a stop_breakdown payload (new or legacy keys)"""
+        from_coords = stop_data.get('from_coordinates') or {}
+        to_coords = stop_data.get('to_coordinates') or {}
+        return cls(
+            trip=trip,
+            from_stop_order=cls._first_present(stop_data, 'from_stop', 'from_stop_order'),
+            to_stop_order=cls._first_present(stop_data, 'to_stop', 'to_stop_order'),
+            from_stop_name=stop_data.get('from_stop_name'),
+            to_stop_name=stop_data.get('to_stop_name'),
+            distance_km=cls._first_present(stop_data, 'distance', 'distance_km', default=0.0),
+            duration_minutes=cls._first_present(stop_data, 'duration', 'duration_minutes', default=0),
+            price=stop_data.get('price'),
+            from_latitude=from_coords.get('lat'),
+            from_longitude=from_coords.get('lng'),
+            to_latitude=to_coords.get('lat'),
+            to_longitude=to_coords.get('lng'),
+            price_breakdown=stop_data.get('price_breakdown', {}),
+        )
+
+    @classmethod
+    def build_from_payload(cls, trip, payload):
+        """
+        Validate a whole stop_breakdown payload and return unsaved rows for bulk_create
+
+        Raises ValueError naming the first bad entry, before anything is written.
+        """
+        if not isinstance(payload, list):
+            raise ValueError('stop_breakdown must be a list')
+        rows = []
+        seen = set()
+        for index, stop_data in enumerate(payload):
+            if not isinstance(stop_data, dict):
+                raise ValueError(f'stop_breakdown[{index}] must be an object')
+            row = cls.from_payload(trip, stop_data)
+            try:
+                row.from_stop_order = int(row.from_stop_order)
+                row.to_stop_order = int(row.to_stop_order)
+                row.distance_km = Decimal(str(row.distance_km))
+                row.duration_minutes = int(row.duration_minutes)
+                row.price = Decimal(str(row.price))
+            except (TypeError, ValueError, InvalidOperation):
+                raise ValueError(f'stop_breakdown[{index}] has missing or invalid stop orders, distance, duration or price')
+            if row.from_stop_order >= row.to_stop_order:
+                raise ValueError(f'stop_breakdown[{index}]: pickup stop must come before drop-off stop')
+            if not row.from_stop_name or not row.to_stop_name:
+                raise ValueError(f'stop_breakdown[{index}]: stop names are required')
+            if row.price < 0:
+                raise ValueError(f'stop_breakdown[{index}]: price cannot be negative')
+            key = (row.from_stop_order, row.to_stop_order)
+            if key in seen:
+                raise ValueError(f'stop_breakdown[{index}]: duplicate segment {key[0]} → {key[1]}')
+            seen.add(key)
+            rows.append(row)
+        return rows
+
     def clean(self):
         """Validate stop breakdown data"""
         if self.from_stop_order >= self.to_stop_order:
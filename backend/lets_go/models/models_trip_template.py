@@ -0,0 +1,104 @@
+from django.db import models
+from django.core.validators import MinValueValidator
+from django.core.exceptions import ValidationError
+from datetime import timedelta
+
+class RecurringTripTemplate(models.Model):
+    """Weekly schedule a driver posts once; trips are materialized from it ahead of time"""
+    WEEKDAY_NAMES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+    driver = models.ForeignKey('UsersData', on_delete=models.CASCADE, related_name='trip_templates')
+    route = models.ForeignKey('Route', on_delete=models.CASCADE, related_name='trip_templates')
+    vehicle = models.ForeignKey('Vehicle', on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Schedule (RRULE FREQ=WEEKLY;BYDAY=... between start_date and end_date)
+    weekdays = models.JSONField(
+        default=list,
+        help_text="Days of week the trip runs, 0=Monday … 6=Sunday"
+    )
+    departure_time = models.TimeField(help_text="Scheduled departure time")
+    estimated_arrival_time = models.TimeField(help_text="Expected arrival time")
+    start_date = models.DateField(help_text="First date trips may be generated for")
+    end_date = models.DateField(null=True, blank=True, help_text="Last date, open-ended if empty")
+
+    # Trip settings copied onto every generated trip
+    total_seats = models.IntegerField(validators=[MinValueValidator(1)])
+    base_fare = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(0.01)],
+        help_text="Fare of the first occurrence; each generated trip is quoted for its own date"
+    )
+    custom_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0.01)],
+        help_text="Driver's fixed fare for every generated trip, instead of a per-date quote"
+    )
+    total_distance_km = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    total_duration_minutes = models.IntegerField(null=True, blank=True)
+    fare_calculation = models.JSONField(default=dict, blank=True)
+    stop_breakdown = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Per-segment breakdown payload (same shape as create_trip's stop_breakdown)"
+    )
+    notes = models.TextField(null=True, blank=True)
+    gender_preference = models.CharField(
+        max_length=10,
+        choices=[('Male', 'Male'), ('Female', 'Female'), ('Any', 'Any')],
+        default='Any'
+    )
+    is_negotiable = models.BooleanField(default=True)
+    minimum_acceptable_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    # Materialization state
+    is_active = models.BooleanField(default=True)
+    materialized_until = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Trips exist for every occurrence up to this date"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['driver']),
+            models.Index(fields=['is_active', 'materialized_until']),
+        ]
+        ordering = ['departure_time']
+
+    def __str__(self):
+        days = ','.join(self.WEEKDAY_NAMES[d] for d in sorted(self.weekdays or []))
+        return f"Template {self.id}: route {self.route_id} {days} at {self.departure_time}"
+
+    @property
+    def rrule(self):
+        """Schedule as an iCalendar RRULE string"""
+        days = ','.join(self.WEEKDAY_NAMES[d] for d in sorted(self.weekdays or []))
+        rule = f"FREQ=WEEKLY;BYDAY={days}"
+        if self.end_date:
+            rule += f";UNTIL={self.end_date.strftime('%Y%m%d')}"
+        return rule
+
+    def clean(self):
+        """Validate schedule"""
+        if not self.weekdays or not all(isinstance(d, int) and 0 <= d <= 6 for d in self.weekdays):
+            raise ValidationError({'weekdays': 'Weekdays must be a non-empty list of integers 0-6.'})
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': 'End date cannot be before start date.'})
+
+    def occurrences(self, start, end):
+        """Dates between start and end (inclusive) on which this template runs"""
+        first = max(start, self.start_date)
+        last = min(end, self.end_date) if self.end_date else end
+        days = set(self.weekdays or [])
+        current = first
+        while current <= last:
+            if current.weekday() in days:
+                yield current
+            current += timedelta(days=1)
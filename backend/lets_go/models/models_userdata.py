@@ -61,6 +61,17 @@ class UsersData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Admin user list: status filter + keyset order on created_at / name
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'name']),
+            models.Index(fields=['name']),
+            # Phone prefix search (LIKE '+92300%') on PostgreSQL
+            models.Index(fields=['phone_no'], name='usersdata_phone_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
     def clean(self):
         # Password complexity
         import re
@@ -1,3 +1,209 @@
-from django.test import TestCase
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .models import Booking, Route, RouteStatistics, RouteStop, Trip, UsersData, Vehicle
+from .models.models_route_statistics import REFRESH_ON_READ_SECONDS
+from .utils.fare_rules import DEFAULT_FARE_RULES, FARE_RULES_V0, PricingCalendar
+from .utils.fare_quote_cache import quote_cache_stats
+from .utils.money import Money
+
+MONDAY, SUNDAY = date(2030, 1, 7), date(2030, 1, 13)
+
+
+class PricingCalendarTests(SimpleTestCase):
+    def calendar(self, **overrides):
+        config = dict(DEFAULT_FARE_RULES['pricing_calendar'], **overrides)
+        return PricingCalendar(config, Decimal('1.30'))
+
+    def test_windows_are_half_open_15_minute_buckets(self):
+        calendar = self.calendar()
+        self.assertEqual(calendar.multiplier(MONDAY, time(6, 59)), Decimal('1.0'))
+        self.assertEqual(calendar.multiplier(MONDAY, time(7, 0)), Decimal('1.30'))
+        self.assertEqual(calendar.multiplier(MONDAY, time(8, 59)), Decimal('1.30'))
+        self.assertEqual(calendar.multiplier(MONDAY, time(9, 0)), Decimal('1.0'))
+
+    def test_window_with_own_multiplier(self):
+        calendar = self.calendar()
+        self.assertEqual(calendar.day_class(SUNDAY), 'weekend')
+        self.assertEqual(calendar.multiplier(SUNDAY, time(17, 30)), Decimal('1.15'))
+        self.assertEqual(calendar.multiplier(SUNDAY, time(8, 0)), Decimal('1.0'))
+
+    def test_single_dates_win_over_ranges(self):
+        calendar = self.calendar(
+            dates={'2030-01-08': 'holiday'},
+            date_ranges=[['2030-01-07', '2030-01-09', 'ramadan']],
+        )
+        self.assertEqual(calendar.day_class(date(2030, 1, 7)), 'ramadan')
+        self.assertEqual(calendar.day_class(date(2030, 1, 8)), 'holiday')
+        self.assertEqual(calendar.day_class(date(2030, 1, 10)), 'weekday')
+        self.assertEqual(calendar.multiplier(date(2030, 1, 7), time(9, 0)), Decimal('1.30'))
+        self.assertEqual(calendar.multiplier(date(2030, 1, 8), time(8, 0)), Decimal('1.0'))
+
+    def test_invalid_calendars_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.calendar(weekdays=['weekday'] * 6)
+        with self.assertRaises(ValueError):
+            self.calendar(dates={'2030-01-08': 'eid'})
+        with self.assertRaises(ValueError):
+            self.calendar(day_classes={'weekday': [['07:00', '25:00']], 'weekend': []})
+
+    def test_version_0_calendar_is_weekday_peaks_every_day(self):
+        calendar = PricingCalendar(FARE_RULES_V0['pricing_calendar'], Decimal('1.30'))
+        self.assertEqual(calendar.multiplier(SUNDAY, time(17, 30)), Decimal('1.30'))
+        self.assertEqual(calendar.multiplier(SUNDAY, time(12, 0)), Decimal('1.0'))
+
+
+class MoneyTests(SimpleTestCase):
+    def test_parse_rounds_half_up_to_the_paisa(self):
+        self.assertEqual(Money.parse('12.345').paisa, 1235)
+        self.assertEqual(Money.parse('12.344').paisa, 1234)
+        self.assertEqual(Money.parse(Decimal('-1.005')).paisa, -101)
+        self.assertEqual(Money.parse(5).paisa, 500)
+
+    def test_parse_floats_without_binary_noise(self):
+        self.assertEqual(Money.parse(0.1 + 0.2).paisa, 30)
+        self.assertEqual(Money.parse(19.99).paisa, 1999)
+        self.assertEqual(Money.parse(2.675).paisa, 268)
+
+    def test_parse_rejects_non_amounts(self):
+        for value in (True, 'abc', float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                Money.parse(value)
+
+    def test_scale_rounds_half_up(self):
+        self.assertEqual(Money(1001).scale(Decimal('0.5')).paisa, 501)
+        self.assertEqual(Money(333).scale(Decimal('1.30')).paisa, 433)
+        self.assertEqual(Money(100).scale(1.15).paisa, 115)
+        self.assertEqual(Money(333).scale(3).paisa, 999)
+
+    def test_comparisons_with_non_money_are_unsupported(self):
+        self.assertLess(Money(100), Money(101))
+        self.assertNotEqual(Money(100), 1)
+        for compare in (lambda: Money(100) < 1, lambda: Money(100) >= Decimal('1.00'), lambda: 1 > Money(0)):
+            with self.assertRaises(TypeError):
+                compare()
+
+    def test_decimal_round_trip_and_str(self):
+        self.assertEqual(Money.parse('585.54').to_decimal(), Decimal('585.54'))
+        self.assertEqual(str(Money(-5)), '-0.05')
+
+
+class RouteStatisticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.driver = UsersData.objects.create(
+            name='Driver', username='driver', email='driver@example.com', password='x', address='a',
+            phone_no='+923001234567', cnic_no='12345-1234567-1', gender='male',
+        )
+        cls.passenger = UsersData.objects.create(
+            name='Passenger', username='passenger', email='passenger@example.com', password='x', address='a',
+            phone_no='+923001234568', cnic_no='12345-1234567-2', gender='female',
+        )
+        cls.route = Route.objects.create(route_id='R-STATS', route_name='A to C')
+        cls.stops = [
+            RouteStop.objects.create(route=cls.route, stop_name=name, stop_order=order)
+            for order, name in enumerate('ABC', start=1)
+        ]
+        cls.trip = Trip.objects.create(
+            trip_id='T-STATS', route=cls.route, driver=cls.driver, trip_date=date(2030, 1, 7),
+            departure_time=time(8, 0), estimated_arrival_time=time(9, 0),
+            total_seats=4, available_seats=4, base_fare=Decimal('500.00'),
+        )
+
+    def book(self, booking_id, status='PENDING', fare='250.00'):
+        return Booking.objects.create(
+            booking_id=booking_id, trip=self.trip, passenger=self.passenger,
+            from_stop=self.stops[0], to_stop=self.stops[2], total_fare=Decimal(fare), booking_status=status,
+        )
+
+    def stats(self):
+        return RouteStatistics.objects.get(route=self.route)
+
+    def test_refresh_computes_counts_and_clears_stale(self):
+        self.book('B-1')
+        self.book('B-2', status='CANCELLED', fare='100.00')
+        self.assertEqual(RouteStatistics.refresh([self.route.id]), 1)
+        stats = self.stats()
+        self.assertFalse(stats.is_stale)
+        self.assertEqual((stats.total_stops, stats.total_trips, stats.scheduled_trips), (3, 1, 1))
+        self.assertEqual((stats.total_bookings, stats.cancelled_bookings), (2, 1))
+        self.assertEqual(stats.booking_revenue, Decimal('350.00'))
+        self.assertEqual(stats.trip_fare_total, Decimal('500.00'))
+
+    def test_writes_and_deletes_mark_the_route_stale(self):
+        RouteStatistics.refresh([self.route.id])
+        booking = self.book('B-1')
+        self.assertTrue(self.stats().is_stale)
+
+        RouteStatistics.refresh([self.route.id])
+        booking.delete()
+        self.assertTrue(self.stats().is_stale)
+
+        RouteStatistics.refresh([self.route.id])
+        self.stops[1].save()
+        self.assertTrue(self.stats().is_stale)
+
+        RouteStatistics.refresh([self.route.id])
+        self.assertEqual(list(RouteStatistics.stale_route_ids()), [])
+
+    def test_for_route_serves_a_recently_refreshed_stale_row(self):
+        RouteStatistics.refresh([self.route.id])
+        Trip.objects.filter(pk=self.trip.pk).update(trip_status='CANCELLED')
+        RouteStatistics.mark_stale([self.route.id])
+
+        stats = RouteStatistics.for_route(self.route.id)
+        self.assertTrue(stats.is_stale)
+        self.assertEqual(stats.cancelled_trips, 0)
+
+        RouteStatistics.objects.filter(route=self.route).update(
+            refreshed_at=timezone.now() - timedelta(seconds=REFRESH_ON_READ_SECONDS + 1)
+        )
+        stats = RouteStatistics.for_route(self.route.id)
+        self.assertFalse(stats.is_stale)
+        self.assertEqual(stats.cancelled_trips, 1)
+
+    def test_for_route_builds_a_missing_row(self):
+        self.assertFalse(RouteStatistics.objects.filter(route=self.route).exists())
+        self.assertEqual(RouteStatistics.for_route(self.route.id).total_stops, 3)
+        self.assertIsNone(RouteStatistics.for_route(self.route.id + 1000))
+
+
+class FareQuoteCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        driver = UsersData.objects.create(
+            name='Driver', username='driver', email='driver@example.com', password='x', address='a',
+            phone_no='+923001234567', cnic_no='12345-1234567-1', gender='male',
+        )
+        cls.vehicle = Vehicle.objects.create(
+            owner=driver, model_number='Corolla', company_name='Toyota', plate_number='ABC-123',
+            vehicle_type='FW', seats=4, fuel_type='Petrol',
+        )
+        cls.route = Route.objects.create(route_id='R-QUOTE', route_name='A to B')
+        for order, km in ((1, '0.00'), (2, '12.50')):
+            RouteStop.objects.create(
+                route=cls.route, stop_name=f'S{order}', stop_order=order,
+                distance_from_start_km=Decimal(km), estimated_time_from_start=int(float(km) * 1.2),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def preview(self):
+        response = self.client.post('/lets_go/calculate_fare/', json.dumps({
+            'route_id': self.route.route_id, 'vehicle_id': self.vehicle.id,
+            'departure_time': '12:00', 'trip_date': '2030-01-07', 'total_seats': 2,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['fare']
+
+    def test_repeated_preview_is_a_cache_hit(self):
+        first = self.preview()
+        self.assertEqual(quote_cache_stats(), {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+        self.assertEqual(self.preview(), first)
+        self.assertEqual(quote_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
@@ -2,6 +2,9 @@ from django.urls import path
 from . import views_authentication
 from . import views_rideposting
 from . import views_ridebooking
+from . import views_chat
+from . import views_realtime
+from . import views_trip_templates
 # from . import views_notifications
 urlpatterns = [
     path('login/', views_authentication.login, name='login'),
@@ -37,10 +40,26 @@ urlpatterns = [
     path('ride-booking/<str:trip_id>/request/', views_rideposting.handle_ride_booking_request, name='handle_ride_booking_request'),
     # Driver request management
     path('ride-booking/<str:trip_id>/requests/', views_rideposting.list_pending_requests, name='list_pending_requests'),
+    path('ride-booking/<str:trip_id>/requests/poll/', views_realtime.poll_pending_requests, name='poll_pending_requests'),
+    path('ride-booking/<str:trip_id>/requests/bulk-respond/', views_rideposting.bulk_respond_booking_requests, name='bulk_respond_booking_requests'),
     path('ride-booking/<str:trip_id>/requests/<int:booking_id>/', views_rideposting.booking_request_details, name='booking_request_details'),
     path('ride-booking/<str:trip_id>/requests/<int:booking_id>/respond/', views_rideposting.respond_booking_request, name='respond_booking_request'),
     # Passenger decision endpoint
     path('ride-booking/<str:trip_id>/requests/<int:booking_id>/passenger-respond/', views_rideposting.passenger_respond_booking, name='passenger_respond_booking'),
+    path('ride-booking/<str:trip_id>/negotiation-history/', views_rideposting.negotiation_history, name='negotiation_history'),
+    
+    # Recurring trip templates
+    path('trip-templates/', views_trip_templates.trip_templates, name='trip_templates'),
+    path('trip-templates/<int:template_id>/materialize/', views_trip_templates.materialize_trip_template, name='materialize_trip_template'),
+    path('trip-templates/<int:template_id>/deactivate/', views_trip_templates.deactivate_trip_template, name='deactivate_trip_template'),
+    
+    # Trip chat
+    path('events/stream/', views_realtime.event_stream, name='event_stream'),
+    path('chat/unread-counts/', views_chat.chat_unread_counts, name='chat_unread_counts'),
+    path('chat/<str:trip_id>/messages/', views_chat.chat_messages, name='chat_messages'),
+    path('chat/<str:trip_id>/sync/', views_chat.chat_sync, name='chat_sync'),
+    path('chat/<str:trip_id>/read/', views_chat.chat_mark_read, name='chat_mark_read'),
+    path('chat/<str:trip_id>/messages/<int:message_id>/receipts/', views_chat.chat_message_receipts, name='chat_message_receipts'),
     
     # Additional endpoints that might be needed
     path('routes/<int:route_id>/', views_rideposting.get_route_details, name='get_route_details'),
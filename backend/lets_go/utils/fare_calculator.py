@@ -1,35 +1,29 @@
 """
 Fare calculation utilities for the bus/shuttle service
 """
-from decimal import Decimal
-from datetime import datetime, time
+from datetime import date, datetime, time
 from typing import Dict, List, Optional, Tuple
 from django.utils import timezone
 
-def is_peak_hour(current_time: time) -> bool:
+from .fare_rules import get_fare_rules
+from .money import Money, money_json
+
+def is_peak_hour(current_time: time, on_date: Optional[date] = None) -> bool:
     """
-    Determine if current time is peak hour
+    Determine if a time (on a date, default today) is in a peak pricing window
     
-    Peak hours are typically:
-    - Morning: 7:00 AM - 9:00 AM
-    - Evening: 5:00 PM - 7:00 PM
+    The windows come from the pricing calendar of the active fare rules
+    (utils/fare_rules.py): weekday rush hours, weekend evenings, holidays
+    and Ramadan timings, in 15-minute buckets.
     """
-    morning_start = time(7, 0)  # 7:00 AM
-    morning_end = time(9, 0)    # 9:00 AM
-    evening_start = time(17, 0) # 5:00 PM
-    evening_end = time(19, 0)   # 7:00 PM
-    
-    return (
-        (morning_start <= current_time <= morning_end) or
-        (evening_start <= current_time <= evening_end)
-    )
+    return get_fare_rules().time_multiplier(on_date or timezone.localdate(), current_time) > 1
 
 def calculate_distance_fare(
     from_stop_order: int,
     to_stop_order: int,
     fare_matrix: Dict[Tuple[int, int], Dict],
     is_peak_hour: bool = False
-) -> Decimal:
+) -> Money:
     """
     Calculate fare based on distance between stops
     
@@ -40,7 +34,7 @@ def calculate_distance_fare(
         is_peak_hour: Whether current time is peak hour
     
     Returns:
-        Calculated fare amount
+        Calculated fare for one seat
     """
     if from_stop_order >= to_stop_order:
         raise ValueError("Pickup stop must come before drop-off stop")
@@ -54,9 +48,9 @@ def calculate_distance_fare(
     
     # Return appropriate fare based on time
     if is_peak_hour:
-        return Decimal(str(fare_data['peak_fare']))
+        return Money.parse(fare_data['peak_fare'])
     else:
-        return Decimal(str(fare_data['off_peak_fare']))
+        return Money.parse(fare_data['off_peak_fare'])
 
 def calculate_booking_fare(
     from_stop_order: int,
@@ -80,14 +74,14 @@ def calculate_booking_fare(
         seat_discount: Discount per seat for multiple seats (0.0 to 1.0)
     
     Returns:
-        Dictionary with fare breakdown
+        Dictionary with fare breakdown; amounts are Money (serialize with money_json)
     """
     if booking_time is None:
         booking_time = timezone.now()
     
     # Determine if peak hour
-    current_time = booking_time.time()
-    peak_hour = is_peak_hour(current_time)
+    local_time = timezone.localtime(booking_time) if timezone.is_aware(booking_time) else booking_time
+    peak_hour = is_peak_hour(local_time.time(), local_time.date())
     
     # Calculate base fare for one seat
     base_fare = calculate_distance_fare(
@@ -98,29 +92,27 @@ def calculate_booking_fare(
     )
     
     # Apply base fare multiplier
-    adjusted_base_fare = base_fare * Decimal(str(base_fare_multiplier))
+    adjusted_base_fare = base_fare.scale(base_fare_multiplier) if base_fare_multiplier != 1 else base_fare
     
     # Calculate seat discount
-    if number_of_seats > 1 and seat_discount > 0:
-        discount_per_seat = adjusted_base_fare * Decimal(str(seat_discount))
-        fare_per_seat = adjusted_base_fare - discount_per_seat
-    else:
-        fare_per_seat = adjusted_base_fare
+    seat_discount_applied = number_of_seats > 1 and seat_discount > 0
+    discount_per_seat = adjusted_base_fare.scale(seat_discount) if seat_discount_applied else Money(0)
+    fare_per_seat = adjusted_base_fare - discount_per_seat
     
-    # Calculate total fare
+    # Calculate total fare (integer paisa, exact)
     total_fare = fare_per_seat * number_of_seats
     
     # Prepare breakdown
     breakdown = {
-        'base_fare_per_seat': float(base_fare),
-        'adjusted_base_fare_per_seat': float(adjusted_base_fare),
-        'fare_per_seat': float(fare_per_seat),
+        'base_fare_per_seat': base_fare,
+        'adjusted_base_fare_per_seat': adjusted_base_fare,
+        'fare_per_seat': fare_per_seat,
         'number_of_seats': number_of_seats,
-        'total_fare': float(total_fare),
+        'total_fare': total_fare,
         'is_peak_hour': peak_hour,
         'base_fare_multiplier': base_fare_multiplier,
-        'seat_discount_applied': seat_discount > 0 and number_of_seats > 1,
-        'discount_per_seat': float(adjusted_base_fare * Decimal(str(seat_discount))) if seat_discount > 0 and number_of_seats > 1 else 0.0,
+        'seat_discount_applied': seat_discount_applied,
+        'discount_per_seat': discount_per_seat,
         'distance_km': fare_matrix.get((from_stop_order, to_stop_order), {}).get('distance_km', 0),
         'calculation_time': booking_time.isoformat()
     }
@@ -135,7 +127,7 @@ def get_fare_matrix_for_route(route_id: int) -> Dict[Tuple[int, int], Dict]:
         route_id: ID of the route
     
     Returns:
-        Dictionary mapping (from_order, to_order) to fare data
+        Dictionary mapping (from_order, to_order) to fare data (fares as Money)
     """
     from ..models import FareMatrix
     
@@ -148,9 +140,9 @@ def get_fare_matrix_for_route(route_id: int) -> Dict[Tuple[int, int], Dict]:
     for fare in fares:
         key = (fare.from_stop.stop_order, fare.to_stop.stop_order)
         fare_matrix[key] = {
-            'base_fare': float(fare.base_fare),
-            'peak_fare': float(fare.peak_fare),
-            'off_peak_fare': float(fare.off_peak_fare),
+            'base_fare': Money.from_decimal(fare.base_fare),
+            'peak_fare': Money.from_decimal(fare.peak_fare),
+            'off_peak_fare': Money.from_decimal(fare.off_peak_fare),
             'distance_km': float(fare.distance_km),
             'from_stop_name': fare.from_stop.stop_name,
             'to_stop_name': fare.to_stop.stop_name
@@ -226,49 +218,24 @@ def calculate_route_statistics(route_id: int) -> Dict[str, any]:
     Returns:
         Dictionary with route statistics
     """
-    from ..models import Route, RouteStop, FareMatrix, Trip, Booking
+    from ..models import Route, RouteStatistics
     
     try:
-        route = Route.objects.get(id=route_id)
-        stops = route.route_stops.all().order_by('stop_order')
-        fares = route.fare_matrix.all()
-        trips = route.trips.all()
-        bookings = Booking.objects.filter(trip__route_id=route_id)
-        
-        # Calculate statistics
-        total_stops = stops.count()
-        total_fare_segments = fares.count()
-        total_trips = trips.count()
-        total_bookings = bookings.count()
-        
-        # Calculate average fare
-        if fares.exists():
-            from django.db import models
-            avg_base_fare = fares.aggregate(
-                avg_base=models.Avg('base_fare'),
-                avg_peak=models.Avg('peak_fare'),
-                avg_off_peak=models.Avg('off_peak_fare')
-            )
-        else:
-            avg_base_fare = {'avg_base': 0, 'avg_peak': 0, 'avg_off_peak': 0}
-        
-        # Calculate total revenue
-        total_revenue = bookings.aggregate(
-            total=models.Sum('total_fare')
-        )['total'] or 0
+        route = Route.objects.only('id', 'route_name', 'total_distance_km', 'estimated_duration_minutes').get(id=route_id)
+        stats = RouteStatistics.for_route(route.id)
         
         return {
             'route_id': route_id,
             'route_name': route.route_name,
-            'total_stops': total_stops,
-            'total_fare_segments': total_fare_segments,
-            'total_trips': total_trips,
-            'total_bookings': total_bookings,
-            'total_revenue': float(total_revenue),
+            'total_stops': stats.total_stops,
+            'total_fare_segments': stats.total_fare_segments,
+            'total_trips': stats.total_trips,
+            'total_bookings': stats.total_bookings,
+            'total_revenue': money_json(stats.booking_revenue),
             'average_fares': {
-                'base': float(avg_base_fare['avg_base'] or 0),
-                'peak': float(avg_base_fare['avg_peak'] or 0),
-                'off_peak': float(avg_base_fare['avg_off_peak'] or 0)
+                'base': money_json(stats.avg_base_fare),
+                'peak': money_json(stats.avg_peak_fare),
+                'off_peak': money_json(stats.avg_off_peak_fare)
             },
             'route_distance_km': float(route.total_distance_km or 0),
             'estimated_duration_minutes': route.estimated_duration_minutes or 0
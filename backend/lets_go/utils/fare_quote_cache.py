@@ -0,0 +1,69 @@
+"""
+Cache of whole-route fare quotes
+
+A route quote depends only on the route, the fare rule version, the vehicle's
+fuel type, vehicle type and seat-factor tier, the pricing-calendar time
+multiplier of the departure, and the bulk-discount tier of the seat count.
+Quotes are cached under exactly those inputs, so repeated fare previews for
+the same trip shape skip the leg-table query and the arithmetic. Entries
+expire after ``FARE_QUOTE_TTL_SECONDS``. Publishing a new rule version changes
+every key, so stale quotes are never served.
+
+Hits and misses are counted in the same cache, so they cover every process
+that shares it. The admin KPI endpoint reports them.
+"""
+from decimal import Decimal
+from typing import Callable, Dict
+
+from django.core.cache import cache
+
+from .fare_rules import CompiledFareRules
+
+FARE_QUOTE_TTL_SECONDS = 10 * 60
+
+STATS_KEY_PREFIX = 'fare_quote_stats:'
+
+
+def quote_cache_key(rules: CompiledFareRules, route_id: int, vehicle, time_multiplier: Decimal, total_seats: int) -> str:
+    """Key over the normalized inputs that can change a quote"""
+    seats = vehicle.seats or 0
+    seat_tier = min(seats, len(rules.seat_factor_by_seats) - 1) if seats else 0
+    seat_count_tier = total_seats if 1 <= total_seats <= len(rules.bulk_discounts) else 'max'
+    fuel = (vehicle.fuel_type or rules.default_fuel_type).replace(' ', '_')
+    vehicle_type = (vehicle.vehicle_type or '').replace(' ', '_')
+    return (
+        f"fare_quote:v{rules.version}:r{route_id}:{fuel}:{vehicle_type}:"
+        f"s{seat_tier}:t{time_multiplier.normalize()}:n{seat_count_tier}"
+    )
+
+
+def _record(outcome: str):
+    key = STATS_KEY_PREFIX + outcome
+    try:
+        cache.incr(key)
+    except ValueError:  # First count, or the counter was evicted
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_or_compute_quote(rules: CompiledFareRules, route_id: int, vehicle, time_multiplier: Decimal, total_seats: int,
+                         compute: Callable[[], Dict]) -> Dict:
+    """Cached quote for these inputs, or compute() stored for FARE_QUOTE_TTL_SECONDS"""
+    key = quote_cache_key(rules, route_id, vehicle, time_multiplier, total_seats)
+    quote = cache.get(key)
+    if quote is not None:
+        _record('hits')
+        return quote
+    _record('misses')
+    quote = compute()
+    if 'error' not in quote.get('calculation_breakdown', {}):
+        cache.set(key, quote, timeout=FARE_QUOTE_TTL_SECONDS)
+    return quote
+
+
+def quote_cache_stats() -> Dict:
+    """Hit/miss counters kept in the cache (since it was last cleared)"""
+    counts = cache.get_many([STATS_KEY_PREFIX + 'hits', STATS_KEY_PREFIX + 'misses'])
+    hits, misses = counts.get(STATS_KEY_PREFIX + 'hits', 0), counts.get(STATS_KEY_PREFIX + 'misses', 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 4) if total else 0.0}
@@ -0,0 +1,328 @@
+"""
+Table-driven fare rules for trip fares
+
+The rates, multipliers, minimum fares and discounts used by
+``calculate_pakistan_fare`` live in versioned ``FareRuleSet`` rows. The
+frozen ``FARE_RULES_V0`` (version 0) apply until a version has been
+published. The active version is compiled once into lookup tables and reused
+by every quote. Publishing a new version updates a cache key; each process
+notices on its next check (every ``RULES_CHECK_SECONDS``) and swaps in the
+newly compiled rules with a single reference assignment, so no redeploy is
+needed.
+
+Every quote carries its ``rule_version``. A published version stores its
+complete rules: keys it leaves out are filled from ``DEFAULT_FARE_RULES`` when
+it is published, never when it is loaded. Editing the defaults therefore only
+affects versions published afterwards, and a stored fare can always be
+recomputed with the rules it was quoted under.
+"""
+import bisect
+import copy
+import threading
+import time
+from datetime import date as date_cls
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+
+ACTIVE_VERSION_CACHE_KEY = 'fare_rules:active_version'
+RULES_CHECK_SECONDS = 5
+# Bounds how stale a per-process (locmem) cache can be; with a shared cache changes show up within RULES_CHECK_SECONDS
+ACTIVE_VERSION_TTL_SECONDS = 60
+
+# Version 0: the market constants previously hard-coded in calculate_pakistan_fare (2025),
+# with its 7-9 and 17-19 peak hours on every day. Fares quoted under version 0 must stay
+# reproducible: never edit this, change DEFAULT_FARE_RULES and publish a version instead.
+FARE_RULES_V0 = {
+    'default_fuel_type': 'Petrol',
+    'base_rate_per_km': {'Petrol': '22.00', 'Diesel': '20.00', 'CNG': '16.00', 'Electric': '14.00', 'Hybrid': '18.00'},
+    'vehicle_multipliers': {'TW': '0.7', 'FW': '1.0'},
+    'default_vehicle_multiplier': '1.0',
+    'peak_multiplier': '1.30',
+    'pricing_calendar': {
+        'day_classes': {'weekday': [['07:00', '09:00'], ['17:00', '19:00']]},
+        'weekdays': ['weekday'] * 7,
+        'dates': {},
+        'date_ranges': [],
+    },
+    'seat_factors': [[5, '1.10'], [8, '1.20']],
+    'distance_factors': [[5, '1.25'], [15, '1.0'], [30, '0.92']],
+    'long_distance_factor': '0.85',
+    'min_fares': {'TW': '100.00', 'FW': '150.00'},
+    'default_min_fare': '120.00',
+    'bulk_discounts': ['0.0', '0.05', '0.08', '0.12', '0.15'],
+    'max_bulk_discount': '0.18',
+    'fuel_efficiency': {'Petrol': '12.0', 'Diesel': '15.0', 'CNG': '18.0', 'Electric': '8.0', 'Hybrid': '14.0'},
+    'default_fuel_efficiency': '12.0',
+    'fuel_costs': {'Petrol': '275.0', 'Diesel': '285.0', 'CNG': '230.0', 'Electric': '25.0', 'Hybrid': '275.0'},
+    'default_fuel_cost': '275.0',
+}
+
+# Keys every stored version has; keys added to the schema later need a neutral default in the compiler
+REQUIRED_RULE_KEYS = frozenset(FARE_RULES_V0)
+REQUIRED_CALENDAR_KEYS = ('day_classes', 'weekdays')
+
+# Values for keys a newly published version leaves out (merged in by merge_fare_rules at publish time)
+DEFAULT_FARE_RULES = {
+    'default_fuel_type': 'Petrol',
+    # PKR per km by fuel type
+    'base_rate_per_km': {'Petrol': '22.00', 'Diesel': '20.00', 'CNG': '16.00', 'Electric': '14.00', 'Hybrid': '18.00'},
+    'vehicle_multipliers': {'TW': '0.7', 'FW': '1.0'},
+    'default_vehicle_multiplier': '1.0',
+    'peak_multiplier': '1.30',
+    # Time-of-day pricing: windows are [start, end) as "HH:MM", with an optional own multiplier
+    # (default peak_multiplier). Compiled to one multiplier per 15 minutes for each day class.
+    'pricing_calendar': {
+        'day_classes': {
+            'weekday': [['07:00', '09:00'], ['17:00', '19:00']],
+            'weekend': [['17:00', '19:00', '1.15']],
+            'holiday': [],
+            # Suhoor-shifted office hours and the pre-iftar rush
+            'ramadan': [['08:30', '10:30'], ['15:00', '18:30']],
+        },
+        # Monday..Sunday
+        'weekdays': ['weekday', 'weekday', 'weekday', 'weekday', 'weekday', 'weekday', 'weekend'],
+        # "YYYY-MM-DD": day class, for public holidays
+        'dates': {},
+        # ["YYYY-MM-DD", "YYYY-MM-DD", day class], inclusive, e.g. Ramadan
+        'date_ranges': [],
+    },
+    # [minimum vehicle seats, factor], larger vehicles cost more
+    'seat_factors': [[5, '1.10'], [8, '1.20']],
+    # [up to km, factor]; beyond the last tier long_distance_factor applies
+    'distance_factors': [[5, '1.25'], [15, '1.0'], [30, '0.92']],
+    'long_distance_factor': '0.85',
+    'min_fares': {'TW': '100.00', 'FW': '150.00'},
+    'default_min_fare': '120.00',
+    # Discount by seats booked: index 0 = 1 seat; more seats than listed get max_bulk_discount
+    'bulk_discounts': ['0.0', '0.05', '0.08', '0.12', '0.15'],
+    'max_bulk_discount': '0.18',
+    # km per litre / kg / kWh, and PKR per unit
+    'fuel_efficiency': {'Petrol': '12.0', 'Diesel': '15.0', 'CNG': '18.0', 'Electric': '8.0', 'Hybrid': '14.0'},
+    'default_fuel_efficiency': '12.0',
+    'fuel_costs': {'Petrol': '275.0', 'Diesel': '285.0', 'CNG': '230.0', 'Electric': '25.0', 'Hybrid': '275.0'},
+    'default_fuel_cost': '275.0',
+}
+
+
+def _dec(value) -> Decimal:
+    return Decimal(str(value))
+
+
+def merge_fare_rules(rules: Optional[Dict], base: Dict = DEFAULT_FARE_RULES) -> Dict:
+    """Complete rules from base (pricing_calendar is merged key by key), for storing as a version"""
+    rules = copy.deepcopy(rules or {})
+    merged = {**copy.deepcopy(base), **rules}
+    merged['pricing_calendar'] = {**copy.deepcopy(base['pricing_calendar']), **rules.get('pricing_calendar', {})}
+    return merged
+
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+
+def _bucket(hhmm: str) -> int:
+    hours, minutes = (int(part) for part in hhmm.split(':'))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"Invalid time {hhmm}")
+    return (hours * 60 + minutes) // BUCKET_MINUTES
+
+
+class PricingCalendar:
+    """Per-15-minute time multipliers for each day class, plus the date → day class mapping"""
+
+    def __init__(self, config: Dict, peak_multiplier: Decimal):
+        self.buckets: Dict[str, List[Decimal]] = {}
+        for day_class, windows in config['day_classes'].items():
+            multipliers = [Decimal('1.0')] * BUCKETS_PER_DAY
+            for window in windows:
+                start, end = _bucket(window[0]), _bucket(window[1])
+                multiplier = _dec(window[2]) if len(window) > 2 else peak_multiplier
+                for i in range(start, end):
+                    multipliers[i] = multiplier
+            self.buckets[day_class] = multipliers
+
+        self.weekday_classes = list(config['weekdays'])
+        if len(self.weekday_classes) != 7:
+            raise ValueError('pricing_calendar.weekdays must list 7 day classes, Monday first')
+        self.date_classes = {date_cls.fromisoformat(d): c for d, c in config.get('dates', {}).items()}
+        for start, end, day_class in config.get('date_ranges', []):
+            start, end = date_cls.fromisoformat(start), date_cls.fromisoformat(end)
+            for ordinal in range(start.toordinal(), end.toordinal() + 1):
+                # Single dates (holidays) win over ranges (Ramadan)
+                self.date_classes.setdefault(date_cls.fromordinal(ordinal), day_class)
+        unknown = (set(self.weekday_classes) | set(self.date_classes.values())) - set(self.buckets)
+        if unknown:
+            raise ValueError(f"Undefined day classes: {', '.join(sorted(unknown))}")
+
+    def day_class(self, on_date) -> str:
+        return self.date_classes.get(on_date) or self.weekday_classes[on_date.weekday()]
+
+    def multiplier(self, on_date, at_time) -> Decimal:
+        """Time multiplier for a departure: a dict lookup and an array index"""
+        bucket = (at_time.hour * 60 + at_time.minute) // BUCKET_MINUTES
+        return self.buckets[self.day_class(on_date)][bucket]
+
+
+class CompiledFareRules:
+    """One rule version compiled into dicts of Decimals and sorted tier arrays"""
+
+    def __init__(self, version: int, rules: Dict):
+        missing = REQUIRED_RULE_KEYS - set(rules or {})
+        missing |= {f'pricing_calendar.{k}' for k in REQUIRED_CALENDAR_KEYS if k not in (rules or {}).get('pricing_calendar', {})}
+        if missing:
+            raise ValueError(f"Incomplete fare rules, missing: {', '.join(sorted(missing))}")
+        self.version = version
+        self.default_fuel_type = rules['default_fuel_type']
+        self.base_rates = {k: _dec(v) for k, v in rules['base_rate_per_km'].items()}
+        if self.default_fuel_type not in self.base_rates:
+            raise ValueError(f"default_fuel_type {self.default_fuel_type} has no base rate")
+        self.vehicle_multipliers = {k: _dec(v) for k, v in rules['vehicle_multipliers'].items()}
+        self.default_vehicle_multiplier = _dec(rules['default_vehicle_multiplier'])
+        self.peak_multiplier = _dec(rules['peak_multiplier'])
+        self.calendar = PricingCalendar(rules['pricing_calendar'], self.peak_multiplier)
+
+        # seat_factor_by_seats[n] is the factor for an n-seat vehicle, capped at the largest tier
+        seat_tiers = sorted((int(seats), _dec(factor)) for seats, factor in rules['seat_factors'])
+        top = seat_tiers[-1][0] if seat_tiers else 0
+        self.seat_factor_by_seats = []
+        for seats in range(top + 1):
+            factor = Decimal('1.0')
+            for min_seats, tier_factor in seat_tiers:
+                if seats >= min_seats:
+                    factor = tier_factor
+            self.seat_factor_by_seats.append(factor)
+
+        distance_tiers = sorted((float(km), _dec(factor)) for km, factor in rules['distance_factors'])
+        self.distance_limits = [km for km, _ in distance_tiers]
+        self.distance_factors = [factor for _, factor in distance_tiers] + [_dec(rules['long_distance_factor'])]
+
+        self.min_fares = {k: _dec(v) for k, v in rules['min_fares'].items()}
+        self.default_min_fare = _dec(rules['default_min_fare'])
+        self.bulk_discounts = [_dec(v) for v in rules['bulk_discounts']]
+        self.max_bulk_discount = _dec(rules['max_bulk_discount'])
+        self.fuel_efficiency = {k: _dec(v) for k, v in rules['fuel_efficiency'].items()}
+        self.default_fuel_efficiency = _dec(rules['default_fuel_efficiency'])
+        self.fuel_costs = {k: _dec(v) for k, v in rules['fuel_costs'].items()}
+        self.default_fuel_cost = _dec(rules['default_fuel_cost'])
+
+    def seat_factor(self, vehicle_seats: Optional[int]) -> Decimal:
+        if not vehicle_seats:
+            return Decimal('1.0')
+        return self.seat_factor_by_seats[min(vehicle_seats, len(self.seat_factor_by_seats) - 1)]
+
+    def distance_factor(self, distance_km: float) -> Decimal:
+        return self.distance_factors[bisect.bisect_left(self.distance_limits, distance_km)]
+
+    def bulk_discount(self, seats: int) -> Decimal:
+        if 1 <= seats <= len(self.bulk_discounts):
+            return self.bulk_discounts[seats - 1]
+        return self.max_bulk_discount
+
+    def time_multiplier(self, on_date, at_time) -> Decimal:
+        """Pricing calendar multiplier for a departure date and time"""
+        return self.calendar.multiplier(on_date, at_time)
+
+    def quote(self, total_distance_km: float, fuel_type: Optional[str], vehicle_type: Optional[str],
+              vehicle_seats: Optional[int], time_multiplier: Decimal, total_seats: int = 1) -> Dict:
+        """
+        Fare for a whole route
+
+        Returns:
+            dict with base_fare, rule_version and calculation_breakdown
+        """
+        fuel_type = fuel_type or self.default_fuel_type
+        base_rate_per_km = self.base_rates.get(fuel_type, self.base_rates[self.default_fuel_type])
+        vehicle_multiplier = self.vehicle_multipliers.get(vehicle_type, self.default_vehicle_multiplier)
+        seat_factor = self.seat_factor(vehicle_seats)
+        distance_factor = self.distance_factor(total_distance_km)
+        distance = _dec(total_distance_km)
+
+        base_fare = base_rate_per_km * distance * vehicle_multiplier * time_multiplier * seat_factor * distance_factor
+        base_fare = max(base_fare, self.min_fares.get(vehicle_type, self.default_min_fare))
+        discount = self.bulk_discount(total_seats)
+        final_fare = base_fare * (Decimal('1.0') - discount)
+
+        # Fuel cost for transparency
+        efficiency = self.fuel_efficiency.get(fuel_type, self.default_fuel_efficiency)
+        fuel_consumed = distance / efficiency
+        fuel_cost = fuel_consumed * self.fuel_costs.get(fuel_type, self.default_fuel_cost)
+
+        return {
+            'base_fare': float(final_fare),
+            'rule_version': self.version,
+            'calculation_breakdown': {
+                'total_distance_km': float(total_distance_km),
+                'base_rate_per_km': float(base_rate_per_km),
+                'vehicle_multiplier': float(vehicle_multiplier),
+                'time_multiplier': float(time_multiplier),
+                'seat_factor': float(seat_factor),
+                'distance_factor': float(distance_factor),
+                'is_peak_hour': time_multiplier > 1,
+                'bulk_discount': float(discount * 100),  # Percentage
+                'min_fare_applied': float(final_fare) < float(base_fare),
+                'fuel_type': fuel_type,
+                'fuel_consumed': float(fuel_consumed),
+                'fuel_cost': float(fuel_cost),
+                'fuel_efficiency_km_per_unit': float(efficiency),
+                'profit_margin': float(final_fare - fuel_cost),
+                'profit_percentage': float(((final_fare - fuel_cost) / final_fare) * 100) if final_fare > 0 else 0,
+                'rule_version': self.version,
+                'calculation_formula': f"Base Rate ({base_rate_per_km} PKR/km) × Distance ({total_distance_km:.1f}km) × Vehicle ({vehicle_multiplier}) × Time ({time_multiplier}) × Seats ({seat_factor}) × Distance Factor ({distance_factor}) × Discount ({1-discount})"
+            }
+        }
+
+
+_lock = threading.Lock()
+_active: Optional[CompiledFareRules] = None
+_checked_at = 0.0
+_by_version: Dict[int, CompiledFareRules] = {}
+
+
+def _load_version(version: int) -> CompiledFareRules:
+    compiled = _by_version.get(version)
+    if compiled is None:
+        if version == 0:
+            compiled = CompiledFareRules(0, FARE_RULES_V0)
+        else:
+            from ..models import FareRuleSet
+            compiled = CompiledFareRules(version, FareRuleSet.objects.values_list('rules', flat=True).get(version=version))
+        _by_version[version] = compiled
+    return compiled
+
+
+def _active_version() -> int:
+    version = cache.get(ACTIVE_VERSION_CACHE_KEY)
+    if version is None:
+        from ..models import FareRuleSet
+        version = FareRuleSet.objects.filter(is_active=True).values_list('version', flat=True).first() or 0
+        cache.set(ACTIVE_VERSION_CACHE_KEY, version, timeout=ACTIVE_VERSION_TTL_SECONDS)
+    return version
+
+
+def announce_active_version(version: int):
+    """Tell every process a new version is active; each picks it up on its next check"""
+    global _checked_at
+    cache.set(ACTIVE_VERSION_CACHE_KEY, version, timeout=ACTIVE_VERSION_TTL_SECONDS)
+    _checked_at = 0.0
+
+
+def get_fare_rules(version: Optional[int] = None) -> CompiledFareRules:
+    """Compiled rules for `version`, or the active version (re-checked every RULES_CHECK_SECONDS)"""
+    global _active, _checked_at
+    if version is not None:
+        with _lock:
+            return _load_version(version)
+
+    now = time.monotonic()
+    active = _active
+    if active is not None and now - _checked_at < RULES_CHECK_SECONDS:
+        return active
+    with _lock:
+        if _active is None or now - _checked_at >= RULES_CHECK_SECONDS:
+            current = _active_version()
+            if _active is None or _active.version != current:
+                _active = _load_version(current)
+            _checked_at = now
+        return _active
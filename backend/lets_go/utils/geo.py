@@ -0,0 +1,66 @@
+"""
+Great-circle distance helpers for routes
+
+Every function takes a whole sequence of (lat, lng) points in degrees and
+converts each point to radians and its cosine once, so leg lengths,
+cumulative distances and stop-to-stop matrices are computed in one pass
+instead of one call per pair of stops.
+"""
+import math
+from typing import Iterable, List, Sequence, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+Point = Tuple[float, float]
+
+
+def _prepare(points: Iterable[Point]) -> List[Tuple[float, float, float]]:
+    """(lat_rad, lng_rad, cos(lat)) per point"""
+    prepared = []
+    for lat, lng in points:
+        lat_r = math.radians(float(lat))
+        prepared.append((lat_r, math.radians(float(lng)), math.cos(lat_r)))
+    return prepared
+
+
+def _haversine(a, b) -> float:
+    lat1, lng1, cos1 = a
+    lat2, lng2, cos2 = b
+    h = math.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, h)))
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distance between two points in kilometres"""
+    a, b = _prepare([(lat1, lng1), (lat2, lng2)])
+    return _haversine(a, b)
+
+
+def leg_distances(points: Sequence[Point]) -> List[float]:
+    """Distance of each consecutive leg; len(points) - 1 values"""
+    prepared = _prepare(points)
+    return [_haversine(a, b) for a, b in zip(prepared, prepared[1:])]
+
+
+def cumulative_distances(points: Sequence[Point]) -> List[float]:
+    """Distance from the first point to each point along the path, starting at 0"""
+    cumulative = [0.0] if points else []
+    for leg in leg_distances(points):
+        cumulative.append(cumulative[-1] + leg)
+    return cumulative
+
+
+def path_length_km(points: Sequence[Point]) -> float:
+    """Total length of the path through all points"""
+    return sum(leg_distances(points))
+
+
+def distance_matrix(points: Sequence[Point]) -> List[List[float]]:
+    """Symmetric n x n matrix of straight-line distances between every pair of points"""
+    prepared = _prepare(points)
+    n = len(prepared)
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            matrix[i][j] = matrix[j][i] = _haversine(prepared[i], prepared[j])
+    return matrix
@@ -0,0 +1,71 @@
+"""
+Time-ordered identifiers for trips and bookings
+
+IDs are ULIDs (48-bit millisecond timestamp + 80 random bits, Crockford
+base32) behind a one-letter prefix, e.g. ``T01J9ZK3Q8W4N6V2R7C5X1B0HDM``.
+They are generated in-process without a database round trip, sort by creation
+time and stay monotonic within the same millisecond, so inserts into the
+unique ``trip_id``/``booking_id`` indexes land at the right edge of the B-tree.
+"""
+import os
+import threading
+import time
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(CROCKFORD_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def new_ulid() -> str:
+    """
+    Return a 26-character ULID
+
+    Within the same millisecond the random part is incremented instead of
+    redrawn, so IDs generated by this process are strictly increasing.
+    """
+    global _last_ms, _last_random
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms <= _last_ms:
+            now_ms = _last_ms
+            _last_random += 1
+            if _last_random > RANDOM_MAX:
+                # Random space for this millisecond exhausted; borrow the next one
+                now_ms += 1
+                _last_random = int.from_bytes(os.urandom(10), 'big') >> 1
+        else:
+            # Keep the top bit clear so increments have room before overflowing
+            _last_random = int.from_bytes(os.urandom(10), 'big') >> 1
+        _last_ms = now_ms
+        random_part = _last_random
+    return _encode(now_ms, 10) + _encode(random_part, 16)
+
+
+def ulid_timestamp_ms(ulid: str) -> int:
+    """Decode the millisecond timestamp from a ULID (prefix letters are ignored)"""
+    value = 0
+    for char in ulid[-26:-16]:
+        value = (value << 5) | CROCKFORD_ALPHABET.index(char)
+    return value
+
+
+def generate_trip_id() -> str:
+    """Unique, time-ordered trip identifier"""
+    return f"T{new_ulid()}"
+
+
+def generate_booking_id() -> str:
+    """Unique, time-ordered booking identifier"""
+    return f"B{new_ulid()}"
@@ -0,0 +1,152 @@
+"""
+Idempotency-Key support for retry-prone POST endpoints
+
+Mobile clients on flaky networks retry requests such as trip creation and
+booking requests. When a client sends an ``Idempotency-Key`` header, the first
+response for that key is stored in the ``IdempotencyRecord`` table, and every
+retry with the same key is answered from the stored copy. The table is shared
+by all workers and instances, so a retry is replayed wherever it lands. Keys
+are scoped to the caller, so two users sending the same key never see each
+other's responses.
+"""
+import functools
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from ..models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60  # Replays are honoured for 24 hours
+IDEMPOTENCY_LOCK_SECONDS = 30           # Max time a first request may hold the key
+MAX_KEY_LENGTH = 255
+
+
+def get_idempotency_cache_key(scope: str, caller: str, key: str, path: str) -> str:
+    """Build a fixed-length storage key for a caller's idempotency key on a given path"""
+    return hashlib.sha256(f"{scope}|{caller}|{path}|{key}".encode('utf-8')).hexdigest()
+
+
+def _body_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body or b'').hexdigest()[:32]
+
+
+def _caller(request, caller_field: Optional[str]) -> str:
+    """The logged-in session user, else the acting user id the endpoint reads from its body"""
+    user_id = request.session.get('user_id') if hasattr(request, 'session') else None
+    if user_id:
+        return f"user:{user_id}"
+    if caller_field:
+        try:
+            data = json.loads(request.body or b'{}')
+        except (ValueError, UnicodeDecodeError):
+            data = None
+        if isinstance(data, dict) and data.get(caller_field) not in (None, ''):
+            return f"{caller_field}:{data[caller_field]}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _unpack_response(record: IdempotencyRecord) -> HttpResponse:
+    response = HttpResponse(
+        zlib.decompress(bytes(record.content or b'')),
+        status=record.status_code,
+        content_type=record.content_type,
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(cache_key: str, fingerprint: str):
+    """Claim a key by inserting its lock row. Returns (claimed, existing record or None).
+
+    The key is looked up first, so a retry of a finished request is a single
+    SELECT with no writes. Bulk cleanup is left to ``purge_idempotency_records``.
+    """
+    now = timezone.now()
+    record = IdempotencyRecord.objects.filter(key=cache_key).first()
+    if record is not None:
+        if record.expires_at > now and (record.is_complete or record.locked_until > now):
+            return False, record
+        # An expired replay or a lock left behind by a crashed first request; by pk,
+        # so a concurrent takeover's fresh row is never removed
+        IdempotencyRecord.objects.filter(pk=record.pk).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(
+                key=cache_key,
+                fingerprint=fingerprint,
+                locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+                expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+            )
+        return True, None
+    except IntegrityError:
+        return False, IdempotencyRecord.objects.filter(key=cache_key).first()
+
+
+def idempotent(scope: str, caller_field: Optional[str] = None) -> Callable:
+    """
+    Decorator making a POST view safe to retry with an ``Idempotency-Key`` header
+
+    ``caller_field`` names the body field holding the acting user's id, used
+    to scope keys when the request has no session user.
+
+    - No header: the view runs as before.
+    - First request with a key: the view runs and its response is stored
+      (server errors are not stored so the client can retry them).
+    - Retry with the same key and body: the stored response is replayed.
+    - Same key with a different body: 422.
+    - Same key while the first request is still running: 409.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(IDEMPOTENCY_HEADER)
+            if request.method != 'POST' or not key:
+                return view_func(request, *args, **kwargs)
+
+            key = key.strip()
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters'
+                }, status=400)
+
+            cache_key = get_idempotency_cache_key(scope, _caller(request, caller_field), key, request.path)
+            fingerprint = _body_fingerprint(request.body)
+
+            claimed, record = _claim(cache_key, fingerprint)
+            if not claimed:
+                if record is not None and record.fingerprint != fingerprint:
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'Idempotency-Key was already used with a different request body'
+                    }, status=422)
+                if record is not None and record.is_complete:
+                    return _unpack_response(record)
+                return JsonResponse({
+                    'success': False,
+                    'error': 'A request with this Idempotency-Key is already being processed'
+                }, status=409)
+
+            stored = False
+            try:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code < 500 and not getattr(response, 'streaming', False):
+                    IdempotencyRecord.objects.filter(key=cache_key).update(
+                        status_code=response.status_code,
+                        content_type=response.get('Content-Type', 'application/json'),
+                        content=zlib.compress(response.content),
+                    )
+                    stored = True
+                return response
+            finally:
+                if not stored:
+                    IdempotencyRecord.objects.filter(key=cache_key, status_code__isnull=True).delete()
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+"""
+Integer minor-unit money
+
+Amounts are held as whole paisa (1/100 rupee) in a plain int. Adding,
+subtracting, comparing and multiplying by a seat count are integer
+operations, and scaling by a rate rounds half up to the paisa once. Values
+are parsed once where they enter (request JSON, DecimalField, fare matrix)
+and leave through ``to_decimal()`` for model fields or ``to_float()`` /
+``money_json()`` for responses, instead of ``Decimal(str(...))`` round-trips
+at every step.
+"""
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Optional, Union
+
+Number = Union[int, float, str, Decimal]
+
+
+class Money:
+    """Immutable amount in paisa"""
+    __slots__ = ('paisa',)
+
+    def __init__(self, paisa: int = 0):
+        object.__setattr__(self, 'paisa', int(paisa))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Money is immutable')
+
+    def __reduce__(self):
+        return (Money, (self.paisa,))
+
+    @classmethod
+    def parse(cls, value: Union['Money', Number]) -> 'Money':
+        """Money from a rupee amount (int, float, numeric string or Decimal)"""
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, bool):
+            raise ValueError(f"Invalid amount: {value!r}")
+        if isinstance(value, int):
+            return cls(value * 100)
+        if isinstance(value, Decimal):
+            return cls.from_decimal(value)
+        if isinstance(value, float) and math.isfinite(value):
+            cents = value * 100
+            whole = round(cents)
+            if abs(cents - whole) < 1e-6:  # Already a whole paisa amount
+                return cls(whole)
+        try:
+            amount = Decimal(repr(value) if isinstance(value, float) else str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+        return cls.from_decimal(amount)
+
+    @classmethod
+    def from_decimal(cls, value: Decimal) -> 'Money':
+        """Money from a rupee Decimal, e.g. a DecimalField value"""
+        if not value.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        return cls(int(value.scaleb(2).to_integral_value(ROUND_HALF_UP)))
+
+    @classmethod
+    def optional(cls, value) -> Optional['Money']:
+        """parse(), passing None through"""
+        return None if value is None else cls.parse(value)
+
+    def to_decimal(self) -> Decimal:
+        """Rupees with two decimal places, for DecimalFields"""
+        return Decimal(self.paisa).scaleb(-2)
+
+    def to_float(self) -> float:
+        """Rupees as a float, for JSON responses"""
+        return self.paisa / 100
+
+    def scale(self, factor: Union[int, Decimal, float]) -> 'Money':
+        """Multiply by a rate or multiplier, rounding half up to the paisa"""
+        if isinstance(factor, int):
+            return Money(self.paisa * factor)
+        if not isinstance(factor, Decimal):
+            factor = Decimal(repr(factor))
+        return Money(int((self.paisa * factor).to_integral_value(ROUND_HALF_UP)))
+
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.paisa + other.paisa)
+
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.paisa - other.paisa)
+
+    def __mul__(self, count):
+        if not isinstance(count, int) or isinstance(count, bool):
+            return NotImplemented
+        return Money(self.paisa * count)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.paisa)
+
+    def __bool__(self):
+        return self.paisa != 0
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and self.paisa == other.paisa
+
+    def __lt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.paisa < other.paisa
+
+    def __le__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.paisa <= other.paisa
+
+    def __gt__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.paisa > other.paisa
+
+    def __ge__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.paisa >= other.paisa
+
+    def __hash__(self):
+        return hash(self.paisa)
+
+    def __str__(self):
+        sign = '-' if self.paisa < 0 else ''
+        rupees, paisa = divmod(abs(self.paisa), 100)
+        return f"{sign}{rupees}.{paisa:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+
+ZERO = Money(0)
+
+
+def money_json(value) -> Optional[float]:
+    """Serialize a Money, Decimal or number amount for a JSON response"""
+    if value is None:
+        return None
+    return Money.parse(value).to_float()
@@ -0,0 +1,210 @@
+"""
+Real-time event fan-out for chat, booking negotiation and trip status
+
+Producers (views and model methods running in sync code) call the ``publish_*``
+helpers; events are handed to the broker only after the surrounding database
+transaction commits, so subscribers never see changes that were rolled back.
+
+Consumers (the websocket and SSE endpoints in ``views_realtime``) subscribe to
+channels:
+
+- ``trip:<trip_id>``  chat messages, booking requests/responses, status changes
+- ``user:<user_id>``  events addressed to one user across all their trips
+
+The broker is chosen with the ``REALTIME_BROKER`` setting (dotted path to a
+class). The default ``InProcessBroker`` only reaches subscribers connected to
+the same process; a shared broker (e.g. Redis pub/sub) can be dropped in by
+implementing the same ``subscribe``/``unsubscribe``/``publish`` interface.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BROKER = 'lets_go.utils.realtime.InProcessBroker'
+SUBSCRIPTION_QUEUE_SIZE = 200
+
+
+def trip_channel(trip_id) -> str:
+    return f"trip:{trip_id}"
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """A consumer's bounded inbox, bound to the event loop it was created on"""
+
+    def __init__(self, channels):
+        self.channels = frozenset(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        self.dropped = 0
+
+    def _deliver(self, message: str):
+        # Runs on self.loop; a slow consumer loses its oldest events, not the producer's time
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def deliver_threadsafe(self, message: str):
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, message)
+        except RuntimeError:
+            pass  # Loop already closed; the subscriber is gone
+
+    async def get(self, timeout=None):
+        """Next serialized event, or None on timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """Channel registry for subscribers living in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channels) -> Subscription:
+        """Must be called from the consumer's event loop"""
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def publish(self, channels, message: str):
+        """Deliver a serialized event to every subscriber of any of channels (once each)"""
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._subscribers.get(channel, ()))
+        for subscription in targets:
+            subscription.deliver_threadsafe(message)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({s for subs in self._subscribers.values() for s in subs})
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Process-wide broker instance built from settings.REALTIME_BROKER"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'REALTIME_BROKER', DEFAULT_BROKER))()
+    return _broker
+
+
+def publish(channels, event_type: str, data: dict):
+    """
+    Queue an event for delivery once the current transaction commits
+
+    Failures are logged and swallowed; a missed push only means the client
+    falls back to its next sync, so it must never fail the request.
+    """
+    channels = [c for c in dict.fromkeys(channels) if c]
+    if not channels:
+        return
+    message = json.dumps({
+        'type': event_type,
+        'channels': channels,
+        'data': data,
+        'ts': int(time.time() * 1000),
+    }, cls=DjangoJSONEncoder)
+
+    def _send():
+        try:
+            get_broker().publish(channels, message)
+        except Exception:
+            logger.exception('Realtime publish failed for %s', event_type)
+
+    transaction.on_commit(_send)
+
+
+@functools.lru_cache(maxsize=4096)
+def _trip_code_for_chat_group(chat_group_id):
+    from ..models import TripChatGroup
+    return TripChatGroup.objects.filter(id=chat_group_id).values_list('trip__trip_id', flat=True).first()
+
+
+def publish_chat_message(message):
+    """New chat message -> trip channel"""
+    trip_code = _trip_code_for_chat_group(message.chat_group_id)
+    if trip_code is None:
+        return
+    publish([trip_channel(trip_code)], 'chat.message', {
+        'trip_id': trip_code,
+        'message_id': message.id,
+        'sender_id': message.sender_id,
+        'message_type': message.message_type,
+        'message_text': message.message_text,
+        'message_data': message.message_data,
+    })
+
+
+def _publish_booking_event(trip, booking, action, passenger_id, amount=None):
+    channels = [trip_channel(trip.trip_id), user_channel(trip.driver_id)]
+    if passenger_id:
+        channels.append(user_channel(passenger_id))
+    event_type = 'booking.request' if action == 'OFFER' else 'booking.response'
+    publish(channels, event_type, {
+        'trip_id': trip.trip_id,
+        'booking_id': getattr(booking, 'id', None),
+        'passenger_id': passenger_id,
+        'action': action,
+        'amount': amount,
+        'booking_status': getattr(booking, 'booking_status', None),
+        'bargaining_status': getattr(booking, 'bargaining_status', None),
+        'available_seats': trip.available_seats,
+    })
+
+
+def publish_booking_request(trip, booking):
+    """New booking request without a fare offer -> trip, driver and passenger channels"""
+    _publish_booking_event(trip, booking, 'OFFER', booking.passenger_id)
+
+
+def publish_negotiation_events(trip, events):
+    """Booking requests and driver/passenger responses -> trip, driver and passenger channels"""
+    for event in events:
+        _publish_booking_event(trip, event.booking, event.action, event.passenger_id, amount=event.amount)
+
+
+def publish_trip_status(trip, reason=None):
+    """Trip status change -> trip channel and driver channel"""
+    publish([trip_channel(trip.trip_id), user_channel(trip.driver_id)], 'trip.status', {
+        'trip_id': trip.trip_id,
+        'trip_status': trip.trip_status,
+        'available_seats': trip.available_seats,
+        'reason': reason,
+    })
@@ -0,0 +1,132 @@
+"""
+Route geometry helpers
+
+Canonical form of a route: its ordered stop coordinates snapped to a fixed
+grid. Two routes through the same stops in the same order, tapped a few metres
+apart, get the same geometry hash, so ``create_route`` can hand back the
+existing route instead of minting a duplicate.
+
+Paths are stored as encoded polylines, plus Douglas–Peucker simplified copies
+for a few map zoom levels, so map screens get one compact string instead of a
+list of {lat, lng} objects.
+"""
+import hashlib
+import math
+from typing import Dict, Iterable, List, Tuple
+
+# 3 decimal places ≈ 110 m of latitude: close enough to treat two stops as the same place
+ROUTE_HASH_DECIMALS = 3
+
+
+def quantize_points(points: Iterable[Tuple[float, float]], decimals: int = ROUTE_HASH_DECIMALS) -> List[Tuple[int, int]]:
+    """Snap (lat, lng) pairs to integer grid cells"""
+    scale = 10 ** decimals
+    return [(int(round(float(lat) * scale)), int(round(float(lng) * scale))) for lat, lng in points]
+
+
+def route_geometry_hash(points: Iterable[Tuple[float, float]], decimals: int = ROUTE_HASH_DECIMALS) -> str:
+    """SHA-256 of the quantized, ordered stop sequence"""
+    cells = quantize_points(points, decimals)
+    canonical = f"v1:{decimals}:" + ';'.join(f"{lat},{lng}" for lat, lng in cells)
+    return hashlib.sha256(canonical.encode('ascii')).hexdigest()
+
+
+# Encoded polylines (Google polyline algorithm, 1e-5 precision)
+
+# Simplified copies of a route's path are kept for these map zoom levels
+POLYLINE_ZOOM_LEVELS = (8, 12, 16)
+
+
+def encode_polyline(points: Iterable[Tuple[float, float]], precision: int = 5) -> str:
+    """Encode (lat, lng) pairs as a polyline string"""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_i = int(round(float(lat) * factor))
+        lng_i = int(round(float(lng) * factor))
+        for delta in (lat_i - prev_lat, lng_i - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        prev_lat, prev_lng = lat_i, lng_i
+    return ''.join(chunks)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """Decode a polyline string back to (lat, lng) pairs"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """Roughly one 256px web-map tile pixel, in degrees, at the given zoom"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_points(points: List[Tuple[float, float]], tolerance: float) -> List[Tuple[float, float]]:
+    """
+    Douglas–Peucker simplification; endpoints are always kept
+
+    Longitude is scaled by cos(latitude) so the tolerance means the same
+    distance in both directions. Iterative, so long paths cannot hit the
+    recursion limit.
+    """
+    points = [(float(lat), float(lng)) for lat, lng in points]
+    if len(points) < 3:
+        return points
+    scale = math.cos(math.radians(sum(lat for lat, _ in points) / len(points)))
+    xy = [(lng * scale, lat) for lat, lng in points]
+    tolerance_sq = tolerance * tolerance
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        seg_len_sq = dx * dx + dy * dy
+        max_dist_sq, index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if seg_len_sq == 0:
+                dist_sq = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / seg_len_sq))
+                dist_sq = (px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2
+            if dist_sq > max_dist_sq:
+                max_dist_sq, index = dist_sq, i
+        if index is not None and max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+def build_polyline_levels(points: List[Tuple[float, float]]) -> Dict[str, str]:
+    """Encoded, simplified path for each of POLYLINE_ZOOM_LEVELS, keyed by zoom"""
+    return {
+        str(zoom): encode_polyline(simplify_points(points, zoom_tolerance(zoom)))
+        for zoom in POLYLINE_ZOOM_LEVELS
+    }
@@ -0,0 +1,65 @@
+"""
+Per-route leg table
+
+Every RouteStop stores its cumulative distance (``distance_from_start_km``)
+and ETA (``estimated_time_from_start``) from the first stop, computed once
+when the route is created. Any segment's distance and duration is then a
+subtraction of two rows instead of a fresh haversine pass over the route.
+"""
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from .geo import cumulative_distances
+
+# Planning speed used for every ETA (matches calculate_estimated_arrival)
+AVERAGE_SPEED_KMH = 50
+
+
+def minutes_for_km(distance_km: float) -> int:
+    """Travel minutes for a distance at AVERAGE_SPEED_KMH"""
+    return int(round(float(distance_km) * 60 / AVERAGE_SPEED_KMH))
+
+
+def leg_table(points: Sequence[Tuple[float, float]]) -> List[Tuple[Decimal, int]]:
+    """(distance_from_start_km, estimated_time_from_start) for each stop, in order"""
+    return [
+        (Decimal(str(round(km, 2))), minutes_for_km(km))
+        for km in cumulative_distances(points)
+    ]
+
+
+def ensure_route_legs(route_id) -> List[Tuple[int, Decimal, int]]:
+    """
+    Leg table of a route as (stop_order, distance_km, minutes), filling it in
+    for routes created before the table existed
+
+    Returns an empty list if any stop is missing coordinates.
+    """
+    from ..models import RouteStop
+
+    stops = list(
+        RouteStop.objects.filter(route_id=route_id).order_by('stop_order')
+        .only('id', 'stop_order', 'latitude', 'longitude', 'distance_from_start_km', 'estimated_time_from_start')
+    )
+    if all(s.distance_from_start_km is not None and s.estimated_time_from_start is not None for s in stops):
+        return [(s.stop_order, s.distance_from_start_km, s.estimated_time_from_start) for s in stops]
+    if any(s.latitude is None or s.longitude is None for s in stops):
+        return []
+
+    for stop, (km, minutes) in zip(stops, leg_table([(s.latitude, s.longitude) for s in stops])):
+        stop.distance_from_start_km = km
+        stop.estimated_time_from_start = minutes
+    RouteStop.objects.bulk_update(stops, ['distance_from_start_km', 'estimated_time_from_start'])
+    return [(s.stop_order, s.distance_from_start_km, s.estimated_time_from_start) for s in stops]
+
+
+def route_duration_minutes(route_id) -> Optional[int]:
+    """ETA of the last stop, or None if the route has no leg table"""
+    from ..models import RouteStop
+
+    return (
+        RouteStop.objects.filter(route_id=route_id)
+        .order_by('-stop_order')
+        .values_list('estimated_time_from_start', flat=True)
+        .first()
+    )
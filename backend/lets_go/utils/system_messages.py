@@ -0,0 +1,116 @@
+"""
+Outbox for chat side effects of trip and booking lifecycle events
+
+Model methods such as ``Booking.save``, ``Trip.cancel_trip`` and
+``SeatAssignment.mark_as_occupied`` enqueue system messages and membership
+changes here instead of writing to the chat tables themselves. Inside a
+transaction the events are buffered and flushed once, after commit: every
+trip's chat group is resolved with one query and all messages go out in a
+single ``bulk_create``. Outside a transaction the event is flushed at once.
+Nothing is written for a transaction that rolls back.
+
+The buffer lives in a thread-local. ``transaction.on_commit`` holds the only
+strong reference to the scheduled flush, and the thread-local keeps a weak
+one. When Django discards the callback on rollback, the weak reference dies
+and the next event starts a fresh buffer.
+"""
+import logging
+import threading
+import weakref
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+def _current_buffer():
+    """Buffer of the running transaction, or None if its flush is no longer scheduled"""
+    buffer = getattr(_state, 'buffer', None)
+    if buffer is None or _state.flush_ref() is None:
+        return None
+    return buffer
+
+
+def _enqueue(trip, kind, text=None, user=None, member_type=None):
+    event = (trip, kind, text, user, member_type)
+    if not connection.in_atomic_block:
+        try:
+            flush([event])
+        except Exception:
+            logger.exception('Failed to emit chat %s event for trip %s', kind, trip.pk)
+        return
+
+    buffer = _current_buffer()
+    if buffer is None:
+        buffer = []
+
+        def _flush():
+            if getattr(_state, 'buffer', None) is buffer:
+                _state.buffer = None
+            flush(buffer)
+
+        _state.buffer, _state.flush_ref = buffer, weakref.ref(_flush)
+        transaction.on_commit(_flush, robust=True)
+    buffer.append(event)
+
+
+def system_message(trip, text):
+    """Post a SYSTEM message to the trip's chat"""
+    _enqueue(trip, 'message', text=text)
+
+
+def member_joined(trip, user, member_type='PASSENGER'):
+    """Add user to the trip's chat"""
+    _enqueue(trip, 'join', user=user, member_type=member_type)
+
+
+def member_left(trip, user):
+    """Deactivate user's membership in the trip's chat"""
+    _enqueue(trip, 'leave', user=user)
+
+
+def archive_chat(trip):
+    """Archive the trip's chat after this batch's messages are posted"""
+    _enqueue(trip, 'archive')
+
+
+def flush(events):
+    """Apply buffered events in order; chat groups are resolved once per batch"""
+    from ..models import ChatMessage, TripChatGroup
+
+    if not events:
+        return
+    trips = {}
+    for trip, *_ in events:
+        trips.setdefault(trip.pk, trip)
+
+    groups = {g.trip_id: g for g in TripChatGroup.objects.filter(trip_id__in=list(trips))}
+    for trip_pk, trip in trips.items():
+        if trip_pk not in groups:
+            groups[trip_pk] = TripChatGroup.get_or_create_for_trip(trip)
+
+    messages = []
+    to_archive = {}
+    for trip, kind, text, user, member_type in events:
+        group = groups[trip.pk]
+        if kind == 'join':
+            group.add_member(user, member_type)
+        elif kind == 'leave':
+            group.remove_member(user)
+        elif kind == 'archive':
+            to_archive[group.pk] = group
+        else:
+            messages.append(ChatMessage(
+                chat_group=group,
+                sender_id=group.created_by_id,
+                message_type='SYSTEM',
+                message_text=text,
+                message_data={'is_system': True},
+            ))
+
+    ChatMessage.bulk_send(messages)
+    for group in to_archive.values():
+        if group.is_active:
+            group.archive()
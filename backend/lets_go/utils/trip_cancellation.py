@@ -0,0 +1,119 @@
+"""
+Trip cancellation service
+
+Cancels a trip and every open booking on it in one transaction with a fixed
+number of set-based statements, whatever the passenger count:
+
+- the trip row is locked, marked CANCELLED and gets all seats back
+- CONFIRMED and PENDING bookings are cancelled with one UPDATE
+- completed payments of confirmed bookings get PENDING refunds (one bulk_create)
+- passengers, the driver and the trip chat are notified after commit
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Booking, PaymentRefund, Trip, TripPayment
+from .realtime import publish, publish_trip_status, user_channel
+from .system_messages import archive_chat, system_message
+
+CANCELLABLE_BOOKING_STATUSES = ('CONFIRMED', 'PENDING')
+NON_CANCELLABLE_TRIP_STATUSES = ('CANCELLED', 'COMPLETED')
+
+
+class TripCancellationError(Exception):
+    """Trip is in a state that cannot be cancelled"""
+
+
+class TripCancellationForbidden(TripCancellationError):
+    """Caller is not the trip's driver"""
+
+
+def cancel_trip_with_bookings(trip_id, cancelled_by_id, reason=None):
+    """
+    Cancel a trip (by its trip_id code) and all its open bookings
+
+    Args:
+        trip_id: Public trip identifier
+        cancelled_by_id: Id of the user cancelling; must be the trip's driver
+        reason: Cancellation reason shown to passengers
+
+    Returns:
+        dict with cancelled_bookings_count, cancelled_pending_count,
+        seats_released and refunds_enqueued
+
+    Raises:
+        Trip.DoesNotExist, TripCancellationError, TripCancellationForbidden
+    """
+    reason = reason or 'Cancelled by driver'
+    with transaction.atomic():
+        trip = Trip.objects.select_for_update().get(trip_id=trip_id)
+        if cancelled_by_id in (None, '') or str(cancelled_by_id) != str(trip.driver_id):
+            raise TripCancellationForbidden('Only the trip driver can cancel this trip.')
+        if trip.trip_status in NON_CANCELLABLE_TRIP_STATUSES:
+            raise TripCancellationError('Trip cannot be cancelled. It may already be cancelled or completed.')
+
+        now = timezone.now()
+        open_bookings = list(
+            Booking.objects
+            .filter(trip_id=trip.id, booking_status__in=CANCELLABLE_BOOKING_STATUSES)
+            .values_list('id', 'passenger_id', 'booking_status', 'number_of_seats')
+        )
+        booking_ids = [b[0] for b in open_bookings]
+        confirmed = [b for b in open_bookings if b[2] == 'CONFIRMED']
+        seats_released = trip.total_seats - trip.available_seats
+
+        if booking_ids:
+            Booking.objects.filter(id__in=booking_ids).update(
+                booking_status='CANCELLED',
+                cancelled_at=now,
+                updated_at=now,
+            )
+
+        trip.trip_status = 'CANCELLED'
+        trip.cancellation_reason = reason
+        trip.cancelled_at = now
+        trip.available_seats = trip.total_seats
+        trip.save(update_fields=['trip_status', 'cancellation_reason', 'cancelled_at', 'available_seats', 'updated_at'])
+
+        refunds = _enqueue_refunds([b[0] for b in confirmed], trip.driver_id)
+
+        # After-commit notifications
+        system_message(trip, f"❌ Trip cancelled: {reason}")
+        archive_chat(trip)
+        publish_trip_status(trip, reason=reason)
+        passenger_ids = sorted({b[1] for b in open_bookings if b[1]})
+        if passenger_ids:
+            publish([user_channel(pid) for pid in passenger_ids], 'trip.cancelled', {
+                'trip_id': trip.trip_id,
+                'reason': reason,
+            })
+
+    return {
+        'cancelled_bookings_count': len(confirmed),
+        'cancelled_pending_count': len(open_bookings) - len(confirmed),
+        'seats_released': seats_released,
+        'refunds_enqueued': refunds,
+    }
+
+
+def _enqueue_refunds(booking_ids, requested_by_id):
+    """PENDING full refunds for completed payments that have no open or processed refund yet"""
+    if not booking_ids:
+        return 0
+    payments = list(
+        TripPayment.objects
+        .filter(booking_id__in=booking_ids, payment_status='COMPLETED')
+        .exclude(refunds__refund_status__in=['PENDING', 'PROCESSED'])
+        .only('id', 'amount', 'payment_method')
+    )
+    PaymentRefund.objects.bulk_create([
+        PaymentRefund(
+            original_payment_id=p.id,
+            refund_amount=p.amount,
+            refund_reason='TRIP_CANCELLED',
+            refund_method=p.payment_method,
+            requested_by_id=requested_by_id,
+        )
+        for p in payments
+    ])
+    return len(payments)
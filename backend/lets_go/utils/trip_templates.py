@@ -0,0 +1,148 @@
+"""
+Materialize trips from recurring trip templates
+
+Arrival time, vehicle snapshot and stop breakdown are computed once per
+template; generating the upcoming trips is then a handful of ``bulk_create``
+calls regardless of how many dates are covered. Fares are quoted per date,
+since the pricing calendar depends on the weekday, holidays and Ramadan;
+dates of the same class hit the fare quote cache. The template's segment
+prices were set against its own base fare, so each trip's breakdown is
+scaled by the ratio of that trip's fare to it.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import RecurringTripTemplate, RouteStatistics, Trip, TripStopBreakdown, TripVehicleHistory
+from .id_generator import generate_trip_id
+from .money import Money
+
+MATERIALIZE_HORIZON_DAYS = 14
+MAX_HORIZON_DAYS = 60
+BULK_BATCH_SIZE = 500
+
+
+def _fares_by_date(template, dates):
+    """{trip_date: (base_fare, fare_calculation)}: the custom price, or a quote for each date"""
+    if template.custom_price is not None or template.vehicle is None:
+        return {d: (template.base_fare, template.fare_calculation) for d in dates}
+    from ..views_rideposting import calculate_pakistan_fare
+
+    fares = {}
+    for trip_date in dates:
+        fare_data = calculate_pakistan_fare(
+            template.route, template.vehicle, template.departure_time, template.total_seats, trip_date=trip_date
+        )
+        fares[trip_date] = (fare_data['base_fare'], fare_data)
+    return fares
+
+
+def _breakdown_rows(template, trip):
+    """The template's stop breakdown for one trip, segment prices scaled to the trip's fare"""
+    rows = TripStopBreakdown.build_from_payload(trip, template.stop_breakdown)
+    template_fare = Decimal(str(template.base_fare))
+    factor = Decimal(str(trip.base_fare)) / template_fare if template_fare else Decimal(1)
+    if factor != 1:
+        for row in rows:
+            row.price = Money.from_decimal(row.price).scale(factor).to_decimal()
+    return rows
+
+
+def materialize_template(template_id, days=MATERIALIZE_HORIZON_DAYS):
+    """
+    Create the template's trips for the next `days` days that do not exist yet
+
+    Returns:
+        List of created Trip objects (empty for inactive templates)
+    """
+    days = max(0, min(int(days), MAX_HORIZON_DAYS))
+    now = timezone.localtime()
+    today = now.date()
+    until = today + timedelta(days=days)
+
+    with transaction.atomic():
+        template = (
+            RecurringTripTemplate.objects
+            .select_for_update()
+            .select_related('vehicle', 'route')
+            .get(id=template_id)
+        )
+        if not template.is_active:
+            return []
+
+        start = today
+        if template.materialized_until and template.materialized_until >= today:
+            start = template.materialized_until + timedelta(days=1)
+        dates = [
+            d for d in template.occurrences(start, until)
+            # Today's departure may already be gone
+            if d > today or datetime.combine(d, template.departure_time) > now.replace(tzinfo=None)
+        ]
+        if dates:
+            existing = set(
+                Trip.objects.filter(recurring_template=template, trip_date__in=dates)
+                .values_list('trip_date', flat=True)
+            )
+            dates = [d for d in dates if d not in existing]
+        fares = _fares_by_date(template, dates)
+
+        trips = [
+            Trip(
+                trip_id=generate_trip_id(),
+                route_id=template.route_id,
+                vehicle_id=template.vehicle_id,
+                driver_id=template.driver_id,
+                trip_date=trip_date,
+                departure_time=template.departure_time,
+                estimated_arrival_time=template.estimated_arrival_time,
+                total_seats=template.total_seats,
+                available_seats=template.total_seats,
+                base_fare=fares[trip_date][0],
+                total_distance_km=template.total_distance_km,
+                total_duration_minutes=template.total_duration_minutes,
+                fare_calculation=fares[trip_date][1],
+                notes=template.notes,
+                gender_preference=template.gender_preference,
+                is_negotiable=template.is_negotiable,
+                minimum_acceptable_fare=template.minimum_acceptable_fare,
+                recurring_template=template,
+            )
+            for trip_date in dates
+        ]
+        if trips:
+            Trip.objects.bulk_create(trips, batch_size=BULK_BATCH_SIZE)
+            RouteStatistics.mark_stale([template.route_id])
+
+            if template.vehicle is not None:
+                snapshot = TripVehicleHistory.fields_from_vehicle(template.vehicle)
+                TripVehicleHistory.objects.bulk_create(
+                    [TripVehicleHistory(trip=trip, **snapshot) for trip in trips],
+                    batch_size=BULK_BATCH_SIZE,
+                )
+
+            if template.stop_breakdown:
+                TripStopBreakdown.objects.bulk_create(
+                    [row for trip in trips for row in _breakdown_rows(template, trip)],
+                    batch_size=BULK_BATCH_SIZE,
+                )
+
+        if template.materialized_until is None or template.materialized_until < until:
+            template.materialized_until = until
+            template.save(update_fields=['materialized_until', 'updated_at'])
+
+    return trips
+
+
+def materialize_due_templates(days=MATERIALIZE_HORIZON_DAYS):
+    """Top up every active template whose horizon is shorter than `days`; returns {template_id: created}"""
+    until = timezone.localdate() + timedelta(days=days)
+    due_ids = list(
+        RecurringTripTemplate.objects
+        .filter(is_active=True)
+        .exclude(materialized_until__gte=until)
+        .exclude(end_date__lt=timezone.localdate())
+        .values_list('id', flat=True)
+    )
+    return {template_id: len(materialize_template(template_id, days)) for template_id in due_ids}
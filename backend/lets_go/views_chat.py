@@ -0,0 +1,345 @@
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.db.models import Q
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import json
+from .models import Trip, TripChatGroup, ChatGroupMember, ChatMessage
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SENDABLE_MESSAGE_TYPES = ['TEXT', 'IMAGE', 'LOCATION']
+# A caught-up sync cursor trails the clock this far, so an edit whose transaction
+# committed after a later updated_at was served is still picked up next time
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+def _parse_int(value):
+    """Parse an optional integer query parameter; raises ValueError on junk"""
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _page_size(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _get_chat_group(trip_id, create=False):
+    """Return the trip's chat group (creating it if asked), or None if the trip has none"""
+    group = (
+        TripChatGroup.objects
+        .select_related('trip')
+        .only('id', 'is_active', 'created_by_id', 'trip__id', 'trip__trip_id', 'trip__driver_id')
+        .filter(trip__trip_id=trip_id)
+        .first()
+    )
+    if group is not None or not create:
+        return group
+    trip = (
+        Trip.objects.select_related('route')
+        .only('id', 'trip_id', 'driver_id', 'route__route_name')
+        .get(trip_id=trip_id)
+    )
+    return TripChatGroup.get_or_create_for_trip(trip)
+
+
+def _is_participant(group, user_id):
+    """Driver of the trip or an active member of the group"""
+    if user_id is None:
+        return False
+    if group.trip.driver_id == user_id or group.created_by_id == user_id:
+        return True
+    return ChatGroupMember.objects.filter(chat_group_id=group.id, user_id=user_id, is_active=True).exists()
+
+
+def encode_sync_cursor(updated_at, message_id):
+    """Opaque cursor for (updated_at, id) keyset: '<epoch microseconds>-<id>'"""
+    # Integer arithmetic so the cursor round-trips exactly (float timestamps lose microseconds)
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{message_id}"
+
+
+def decode_sync_cursor(cursor):
+    micros, message_id = cursor.split('-', 1)
+    updated_at = EPOCH + timedelta(microseconds=int(micros))
+    return updated_at, int(message_id)
+
+
+def serialize_message(m):
+    """Compact message payload; deleted messages are sent as tombstones"""
+    return {
+        'id': m.id,
+        'sender_id': m.sender_id,
+        'sender_name': m.sender.name if m.sender_id else None,
+        'message_type': m.message_type,
+        'message_text': None if m.is_deleted else m.message_text,
+        'message_data': {} if m.is_deleted else (m.message_data or {}),
+        'is_edited': m.is_edited,
+        'is_deleted': m.is_deleted,
+        'created_at': m.created_at.isoformat() if m.created_at else None,
+        'updated_at': m.updated_at.isoformat() if m.updated_at else None,
+    }
+
+
+def _message_queryset(group_id):
+    return (
+        ChatMessage.objects
+        .filter(chat_group_id=group_id)
+        .select_related('sender')
+        .only(
+            'id', 'chat_group_id', 'sender_id', 'sender__name', 'message_type', 'message_text',
+            'message_data', 'is_edited', 'is_deleted', 'created_at', 'updated_at'
+        )
+    )
+
+
+@csrf_exempt
+def chat_messages(request, trip_id):
+    """GET: keyset-paginated messages; POST: send a message.
+
+    GET params: user_id (required), after_id | before_id, limit (max 200).
+    - after_id: messages newer than after_id, oldest first (catching up)
+    - before_id: messages older than before_id (scrolling back)
+    - neither: the latest page
+    Pages are always returned oldest first and walk the (chat_group, id) index.
+
+    POST body: {"sender_id": 1, "message_text": "...", "message_type": "TEXT", "message_data": {}}
+    """
+    if request.method == 'GET':
+        try:
+            try:
+                user_id = _parse_int(request.GET.get('user_id'))
+                after_id = _parse_int(request.GET.get('after_id'))
+                before_id = _parse_int(request.GET.get('before_id'))
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'user_id, after_id and before_id must be integers'}, status=400)
+            if after_id is not None and before_id is not None:
+                return JsonResponse({'success': False, 'error': 'Use either after_id or before_id, not both'}, status=400)
+            limit = _page_size(request)
+
+            group = _get_chat_group(trip_id)
+            if group is None:
+                return JsonResponse({'success': True, 'messages': [], 'has_more': False})
+            if not _is_participant(group, user_id):
+                return JsonResponse({'success': False, 'error': 'Not a member of this chat'}, status=403)
+
+            qs = _message_queryset(group.id).filter(is_deleted=False)
+            if after_id is not None:
+                page = list(qs.filter(id__gt=after_id).order_by('id')[:limit + 1])
+                has_more = len(page) > limit
+                page = page[:limit]
+            else:
+                if before_id is not None:
+                    qs = qs.filter(id__lt=before_id)
+                page = list(qs.order_by('-id')[:limit + 1])
+                has_more = len(page) > limit
+                page = list(reversed(page[:limit]))
+
+            return JsonResponse({
+                'success': True,
+                'messages': [serialize_message(m) for m in page],
+                'has_more': has_more,
+                'oldest_id': page[0].id if page else None,
+                'newest_id': page[-1].id if page else None,
+            })
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body or '{}')
+            try:
+                sender_id = _parse_int(data.get('sender_id'))
+            except (TypeError, ValueError):
+                sender_id = None
+            message_text = (data.get('message_text') or '').strip()
+            message_type = (data.get('message_type') or 'TEXT').upper()
+            message_data = data.get('message_data') or {}
+
+            if sender_id is None:
+                return JsonResponse({'success': False, 'error': 'sender_id is required'}, status=400)
+            if message_type not in SENDABLE_MESSAGE_TYPES:
+                return JsonResponse({'success': False, 'error': 'Invalid message_type'}, status=400)
+            if not message_text and message_type == 'TEXT':
+                return JsonResponse({'success': False, 'error': 'message_text is required'}, status=400)
+            if not isinstance(message_data, dict):
+                return JsonResponse({'success': False, 'error': 'message_data must be an object'}, status=400)
+
+            group = _get_chat_group(trip_id, create=True)
+            if not group.is_active:
+                return JsonResponse({'success': False, 'error': 'This chat has been archived'}, status=400)
+            if not _is_participant(group, sender_id):
+                return JsonResponse({'success': False, 'error': 'Not a member of this chat'}, status=403)
+
+            message = ChatMessage.objects.create(
+                chat_group_id=group.id,
+                sender_id=sender_id,
+                message_type=message_type,
+                message_text=message_text,
+                message_data=message_data,
+            )
+            message = _message_queryset(group.id).get(id=message.id)
+            return JsonResponse({'success': True, 'message': serialize_message(message)}, status=201)
+        except json.JSONDecodeError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+        except Trip.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Trip not found'}, status=404)
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+    return JsonResponse({'success': False, 'error': 'Only GET and POST allowed'}, status=405)
+
+
+@csrf_exempt
+def chat_sync(request, trip_id):
+    """GET: incremental sync of new, edited and deleted messages since a cursor.
+
+    Params: user_id (required), cursor (omit for a full sync from the start), limit.
+    Changes are ordered by (updated_at, id); pass next_cursor back until has_more is false.
+    Deleted messages come back as tombstones (is_deleted=true, no text).
+    Once has_more is false the cursor is held SYNC_OVERLAP behind the clock, so the
+    next sync repeats the latest changes: clients replace messages by id.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    try:
+        try:
+            user_id = _parse_int(request.GET.get('user_id'))
+            cursor = request.GET.get('cursor')
+            since = decode_sync_cursor(cursor) if cursor else None
+        except (ValueError, OverflowError):
+            return JsonResponse({'success': False, 'error': 'Invalid user_id or cursor'}, status=400)
+        limit = _page_size(request)
+
+        group = _get_chat_group(trip_id)
+        if group is None:
+            return JsonResponse({'success': True, 'changes': [], 'next_cursor': cursor, 'has_more': False})
+        if not _is_participant(group, user_id):
+            return JsonResponse({'success': False, 'error': 'Not a member of this chat'}, status=403)
+
+        qs = _message_queryset(group.id)
+        if since is not None:
+            since_ts, since_id = since
+            qs = qs.filter(Q(updated_at__gt=since_ts) | Q(updated_at=since_ts, id__gt=since_id))
+        changes = list(qs.order_by('updated_at', 'id')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        position = (changes[-1].updated_at, changes[-1].id) if changes else since
+        if position is not None and not has_more:
+            position = min(position, (timezone.now() - SYNC_OVERLAP, 0))
+        next_cursor = encode_sync_cursor(*position) if position is not None else cursor
+        return JsonResponse({
+            'success': True,
+            'changes': [serialize_message(m) for m in changes],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def chat_unread_counts(request):
+    """GET: unread badge counts for every active chat of a user, keyed by trip_id (one query)"""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    try:
+        try:
+            user_id = _parse_int(request.GET.get('user_id'))
+        except ValueError:
+            user_id = None
+        if user_id is None:
+            return JsonResponse({'success': False, 'error': 'user_id is required'}, status=400)
+
+        rows = ChatGroupMember.objects.filter(user_id=user_id, is_active=True).values_list(
+            'chat_group__trip__trip_id', 'unread_count'
+        )
+        counts = {trip_id: unread for trip_id, unread in rows}
+        return JsonResponse({
+            'success': True,
+            'unread_counts': counts,
+            'total_unread': sum(counts.values()),
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def chat_mark_read(request, trip_id):
+    """POST: mark everything up to a message as read for one member.
+
+    Body: {"user_id": 5, "up_to_id": 1234}; omit up_to_id to mark the whole chat read.
+    Moves the member's read watermark in a single UPDATE instead of writing a receipt per message.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST allowed'}, status=405)
+    try:
+        data = json.loads(request.body or '{}')
+        try:
+            user_id = _parse_int(data.get('user_id'))
+            up_to_id = _parse_int(data.get('up_to_id'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'user_id and up_to_id must be integers'}, status=400)
+        if user_id is None:
+            return JsonResponse({'success': False, 'error': 'user_id is required'}, status=400)
+
+        group = _get_chat_group(trip_id)
+        if group is None:
+            return JsonResponse({'success': False, 'error': 'Chat not found'}, status=404)
+        member = ChatGroupMember.objects.filter(chat_group_id=group.id, user_id=user_id, is_active=True).first()
+        if member is None:
+            return JsonResponse({'success': False, 'error': 'Not a member of this chat'}, status=403)
+
+        member.mark_read_up_to(up_to_id)
+        return JsonResponse({
+            'success': True,
+            'last_read_message_id': member.last_read_message_id,
+            'last_read_at': member.last_read_at.isoformat() if member.last_read_at else None,
+            'unread_count': member.unread_count,
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def chat_message_receipts(request, trip_id, message_id):
+    """GET: who has and hasn't read a message, derived from member watermarks"""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    try:
+        try:
+            user_id = _parse_int(request.GET.get('user_id'))
+        except ValueError:
+            user_id = None
+        group = _get_chat_group(trip_id)
+        if group is None:
+            return JsonResponse({'success': False, 'error': 'Chat not found'}, status=404)
+        if not _is_participant(group, user_id):
+            return JsonResponse({'success': False, 'error': 'Not a member of this chat'}, status=403)
+        message = ChatMessage.objects.select_related('chat_group').filter(chat_group_id=group.id, id=message_id).first()
+        if message is None:
+            return JsonResponse({'success': False, 'error': 'Message not found'}, status=404)
+
+        def _members(qs):
+            return [
+                {'user_id': uid, 'name': name, 'last_read_at': read_at.isoformat() if read_at else None}
+                for uid, name, read_at in qs.values_list('user_id', 'user__name', 'last_read_at')
+            ]
+
+        return JsonResponse({
+            'success': True,
+            'message_id': message.id,
+            'read_by': _members(message.read_by),
+            'unread_by': _members(message.unread_by),
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -0,0 +1,339 @@
+"""
+Push endpoints for chat, booking and trip status events (ASGI only)
+
+- Server-Sent Events: GET /lets_go/events/stream/?trip_id=T...&trip_id=T...
+- Long-poll:          GET /lets_go/ride-booking/<trip_id>/requests/poll/?after_id=120
+- WebSocket:          ws://<host>/lets_go/ws/?trip_id=T...
+  Client frames: {"action": "subscribe", "trip_id": "T..."},
+                 {"action": "unsubscribe", "trip_id": "T..."}, {"action": "ping"}
+
+These views hold a request open while waiting, so backend.asgi serves them
+through ``realtime_http_application`` (no project middleware): WhiteNoise is
+sync-only, and behind it every waiting request would pin Django's shared
+sync thread and stall all other requests. Under WSGI a stream would never
+end and a long-poll would hold a worker without ever being woken, so both
+answer 501 there.
+
+Streams, long-polls and websockets belong to the user logged in on the
+request's session cookie (``request.session['user_id']``, set by ``login``).
+A ``user_id`` (``driver_id`` for the long-poll) parameter is still accepted
+but must name that same user. Streams always
+include the user's own channel; trip channels require the user
+to be the trip's driver or a passenger with a booking on it. Event payloads
+are produced by ``utils.realtime``.
+"""
+import asyncio
+import json
+import re
+import time
+from http.cookies import SimpleCookie
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
+from django.core.handlers.exception import convert_exception_to_response
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .models import Booking, Trip
+from .views_rideposting import PENDING_REQUEST_FIELDS, _pending_request_item
+from .utils.realtime import get_broker, trip_channel, user_channel
+
+KEEPALIVE_SECONDS = 15
+MAX_TRIPS_PER_CONNECTION = 20
+WEBSOCKET_PATH = '/lets_go/ws/'
+LONG_POLL_DEFAULT_SECONDS = 25
+LONG_POLL_MAX_SECONDS = 55
+LONG_POLL_PAGE_SIZE = 50
+REALTIME_HTTP_PATH = re.compile(r'^/lets_go/(events/stream/|ride-booking/[^/]+/requests/poll/)$')
+
+
+def _allowed_trip_ids(user_id, trip_ids):
+    """Subset of trip_ids the user may follow (one query)"""
+    if not trip_ids:
+        return []
+    return list(
+        Trip.objects.filter(trip_id__in=trip_ids)
+        .filter(Q(driver_id=user_id) | Q(trip_bookings__passenger_id=user_id))
+        .values_list('trip_id', flat=True)
+        .distinct()
+    )
+
+
+def _resolve_channels(user_id, trip_ids):
+    """Channels for a connection, or raise PermissionError naming the refused trips"""
+    trip_ids = list(dict.fromkeys(t for t in trip_ids if t))
+    if len(trip_ids) > MAX_TRIPS_PER_CONNECTION:
+        raise ValueError(f'At most {MAX_TRIPS_PER_CONNECTION} trips per connection')
+    allowed = _allowed_trip_ids(user_id, trip_ids)
+    refused = sorted(set(trip_ids) - set(allowed))
+    if refused:
+        raise PermissionError(f"Not a participant of trip(s): {', '.join(refused)}")
+    return [user_channel(user_id)] + [trip_channel(t) for t in allowed]
+
+
+def _parse_user_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _session_user_id(session_key):
+    """Id of the user logged in on this session, or None"""
+    if not session_key:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    return _parse_user_id(session.get('user_id'))
+
+
+async def _authenticate(session_key, claimed_user_id):
+    """(user_id, None) for the session's user, or (None, (status, error)).
+
+    The realtime handler runs without middleware, so the session is read from
+    its cookie here.
+    """
+    user_id = await sync_to_async(_session_user_id)(session_key)
+    if user_id is None:
+        return None, (401, 'Login required')
+    if claimed_user_id not in (None, '') and _parse_user_id(claimed_user_id) != user_id:
+        return None, (403, 'user_id does not match the logged-in user')
+    return user_id, None
+
+
+def _scope_session_key(scope):
+    """Session cookie value from a raw ASGI scope"""
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            morsel = SimpleCookie(value.decode('latin-1')).get(settings.SESSION_COOKIE_NAME)
+            if morsel is not None:
+                return morsel.value
+    return None
+
+
+def _asgi_only(what):
+    return JsonResponse({
+        'success': False,
+        'error': f'{what} are only served by the ASGI application (backend.asgi)'
+    }, status=501)
+
+
+@csrf_exempt
+async def event_stream(request):
+    """GET: Server-Sent Events stream of the user's and trips' events"""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would read this endless stream to the end and never return
+        return _asgi_only('Event streams')
+    user_id, error = await _authenticate(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME), request.GET.get('user_id')
+    )
+    if error:
+        return JsonResponse({'success': False, 'error': error[1]}, status=error[0])
+    try:
+        channels = await sync_to_async(_resolve_channels)(user_id, request.GET.getlist('trip_id'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except PermissionError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=403)
+
+    async def stream():
+        broker = get_broker()
+        subscription = broker.subscribe(channels)
+        try:
+            yield f"retry: 3000\nevent: ready\ndata: {json.dumps({'channels': channels})}\n\n"
+            while True:
+                message = await subscription.get(timeout=KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                event_type = json.loads(message).get('type', 'message')
+                yield f"event: {event_type}\ndata: {message}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+async def websocket_application(scope, receive, send):
+    """Raw ASGI websocket handler, mounted by backend.asgi for WEBSOCKET_PATH"""
+    if scope.get('path') != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    user_id, error = await _authenticate(_scope_session_key(scope), (query.get('user_id') or [None])[0])
+    if error:
+        await send({'type': 'websocket.close', 'code': 4401 if error[0] == 401 else 4403})
+        return
+    trip_ids = list(query.get('trip_id', []))
+    try:
+        channels = await sync_to_async(_resolve_channels)(user_id, trip_ids)
+    except (ValueError, PermissionError):
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    await send({'type': 'websocket.accept'})
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+
+    async def send_json(payload):
+        await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    async def handle_frame(text):
+        """Apply a client control frame, re-subscribing if the trip set changes"""
+        nonlocal subscription, trip_ids
+        try:
+            frame = json.loads(text or '{}')
+        except json.JSONDecodeError:
+            await send_json({'type': 'error', 'error': 'Invalid JSON'})
+            return
+        action = frame.get('action')
+        if action == 'ping':
+            await send_json({'type': 'pong'})
+            return
+        if action not in ('subscribe', 'unsubscribe') or not frame.get('trip_id'):
+            await send_json({'type': 'error', 'error': 'Unsupported action'})
+            return
+        new_trip_ids = [t for t in trip_ids if t != frame['trip_id']]
+        if action == 'subscribe':
+            new_trip_ids.append(frame['trip_id'])
+        try:
+            new_channels = await sync_to_async(_resolve_channels)(user_id, new_trip_ids)
+        except (ValueError, PermissionError) as e:
+            await send_json({'type': 'error', 'error': str(e)})
+            return
+        broker.unsubscribe(subscription)
+        subscription = broker.subscribe(new_channels)
+        trip_ids = new_trip_ids
+        await send_json({'type': 'subscribed', 'channels': new_channels})
+
+    await send_json({'type': 'ready', 'channels': channels})
+    receive_task = asyncio.ensure_future(receive())
+    message_task = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receive_task, message_task}, return_when=asyncio.FIRST_COMPLETED)
+            if message_task in done:
+                await send({'type': 'websocket.send', 'text': message_task.result()})
+                message_task = asyncio.ensure_future(subscription.get())
+            if receive_task in done:
+                event = receive_task.result()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    current = subscription
+                    await handle_frame(event.get('text'))
+                    if subscription is not current:
+                        message_task.cancel()
+                        message_task = asyncio.ensure_future(subscription.get())
+                receive_task = asyncio.ensure_future(receive())
+    finally:
+        receive_task.cancel()
+        message_task.cancel()
+        broker.unsubscribe(subscription)
+
+
+def _pending_after(trip_pk, after_id):
+    """Pending bookings of a trip with id > after_id, oldest first"""
+    pending = (
+        Booking.objects
+        .filter(trip_id=trip_pk, booking_status='PENDING', id__gt=after_id)
+        .select_related('passenger', 'from_stop', 'to_stop')
+        .only(*PENDING_REQUEST_FIELDS)
+        .order_by('id')[:LONG_POLL_PAGE_SIZE]
+    )
+    return [_pending_request_item(b) for b in pending]
+
+
+@csrf_exempt
+async def poll_pending_requests(request, trip_id):
+    """
+    GET: long-poll for new pending booking requests (driver-facing)
+
+    The driver is the session's user; driver_id, if sent, must match it.
+    Params: after_id (last booking_id the client has, default 0),
+    timeout seconds (default 25, max 55). Answers 501 under WSGI.
+    Returns as soon as there are pending bookings newer than after_id, otherwise
+    waits on the trip's realtime channel (no DB polling) until a booking request
+    arrives or the timeout passes. The broker may be per process, so the DB is
+    checked once more at the deadline for requests made on another worker.
+    Pass next_after_id back on the next call.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        # No broker event reaches a WSGI worker; it would sit idle until the timeout
+        return _asgi_only('Long-polls')
+    driver_id, error = await _authenticate(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME), request.GET.get('driver_id')
+    )
+    if error:
+        return JsonResponse({'success': False, 'error': error[1]}, status=error[0])
+    try:
+        after_id = int(request.GET.get('after_id') or 0)
+        timeout = float(request.GET.get('timeout') or LONG_POLL_DEFAULT_SECONDS)
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'after_id and timeout must be numbers'}, status=400)
+    timeout = max(0.0, min(timeout, LONG_POLL_MAX_SECONDS))
+
+    trip_row = await Trip.objects.filter(trip_id=trip_id).values_list('id', 'driver_id').afirst()
+    if not trip_row:
+        return JsonResponse({'success': False, 'error': 'Trip not found'}, status=404)
+    trip_pk, trip_driver_id = trip_row
+    if trip_driver_id != driver_id:
+        return JsonResponse({'success': False, 'error': 'Only the trip driver can view requests'}, status=403)
+
+    def _response(items, timed_out):
+        return JsonResponse({
+            'success': True,
+            'pending_requests': items,
+            'next_after_id': items[-1]['booking_id'] if items else after_id,
+            'timed_out': timed_out,
+        })
+
+    # Subscribe before the first check so a request landing in between still wakes us
+    broker = get_broker()
+    subscription = broker.subscribe([trip_channel(trip_id)])
+    try:
+        items = await sync_to_async(_pending_after)(trip_pk, after_id)
+        deadline = time.monotonic() + timeout
+        while not items:
+            remaining = deadline - time.monotonic()
+            message = await subscription.get(timeout=remaining) if remaining > 0 else None
+            if message is None:
+                items = await sync_to_async(_pending_after)(trip_pk, after_id)
+                return _response(items, not items)
+            if json.loads(message).get('type') == 'booking.request':
+                items = await sync_to_async(_pending_after)(trip_pk, after_id)
+        return _response(items, False)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class _MiddlewareFreeASGIHandler(ASGIHandler):
+    """Django ASGI handler that runs async views natively, without MIDDLEWARE"""
+
+    def load_middleware(self, is_async=False):
+        self._view_middleware = []
+        self._template_response_middleware = []
+        self._exception_middleware = []
+        self._middleware_chain = convert_exception_to_response(self._get_response_async)
+
+
+realtime_http_application = _MiddlewareFreeASGIHandler()
+
+
+def is_realtime_http_path(path):
+    return bool(REALTIME_HTTP_PATH.match(path or ''))
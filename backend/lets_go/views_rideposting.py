@@ -1,27 +1,41 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse, Http404
-from django.db import connection
-from django.db.utils import OperationalError
+from django.db import connection, transaction
+from django.db.utils import IntegrityError, OperationalError
 from django.utils import timezone
 from datetime import datetime, timedelta, time
 import json
-import random
 from django.db.models import Prefetch, Count, Q
 import time as pytime
-from .models import UsersData, Vehicle, Trip, Route, RouteStop, TripStopBreakdown, Booking
-from .utils.fare_calculator import is_peak_hour, get_fare_matrix_for_route, calculate_booking_fare
+from .models import (
+    UsersData, Vehicle, Trip, Route, RouteStop, RouteStatistics, TripStopBreakdown, TripVehicleHistory, Booking,
+    NegotiationEvent
+)
+from .utils.fare_rules import get_fare_rules
+from .utils.fare_quote_cache import get_or_compute_quote
+from .utils.fare_calculator import get_fare_matrix_for_route, calculate_booking_fare
+from .utils.idempotency import idempotent
+from .utils.money import Money, ZERO, money_json
+from .utils.id_generator import generate_trip_id, generate_booking_id
+from .utils.route_legs import ensure_route_legs, leg_table, minutes_for_km, route_duration_minutes
+from .utils.route_geometry import build_polyline_levels, encode_polyline, route_geometry_hash
+from .utils.realtime import publish_booking_request, publish_negotiation_events, publish_trip_status
+from .utils.trip_cancellation import cancel_trip_with_bookings, TripCancellationError, TripCancellationForbidden
 from decimal import Decimal
 
-def calculate_pakistan_fare(route, vehicle, departure_time, total_seats=1):
+# Rows per INSERT when writing route stops and stop breakdowns
+BULK_BATCH_SIZE = 500
+
+def calculate_pakistan_fare(route, vehicle, departure_time, total_seats=1, trip_date=None):
     """
 {{ ... }}
     Calculate fare based on Pakistan's current market conditions
     
-    Pakistan-specific factors:
-    - Current fuel prices (Petrol: 275 PKR/L, Diesel: 285 PKR/L, CNG: 230 PKR/Kg)
-    - Vehicle efficiency (km/liter)
+    Pakistan-specific factors (values come from the active FareRuleSet, see utils/fare_rules.py):
+    - Current fuel prices and vehicle efficiency
     - Distance-based pricing
-    - Peak hour surcharges
+    - Peak hour surcharges from the pricing calendar (weekday, weekend, holiday, Ramadan)
+      for the trip date, today if not given
     - Vehicle type premiums
     """
     print("=== CALCULATE_PAKISTAN_FARE DEBUG ===")
@@ -30,157 +44,37 @@ def calculate_pakistan_fare(route, vehicle, departure_time, total_seats=1):
     print(f"Departure time: {departure_time}")
     print(f"Total seats: {total_seats}")
     
-    # 1. Calculate route distance
-    print("Getting route stops...")
-    stops = route.route_stops.all().order_by('stop_order')
-    print(f"Found {stops.count()} stops")
-    
-    if stops.count() < 2:
-        print("Insufficient stops, returning default fare")
-        return {'base_fare': 100.0, 'calculation_breakdown': {'error': 'Insufficient stops'}}
+    rules = get_fare_rules()
+    time_multiplier = rules.time_multiplier(trip_date or timezone.localdate(), departure_time)
+    total_seats = int(total_seats or 1)
     
-    print("Calculating total distance...")
-    total_distance = 0
-    for i in range(len(stops) - 1):
-        current_stop = stops[i]
-        next_stop = stops[i + 1]
-        print(f"Calculating distance from stop {i+1} to {i+2}")
-        print(f"  Stop {i+1}: lat={current_stop.latitude}, lng={current_stop.longitude}")
-        print(f"  Stop {i+2}: lat={next_stop.latitude}, lng={next_stop.longitude}")
+    def compute_quote():
+        # 1. Route distance and duration from the precomputed leg table
+        legs = ensure_route_legs(route.id)
+        print(f"Found {len(legs)} stops")
         
-        try:
-            distance = _calculate_distance(
-                float(current_stop.latitude or 0), 
-                float(current_stop.longitude or 0),
-                float(next_stop.latitude or 0), 
-                float(next_stop.longitude or 0)
-            )
-            print(f"  Distance: {distance} km")
-            total_distance += distance
-        except Exception as e:
-            print(f"  Error calculating distance: {e}")
-            distance = 0
-            total_distance += distance
-    
-    print(f"Total distance: {total_distance} km")
-    
-    # 2. Pakistan-specific base rates (PKR per km) - Updated for 2025
-    base_rates = {
-        'Petrol': Decimal('22.00'),    # 22 PKR/km for petrol vehicles
-        'Diesel': Decimal('20.00'),    # 20 PKR/km for diesel (more efficient)
-        'CNG': Decimal('16.00'),       # 16 PKR/km for CNG (cheaper fuel)
-        'Electric': Decimal('14.00'),  # 14 PKR/km for electric (lowest operating cost)
-        'Hybrid': Decimal('18.00'),    # 18 PKR/km for hybrid
-    }
-    
-    # Get base rate based on fuel type
-    fuel_type = vehicle.fuel_type or 'Petrol'
-    base_rate_per_km = base_rates.get(fuel_type, base_rates['Petrol'])
-    
-    # 3. Vehicle type multiplier (Pakistan market)
-    vehicle_multipliers = {
-        'TW': Decimal('0.7'),   # Two-wheelers: 30% cheaper
-        'FW': Decimal('1.0'),   # Four-wheelers: standard rate
-    }
-    vehicle_multiplier = vehicle_multipliers.get(vehicle.vehicle_type, Decimal('1.0'))
-    
-    # 4. Peak hour multiplier (Pakistan traffic patterns)
-    time_multiplier = Decimal('1.0')
-    if is_peak_hour(departure_time):
-        time_multiplier = Decimal('1.30')  # 30% higher during peak hours
-    
-    # 5. Seat capacity factor (Pakistan market)
-    seat_factor = Decimal('1.0')
-    if vehicle.seats:
-        if vehicle.seats >= 8:
-            seat_factor = Decimal('1.20')  # 20% higher for large vehicles
-        elif vehicle.seats >= 5:
-            seat_factor = Decimal('1.10')  # 10% higher for medium vehicles
-    
-    # 6. Distance-based pricing (Pakistan market)
-    distance_factor = Decimal('1.0')
-    if total_distance <= 5:
-        distance_factor = Decimal('1.25')   # 25% higher for short trips
-    elif total_distance <= 15:
-        distance_factor = Decimal('1.0')    # Standard rate
-    elif total_distance <= 30:
-        distance_factor = Decimal('0.92')   # 8% discount for medium trips
-    else:
-        distance_factor = Decimal('0.85')   # 15% discount for long trips
-    
-    # 7. Calculate base fare
-    base_fare = (
-        base_rate_per_km * 
-        Decimal(str(total_distance)) * 
-        vehicle_multiplier * 
-        time_multiplier * 
-        seat_factor * 
-        distance_factor
-    )
-    
-    # 8. Pakistan-specific minimum fares
-    min_fares = {
-        'TW': Decimal('100.00'),   # 100 PKR minimum for two-wheelers
-        'FW': Decimal('150.00'),   # 150 PKR minimum for four-wheelers
-    }
-    min_fare = min_fares.get(vehicle.vehicle_type, Decimal('120.00'))
-    base_fare = max(base_fare, min_fare)
-    
-    # 9. Bulk booking discounts (Pakistan market)
-    bulk_discounts = {
-        1: Decimal('0.0'),    # No discount for single seat
-        2: Decimal('0.05'),   # 5% discount for 2 seats
-        3: Decimal('0.08'),   # 8% discount for 3 seats
-        4: Decimal('0.12'),   # 12% discount for 4 seats
-        5: Decimal('0.15'),   # 15% discount for 5 seats
-    }
-    discount = bulk_discounts.get(total_seats, Decimal('0.18'))  # 18% for 6+ seats
-    
-    final_fare = base_fare * (Decimal('1.0') - discount)
-    
-    # 10. Fuel cost calculation for transparency
-    fuel_efficiency = {
-        'Petrol': Decimal('12.0'),   # 12 km/liter average
-        'Diesel': Decimal('15.0'),   # 15 km/liter average
-        'CNG': Decimal('18.0'),      # 18 km/kg average
-        'Electric': Decimal('8.0'),  # 8 km/kWh average
-        'Hybrid': Decimal('14.0'),   # 14 km/liter average
-    }
-    
-    efficiency = fuel_efficiency.get(fuel_type, Decimal('12.0'))
-    fuel_consumed = Decimal(str(total_distance)) / efficiency
-    
-    fuel_costs = {
-        'Petrol': Decimal('275.0'),   # PKR/liter
-        'Diesel': Decimal('285.0'),   # PKR/liter
-        'CNG': Decimal('230.0'),      # PKR/kg
-        'Electric': Decimal('25.0'),  # PKR/kWh
-        'Hybrid': Decimal('275.0'),   # PKR/liter (petrol component)
-    }
-    
-    fuel_cost = fuel_consumed * fuel_costs.get(fuel_type, Decimal('275.0'))
+        if len(legs) < 2:
+            print("Insufficient stops, returning default fare")
+            return {'base_fare': 100.0, 'calculation_breakdown': {'error': 'Insufficient stops'}}
+        
+        total_distance = float(legs[-1][1])
+        print(f"Total distance: {total_distance} km")
+        
+        # 2. Rates, multipliers, minimums and discounts from the active fare rule version
+        quote = rules.quote(
+            total_distance_km=total_distance,
+            fuel_type=vehicle.fuel_type,
+            vehicle_type=vehicle.vehicle_type,
+            vehicle_seats=vehicle.seats,
+            time_multiplier=time_multiplier,
+            total_seats=total_seats,
+        )
+        quote['total_distance_km'] = total_distance
+        quote['total_duration_minutes'] = legs[-1][2]
+        return quote
     
-    return {
-        'base_fare': float(final_fare),
-        'calculation_breakdown': {
-            'total_distance_km': float(total_distance),
-            'base_rate_per_km': float(base_rate_per_km),
-            'vehicle_multiplier': float(vehicle_multiplier),
-            'time_multiplier': float(time_multiplier),
-            'seat_factor': float(seat_factor),
-            'distance_factor': float(distance_factor),
-            'is_peak_hour': is_peak_hour(departure_time),
-            'bulk_discount': float(discount * 100),  # Percentage
-            'min_fare_applied': float(final_fare) < float(base_fare),
-            'fuel_type': fuel_type,
-            'fuel_consumed': float(fuel_consumed),
-            'fuel_cost': float(fuel_cost),
-            'fuel_efficiency_km_per_unit': float(efficiency),
-            'profit_margin': float(final_fare - fuel_cost),
-            'profit_percentage': float(((final_fare - fuel_cost) / final_fare) * 100) if final_fare > 0 else 0,
-            'calculation_formula': f"Base Rate ({base_rate_per_km} PKR/km) × Distance ({total_distance:.1f}km) × Vehicle ({vehicle_multiplier}) × Time ({time_multiplier}) × Seats ({seat_factor}) × Distance Factor ({distance_factor}) × Discount ({1-discount})"
-        }
-    }
+    # Identical previews (same route, vehicle class, time multiplier and seat tier) are served from cache
+    return get_or_compute_quote(rules, route.id, vehicle, time_multiplier, total_seats, compute_quote)
 
 @csrf_exempt
 def calculate_fare(request):
@@ -205,12 +99,23 @@ def calculate_fare(request):
             dep_hour, dep_minute = map(int, departure_time_str.split(':'))
             departure_time = time(dep_hour, dep_minute)
             
-            # Get route and vehicle
-            route = Route.objects.get(route_id=route_id)
-            vehicle = Vehicle.objects.get(id=vehicle_id)
+            # Optional trip date, so the pricing calendar can tell weekends and holidays apart
+            trip_date = None
+            if data.get('trip_date'):
+                try:
+                    trip_date = datetime.strptime(data['trip_date'], '%Y-%m-%d').date()
+                except (TypeError, ValueError):
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'Invalid trip_date, expected YYYY-MM-DD'
+                    }, status=400)
+            
+            # Get route and vehicle (only what the quote needs)
+            route = Route.objects.only('id', 'route_id', 'route_name').get(route_id=route_id)
+            vehicle = Vehicle.objects.only('id', 'model_number', 'fuel_type', 'vehicle_type', 'seats').get(id=vehicle_id)
             
             # Calculate Pakistan-specific fare
-            fare_calculation = calculate_pakistan_fare(route, vehicle, departure_time, total_seats)
+            fare_calculation = calculate_pakistan_fare(route, vehicle, departure_time, total_seats, trip_date)
             
             return JsonResponse({
                 'success': True,
@@ -228,6 +133,7 @@ def calculate_fare(request):
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
 @csrf_exempt
+@idempotent('create_trip', caller_field='driver_id')
 def create_trip(request):
     """Create a new trip with enhanced fare calculation"""
     if request.method == 'POST':
@@ -256,6 +162,15 @@ def create_trip(request):
             print(f"  notes: {notes}")
             print(f"  gender_preference: {gender_preference}")
             
+            # Validate the whole stop breakdown up front so nothing is written for a bad payload
+            try:
+                stop_breakdowns = TripStopBreakdown.build_from_payload(None, data.get('stop_breakdown') or [])
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Invalid stop breakdown: {e}'
+                }, status=400)
+            
             # Get route and vehicle (lightweight to avoid loading large blobs)
             print("=== LOOKING UP ROUTE AND VEHICLE ===")
             try:
@@ -274,7 +189,10 @@ def create_trip(request):
                 print(f"Looking for vehicle with id: {vehicle_id}")
                 vehicle = (
                     Vehicle.objects
-                    .only('id', 'model_number', 'company_name', 'plate_number', 'vehicle_type', 'color', 'seats', 'fuel_type')
+                    .only(
+                        'id', 'model_number', 'company_name', 'plate_number', 'vehicle_type', 'color', 'seats',
+                        'fuel_type', 'engine_number', 'chassis_number'
+                    )
                     .defer('photo_front', 'photo_back', 'documents_image')
                     .get(id=vehicle_id)
                 )
@@ -323,7 +241,7 @@ def create_trip(request):
                 print(f"Using custom price from frontend: {custom_price}")
                 # Use custom price but still calculate for reference
                 try:
-                    fare_data = calculate_pakistan_fare(route, vehicle, departure_datetime, total_seats)
+                    fare_data = calculate_pakistan_fare(route, vehicle, departure_datetime, total_seats, trip_date)
                     # Override the calculated fare with custom price
                     fare_data['base_fare'] = float(custom_price)
                     print(f"Custom fare applied: {custom_price}")
@@ -338,7 +256,7 @@ def create_trip(request):
             else:
                 print("=== CALCULATING FARE ===")
                 try:
-                    fare_data = calculate_pakistan_fare(route, vehicle, departure_datetime, total_seats)
+                    fare_data = calculate_pakistan_fare(route, vehicle, departure_datetime, total_seats, trip_date)
                     print(f"Fare calculation completed: {fare_data}")
                 except Exception as e:
                     print(f"Error calculating fare: {e}")
@@ -383,34 +301,38 @@ def create_trip(request):
                     'error': 'Driver not found'
                 }, status=404)
             
-            # Create trip
+            # Create trip, vehicle snapshot and stop breakdowns together: a fixed number of
+            # INSERTs however many stops the route has, and no half-created trips
             print("=== CREATING TRIP ===")
             try:
-                print("Calculating estimated arrival time...")
                 estimated_arrival = calculate_estimated_arrival(departure_datetime, route)
                 print(f"Estimated arrival time: {estimated_arrival}")
                 
-                print("Creating trip object...")
-                trip = Trip.objects.create(
-                    trip_id=f"T{random.randint(100, 999)}-{datetime.now().strftime('%Y-%m-%d-%H:%M')}",
-                    route=route,
-                    vehicle=vehicle,
-                    driver=driver,
-                    trip_date=trip_date,
-                    departure_time=departure_datetime,
-                    estimated_arrival_time=estimated_arrival,
-                    total_seats=total_seats,
-                    available_seats=total_seats,
-                    base_fare=fare_data['base_fare'],
-                    total_distance_km=fare_data.get('total_distance_km'),
-                    total_duration_minutes=fare_data.get('total_duration_minutes'),
-                    fare_calculation=fare_data,
-                    notes=notes,
-                    gender_preference=gender_preference,
-                    is_negotiable=data.get('is_negotiable', True),
-                    minimum_acceptable_fare=data.get('minimum_acceptable_fare'),
-                )
-                print(f"Trip created successfully: {trip.trip_id}")
+                with transaction.atomic():
+                    trip = Trip.objects.create(
+                        trip_id=generate_trip_id(),
+                        route=route,
+                        vehicle=vehicle,
+                        driver=driver,
+                        trip_date=trip_date,
+                        departure_time=departure_datetime,
+                        estimated_arrival_time=estimated_arrival,
+                        total_seats=total_seats,
+                        available_seats=total_seats,
+                        base_fare=fare_data['base_fare'],
+                        total_distance_km=fare_data.get('total_distance_km'),
+                        total_duration_minutes=fare_data.get('total_duration_minutes'),
+                        fare_calculation=fare_data,
+                        notes=notes,
+                        gender_preference=gender_preference,
+                        is_negotiable=data.get('is_negotiable', True),
+                        minimum_acceptable_fare=data.get('minimum_acceptable_fare'),
+                    )
+                    TripVehicleHistory.objects.create(trip=trip, **TripVehicleHistory.fields_from_vehicle(vehicle))
+                    for breakdown in stop_breakdowns:
+                        breakdown.trip = trip
+                    TripStopBreakdown.objects.bulk_create(stop_breakdowns, batch_size=BULK_BATCH_SIZE)
+                print(f"Trip created successfully: {trip.trip_id} with {len(stop_breakdowns)} stop breakdowns")
             except Exception as e:
                 print(f"Error creating trip: {e}")
                 import traceback
@@ -420,77 +342,6 @@ def create_trip(request):
                     'error': f'Error creating trip: {str(e)}'
                 }, status=500)
             
-            # Create vehicle history
-            print("=== CREATING VEHICLE HISTORY ===")
-            try:
-                from .models import TripVehicleHistory
-                print("Creating vehicle history...")
-                
-                # First check if vehicle history already exists
-                try:
-                    vehicle_history = TripVehicleHistory.objects.get(trip=trip)
-                    print("Vehicle history already exists, updating...")
-                    vehicle_history.copy_from_vehicle(vehicle)
-                except TripVehicleHistory.DoesNotExist:
-                    print("Creating new vehicle history...")
-                    # Create with required fields from vehicle
-                    vehicle_history = TripVehicleHistory.objects.create(
-                        trip=trip,
-                        vehicle=vehicle,
-                        vehicle_type=vehicle.vehicle_type,
-                        vehicle_model=vehicle.model_number,
-                        vehicle_make=vehicle.company_name,
-                        vehicle_color=vehicle.color,
-                        license_plate=vehicle.plate_number,
-                        vehicle_capacity=vehicle.seats or 1,
-                        fuel_type=vehicle.fuel_type,
-                        engine_number=vehicle.engine_number,
-                        chassis_number=vehicle.chassis_number,
-                        vehicle_features={
-                            'type': vehicle.vehicle_type,
-                            'seats': vehicle.seats,
-                            'fuel_type': vehicle.fuel_type,
-                        }
-                    )
-                    print("Vehicle history created successfully")
-            except Exception as e:
-                print(f"Error creating vehicle history: {e}")
-                import traceback
-                traceback.print_exc()
-                # Don't fail the entire request for vehicle history error
-                print("Continuing without vehicle history...")
-            
-            # Create stop breakdowns if provided in request data
-            print("=== CREATING STOP BREAKDOWNS ===")
-            try:
-                if 'stop_breakdown' in data and data['stop_breakdown']:
-                    print(f"Creating {len(data['stop_breakdown'])} stop breakdown records...")
-                    for stop_data in data['stop_breakdown']:
-                        TripStopBreakdown.objects.create(
-                            trip=trip,
-                            from_stop_order=stop_data.get('from_stop'),
-                            to_stop_order=stop_data.get('to_stop'),
-                            from_stop_name=stop_data.get('from_stop_name'),
-                            to_stop_name=stop_data.get('to_stop_name'),
-                            distance_km=stop_data.get('distance'),
-                            duration_minutes=stop_data.get('duration'),
-                            price=stop_data.get('price'),
-                            from_latitude=stop_data.get('from_coordinates', {}).get('lat'),
-                            from_longitude=stop_data.get('from_coordinates', {}).get('lng'),
-                            to_latitude=stop_data.get('to_coordinates', {}).get('lat'),
-                            to_longitude=stop_data.get('to_coordinates', {}).get('lng'),
-                            price_breakdown=stop_data.get('price_breakdown', {}),
-                        )
-                    print("Stop breakdowns created successfully")
-                else:
-                    print("No stop breakdown data provided in request")
-            except Exception as e:
-                print(f"Error creating stop breakdowns: {e}")
-                import traceback
-                traceback.print_exc()
-                # Don't fail the entire request for stop breakdown error
-                print("Continuing without stop breakdowns...")
-            
             print("=== CREATE_TRIP SUCCESS ===")
             return JsonResponse({
                 'success': True,
@@ -522,6 +373,25 @@ def create_trip(request):
     }, status=405)
 
 # ================= Driver request management endpoints =================
+PENDING_REQUEST_FIELDS = (
+    'id', 'number_of_seats', 'bargaining_status', 'passenger__name', 'passenger__gender',
+    'from_stop__stop_name', 'to_stop__stop_name', 'passenger_offer'
+)
+
+
+def _pending_request_item(b):
+    """Driver-facing summary of a pending booking (expects passenger/from_stop/to_stop loaded)"""
+    return {
+        'booking_id': b.id,
+        'passenger_name': b.passenger.name if b.passenger_id else 'Passenger',
+        'passenger_gender': str(b.passenger.gender) if b.passenger_id else None,
+        'number_of_seats': int(b.number_of_seats) if b.number_of_seats else 0,
+        'from_stop_name': b.from_stop.stop_name if b.from_stop_id else None,
+        'to_stop_name': b.to_stop.stop_name if b.to_stop_id else None,
+        'passenger_offer_per_seat': float(b.passenger_offer) if b.passenger_offer is not None else None,
+        'bargaining_status': str(b.bargaining_status) if b.bargaining_status else 'PENDING',
+    }
+
 @csrf_exempt
 def list_pending_requests(request, trip_id):
     """Return all pending booking requests for a trip (driver-facing)."""
@@ -555,7 +425,7 @@ def list_pending_requests(request, trip_id):
             Booking.objects
             .filter(trip_id=trip_pk, booking_status='PENDING')
             .select_related('passenger', 'from_stop', 'to_stop')
-            .only('id', 'number_of_seats', 'bargaining_status', 'passenger__name', 'passenger__gender', 'from_stop__stop_name', 'to_stop__stop_name', 'passenger_offer')
+            .only(*PENDING_REQUEST_FIELDS)
             .order_by('-booked_at')[:50]
         )
         print(f"[list_pending_requests] Pending query took {(pytime.time()-t2)*1000:.1f}ms, count={pending.count()}")
@@ -564,16 +434,7 @@ def list_pending_requests(request, trip_id):
         t3 = pytime.time()
         items = []
         for b in pending:
-            items.append({
-                'booking_id': b.id,
-                'passenger_name': b.passenger.name if b.passenger_id else 'Passenger',
-                'passenger_gender': str(b.passenger.gender) if b.passenger_id else None,
-                'number_of_seats': int(b.number_of_seats) if b.number_of_seats else 0,
-                'from_stop_name': b.from_stop.stop_name if b.from_stop_id else None,
-                'to_stop_name': b.to_stop.stop_name if b.to_stop_id else None,
-                'passenger_offer_per_seat': float(b.passenger_offer) if b.passenger_offer is not None else None,
-                'bargaining_status': str(b.bargaining_status) if b.bargaining_status else 'PENDING',
-            })
+            items.append(_pending_request_item(b))
         print(f"[list_pending_requests] Serialize took {(pytime.time()-t3)*1000:.1f}ms, total elapsed {(pytime.time()-t0)*1000:.1f}ms")
         return JsonResponse({'success': True, 'pending_requests': items})
     except Trip.DoesNotExist:
@@ -601,16 +462,7 @@ def list_pending_requests(request, trip_id):
             )
             items = []
             for b in pending:
-                items.append({
-                    'booking_id': b.id,
-                    'passenger_name': b.passenger.name if b.passenger_id else 'Passenger',
-                    'passenger_gender': str(b.passenger.gender) if b.passenger_id else None,
-                    'number_of_seats': int(b.number_of_seats) if b.number_of_seats else 0,
-                    'from_stop_name': b.from_stop.stop_name if b.from_stop_id else None,
-                    'to_stop_name': b.to_stop.stop_name if b.to_stop_id else None,
-                    'passenger_offer_per_seat': float(b.passenger_offer) if b.passenger_offer is not None else None,
-                    'bargaining_status': str(b.bargaining_status) if b.bargaining_status else 'PENDING',
-                })
+                items.append(_pending_request_item(b))
             return JsonResponse({'success': True, 'pending_requests': items})
         except Exception as ex:
             print('[list_pending_requests][RETRY_FAIL]:', ex)
@@ -671,36 +523,40 @@ def passenger_respond_booking(request, trip_id, booking_id):
             booking.save()
             t.available_seats -= (booking.number_of_seats or 1)
             t.save(update_fields=['available_seats'])
+            NegotiationEvent.record(trip, booking, 'PASSENGER_ACCEPT', amount=final_total, reason=note)
             return JsonResponse({'success': True, 'message': 'Booking confirmed by passenger', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
                 'bargaining_status': booking.bargaining_status,
-                'total_fare': float(getattr(booking, 'total_fare', 0) or 0),
+                'total_fare': money_json(getattr(booking, 'total_fare', 0) or 0),
             }})
         elif action == 'counter':
             # Passenger proposes a counter offer
             try:
-                cf = Decimal(str(counter_fare)) if counter_fare is not None else None
-            except Exception:
+                cf = Money.optional(counter_fare)
+            except (TypeError, ValueError):
                 cf = None
-            if cf is None or cf <= 0:
+            if cf is None or cf <= ZERO:
                 return JsonResponse({'success': False, 'error': 'Invalid counter_fare'}, status=400)
-            setattr(booking, 'passenger_offer', cf)
+            setattr(booking, 'passenger_offer', cf.to_decimal())
             booking.bargaining_status = 'PASSENGER_COUNTER'
             booking.booking_status = 'PENDING'
             setattr(booking, 'negotiation_notes', note)
             booking.save()
+            NegotiationEvent.record(trip, booking, 'PASSENGER_COUNTER', amount=cf.to_decimal(), reason=note)
             return JsonResponse({'success': True, 'message': 'Counter offer submitted', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
                 'bargaining_status': booking.bargaining_status,
-                'passenger_offer_per_seat': float(cf),
+                'passenger_offer_per_seat': cf.to_float(),
             }})
         elif action == 'withdraw':
             booking.booking_status = 'CANCELLED'
+            booking.cancelled_at = timezone.now()
             booking.bargaining_status = 'WITHDRAWN'
             setattr(booking, 'negotiation_notes', note)
             booking.save()
+            NegotiationEvent.record(trip, booking, 'WITHDRAW', reason=note)
             return JsonResponse({'success': True, 'message': 'Booking withdrawn', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
@@ -731,10 +587,10 @@ def _serialize_booking_detail(b: Booking):
         'from_stop_name': b.from_stop.stop_name if getattr(b, 'from_stop_id', None) else None,
         'to_stop_id': getattr(b, 'to_stop_id', None),
         'to_stop_name': b.to_stop.stop_name if getattr(b, 'to_stop_id', None) else None,
-        'original_fare_per_seat': float(b.original_fare) if b.original_fare is not None else None,
-        'negotiated_fare_per_seat': float(b.negotiated_fare) if b.negotiated_fare is not None else None,
-        'passenger_offer_per_seat': float(b.passenger_offer) if b.passenger_offer is not None else None,
-        'passenger_offer_total': float((b.passenger_offer or 0) * (b.number_of_seats or 0)) if b.passenger_offer is not None and b.number_of_seats else None,
+        'original_fare_per_seat': money_json(b.original_fare),
+        'negotiated_fare_per_seat': money_json(b.negotiated_fare),
+        'passenger_offer_per_seat': money_json(b.passenger_offer),
+        'passenger_offer_total': money_json(b.passenger_offer_total),
         'passenger_message': b.negotiation_notes if getattr(b, 'negotiation_notes', None) else None,
         'bargaining_status': str(b.bargaining_status) if b.bargaining_status else None,
         'booking_status': str(b.booking_status),
@@ -765,6 +621,32 @@ def booking_request_details(request, trip_id, booking_id):
         traceback.print_exc()
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+@csrf_exempt
+def negotiation_history(request, trip_id):
+    """GET: Negotiation events for a trip, oldest first.
+    Optional query params: booking_id, after_id (incremental reads), limit (max 500).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Only GET allowed'}, status=405)
+    try:
+        trip_pk = Trip.objects.filter(trip_id=trip_id).values_list('id', flat=True).first()
+        if trip_pk is None:
+            return JsonResponse({'success': False, 'error': 'Trip not found'}, status=404)
+        try:
+            booking_id = int(request.GET['booking_id']) if request.GET.get('booking_id') else None
+            after_id = int(request.GET['after_id']) if request.GET.get('after_id') else None
+            limit = max(1, min(int(request.GET.get('limit', 100)), 500))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'booking_id, after_id and limit must be integers'}, status=400)
+        events = NegotiationEvent.history(trip_pk, booking_id=booking_id, after_id=after_id, limit=limit)
+        return JsonResponse({
+            'success': True,
+            'events': events,
+            'next_after_id': events[-1]['id'] if events else after_id,
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
 @csrf_exempt
 def respond_booking_request(request, trip_id, booking_id):
     """Driver responds to a booking request: accept/counter/reject."""
@@ -812,32 +694,20 @@ def respond_booking_request(request, trip_id, booking_id):
             booking.save()
             trip.available_seats -= booking.number_of_seats
             trip.save()
-            # store event
-            try:
-                hist = trip.bargaining_history or []
-                hist.append({'action': 'accept', 'passenger_id': booking.passenger_id, 'booking_id': booking.id, 'ts': timezone.now().isoformat()})
-                trip.bargaining_history = hist
-                trip.save(update_fields=['bargaining_history'])
-            except Exception:
-                pass
+            NegotiationEvent.record(trip, booking, 'ACCEPT')
             return JsonResponse({'success': True, 'message': 'Booking confirmed', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
                 'bargaining_status': booking.bargaining_status,
-                'total_fare': float(getattr(booking, 'total_fare', 0) or 0),
+                'total_fare': money_json(getattr(booking, 'total_fare', 0) or 0),
             }})
         elif action == 'reject':
             booking.bargaining_status = 'REJECTED'
             booking.booking_status = 'CANCELLED'
+            booking.cancelled_at = timezone.now()
             booking.driver_response = reason
             booking.save()
-            try:
-                hist = trip.bargaining_history or []
-                hist.append({'action': 'reject', 'passenger_id': booking.passenger_id, 'booking_id': booking.id, 'reason': reason, 'ts': timezone.now().isoformat()})
-                trip.bargaining_history = hist
-                trip.save(update_fields=['bargaining_history'])
-            except Exception:
-                pass
+            NegotiationEvent.record(trip, booking, 'REJECT', reason=reason)
             return JsonResponse({'success': True, 'message': 'Booking rejected', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
@@ -848,35 +718,30 @@ def respond_booking_request(request, trip_id, booking_id):
                 return JsonResponse({'success': False, 'error': 'Trip is not negotiable'}, status=400)
             if counter_fare is None:
                 return JsonResponse({'success': False, 'error': 'counter_fare is required for counter action'}, status=400)
-            booking.negotiated_fare = Decimal(str(counter_fare))
+            try:
+                counter = Money.parse(counter_fare)
+            except (TypeError, ValueError):
+                counter = ZERO
+            if counter <= ZERO:
+                return JsonResponse({'success': False, 'error': 'Invalid counter_fare'}, status=400)
+            booking.negotiated_fare = counter.to_decimal()
             booking.bargaining_status = 'COUNTER_OFFER'
             booking.driver_response = reason
             booking.save()
-            try:
-                hist = trip.bargaining_history or []
-                hist.append({'action': 'counter', 'passenger_id': booking.passenger_id, 'booking_id': booking.id, 'counter_fare': float(counter_fare), 'reason': reason, 'ts': timezone.now().isoformat()})
-                trip.bargaining_history = hist
-                trip.save(update_fields=['bargaining_history'])
-            except Exception:
-                pass
+            NegotiationEvent.record(trip, booking, 'COUNTER', amount=booking.negotiated_fare, reason=reason)
             return JsonResponse({'success': True, 'message': 'Counter offer sent', 'booking': {
                 'id': booking.id,
                 'bargaining_status': booking.bargaining_status,
-                'negotiated_fare': float(booking.negotiated_fare) if booking.negotiated_fare else None,
+                'negotiated_fare': counter.to_float(),
             }})
         elif action == 'block':
             # Block passenger for this ride only
             booking.bargaining_status = 'BLOCKED'
             booking.booking_status = 'CANCELLED'
+            booking.cancelled_at = timezone.now()
             booking.driver_response = reason
-            booking.save(update_fields=['bargaining_status', 'booking_status', 'driver_response'])
-            try:
-                hist = trip.bargaining_history or []
-                hist.append({'action': 'block', 'passenger_id': booking.passenger_id, 'booking_id': booking.id, 'reason': reason, 'ts': timezone.now().isoformat()})
-                trip.bargaining_history = hist
-                trip.save(update_fields=['bargaining_history'])
-            except Exception:
-                pass
+            booking.save(update_fields=['bargaining_status', 'booking_status', 'cancelled_at', 'driver_response', 'updated_at'])
+            NegotiationEvent.record(trip, booking, 'BLOCK', reason=reason)
             return JsonResponse({'success': True, 'message': 'Passenger blocked for this ride', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
@@ -886,15 +751,10 @@ def respond_booking_request(request, trip_id, booking_id):
             # Mark blacklist event (system-wide enforcement requires separate model)
             booking.bargaining_status = 'BLOCKED'
             booking.booking_status = 'CANCELLED'
+            booking.cancelled_at = timezone.now()
             booking.driver_response = reason
-            booking.save(update_fields=['bargaining_status', 'booking_status', 'driver_response'])
-            try:
-                hist = trip.bargaining_history or []
-                hist.append({'action': 'blacklist', 'passenger_id': booking.passenger_id, 'booking_id': booking.id, 'reason': reason, 'ts': timezone.now().isoformat()})
-                trip.bargaining_history = hist
-                trip.save(update_fields=['bargaining_history'])
-            except Exception:
-                pass
+            booking.save(update_fields=['bargaining_status', 'booking_status', 'cancelled_at', 'driver_response', 'updated_at'])
+            NegotiationEvent.record(trip, booking, 'BLACKLIST', reason=reason)
             return JsonResponse({'success': True, 'message': 'Passenger added to blacklist', 'booking': {
                 'id': booking.id,
                 'status': booking.booking_status,
@@ -909,7 +769,159 @@ def respond_booking_request(request, trip_id, booking_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+MAX_BULK_RESPOND_ACTIONS = 100
+
+
+def _apply_driver_action(trip, booking, action, counter_fare, reason, now):
+    """Apply one driver action to in-memory trip/booking objects (no DB writes).
+    Returns (result dict, unsaved NegotiationEvent or None). Mirrors respond_booking_request.
+    """
+    if booking.booking_status != 'PENDING':
+        return {'success': False, 'error': f'Booking is {booking.booking_status}, not PENDING'}, None
+
+    event_amount = None
+    if action == 'accept':
+        if trip.available_seats < booking.number_of_seats:
+            return {'success': False, 'error': 'Not enough seats available'}, None
+        if trip.is_negotiable:
+            if booking.negotiated_fare is not None:
+                booking.total_fare = booking.negotiated_fare
+            elif booking.passenger_offer is not None:
+                booking.total_fare = booking.passenger_offer
+            booking.bargaining_status = 'ACCEPTED'
+        booking.booking_status = 'CONFIRMED'
+        trip.available_seats -= booking.number_of_seats
+    elif action == 'reject':
+        booking.bargaining_status = 'REJECTED'
+        booking.booking_status = 'CANCELLED'
+        booking.cancelled_at = now
+    elif action == 'counter':
+        if not trip.is_negotiable:
+            return {'success': False, 'error': 'Trip is not negotiable'}, None
+        try:
+            counter = Money.optional(counter_fare)
+        except (TypeError, ValueError):
+            counter = None
+        if counter is None or counter <= ZERO:
+            return {'success': False, 'error': 'counter_fare is required for counter action'}, None
+        event_amount = counter.to_decimal()
+        booking.negotiated_fare = event_amount
+        booking.bargaining_status = 'COUNTER_OFFER'
+    else:
+        return {'success': False, 'error': 'Invalid action'}, None
+
+    booking.driver_response = reason
+    booking.updated_at = now
+    event = NegotiationEvent(
+        trip=trip,
+        booking=booking,
+        passenger_id=booking.passenger_id,
+        action=action.upper(),
+        amount=event_amount,
+        reason=reason if action != 'accept' else None,
+        created_at=now,
+    )
+    return {
+        'success': True,
+        'status': booking.booking_status,
+        'bargaining_status': booking.bargaining_status,
+        'total_fare': money_json(booking.total_fare),
+        'negotiated_fare': money_json(booking.negotiated_fare),
+    }, event
+
+
 @csrf_exempt
+@idempotent('bulk_respond', caller_field='driver_id')
+def bulk_respond_booking_requests(request, trip_id):
+    """Driver applies accept/reject/counter to many pending requests at once.
+    Body: {"driver_id": 1, "actions": [{"booking_id": 5, "action": "accept"},
+           {"booking_id": 6, "action": "counter", "counter_fare": 300, "reason": "..."}]}
+    The trip row is locked once and accepts reserve seats in list order. Items that
+    fail validation are reported and skipped; the rest commit in one transaction.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST allowed'}, status=405)
+    try:
+        data = json.loads(request.body or '{}')
+        driver_id = data.get('driver_id')
+        actions = data.get('actions')
+
+        if not driver_id:
+            return JsonResponse({'success': False, 'error': 'driver_id is required'}, status=400)
+        if not isinstance(actions, list) or not actions:
+            return JsonResponse({'success': False, 'error': 'actions must be a non-empty list'}, status=400)
+        if len(actions) > MAX_BULK_RESPOND_ACTIONS:
+            return JsonResponse({'success': False, 'error': f'At most {MAX_BULK_RESPOND_ACTIONS} actions per request'}, status=400)
+
+        booking_ids = []
+        for item in actions:
+            try:
+                booking_ids.append(int(item.get('booking_id')))
+            except (TypeError, ValueError, AttributeError):
+                booking_ids.append(None)
+
+        now = timezone.now()
+        results = []
+        with transaction.atomic():
+            trip = (
+                Trip.objects.select_for_update()
+                .only('id', 'trip_id', 'driver_id', 'available_seats', 'total_seats', 'is_negotiable', 'route_id')
+                .get(trip_id=trip_id)
+            )
+            if trip.driver_id != int(driver_id):
+                return JsonResponse({'success': False, 'error': 'Only the trip driver can respond'}, status=403)
+
+            bookings = {
+                b.id: b for b in Booking.objects.filter(
+                    trip_id=trip.id, id__in=[b_id for b_id in booking_ids if b_id is not None]
+                ).only(
+                    'id', 'trip_id', 'passenger_id', 'number_of_seats', 'booking_status', 'bargaining_status',
+                    'total_fare', 'negotiated_fare', 'passenger_offer', 'driver_response', 'updated_at'
+                )
+            }
+
+            changed = {}
+            events = []
+            for item, booking_id in zip(actions, booking_ids):
+                action = (item.get('action') or '').lower() if isinstance(item, dict) else ''
+                booking = bookings.get(booking_id)
+                if booking is None:
+                    results.append({'booking_id': booking_id, 'action': action, 'success': False, 'error': 'Booking not found for this trip'})
+                    continue
+                result, event = _apply_driver_action(
+                    trip, booking, action, item.get('counter_fare'), item.get('reason'), now
+                )
+                results.append({'booking_id': booking_id, 'action': action, **result})
+                if event is not None:
+                    changed[booking.id] = booking
+                    events.append(event)
+
+            if changed:
+                Booking.objects.bulk_update(
+                    list(changed.values()),
+                    ['booking_status', 'bargaining_status', 'total_fare', 'negotiated_fare', 'driver_response', 'cancelled_at', 'updated_at'],
+                )
+                Trip.objects.filter(id=trip.id).update(available_seats=trip.available_seats, updated_at=now)
+                RouteStatistics.mark_stale([trip.route_id])
+                NegotiationEvent.objects.bulk_create(events)
+                publish_negotiation_events(trip, events)
+
+        return JsonResponse({
+            'success': True,
+            'applied': sum(1 for r in results if r['success']),
+            'failed': sum(1 for r in results if not r['success']),
+            'available_seats': trip.available_seats,
+            'results': results,
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    except Trip.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Trip not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+@csrf_exempt
+@idempotent('booking_request', caller_field='passenger_id')
 def handle_ride_booking_request(request, trip_id):
     """Handle ride booking requests with bargaining functionality"""
     if request.method == 'POST':
@@ -927,6 +939,13 @@ def handle_ride_booking_request(request, trip_id):
             proposed_fare = data.get('proposed_fare')
             final_fare = data.get('final_fare')
             is_negotiated = data.get('is_negotiated', False)
+            try:
+                proposed_fare = Money.optional(proposed_fare)
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid proposed_fare'
+                }, status=400)
             
             # Get trip
             try:
@@ -991,28 +1010,28 @@ def handle_ride_booking_request(request, trip_id):
                 
                 # If user proposed a different fare, use that for bargaining
                 if is_negotiated and proposed_fare:
-                    final_fare = float(proposed_fare)
+                    final_fare = proposed_fare
                 else:
                     final_fare = calculated_fare
                     
             except Exception as e:
                 print(f"Error calculating fare: {e}")
                 # Fallback to base fare if calculation fails
-                calculated_fare = float(trip.base_fare) * number_of_seats
+                calculated_fare = Money.from_decimal(trip.base_fare) * int(number_of_seats)
                 original_fare = calculated_fare
                 final_fare = calculated_fare
             
             # Create booking with bargaining information
             booking = Booking.objects.create(
-                booking_id=f"B{random.randint(100, 999)}-{datetime.now().strftime('%Y-%m-%d-%H:%M')}-{passenger_id}",
+                booking_id=generate_booking_id(),
                 trip=trip,
                 passenger=passenger,
                 from_stop=from_stop,
                 to_stop=to_stop,
                 number_of_seats=number_of_seats,
-                total_fare=final_fare,
-                original_fare=original_fare,
-                passenger_offer=proposed_fare,
+                total_fare=final_fare.to_decimal(),
+                original_fare=original_fare.to_decimal(),
+                passenger_offer=proposed_fare.to_decimal() if proposed_fare is not None else None,
                 booking_status='PENDING',  # Explicitly set to PENDING for driver approval
                 bargaining_status='PENDING' if is_negotiated else 'NO_NEGOTIATION',
                 negotiation_notes=special_requests,
@@ -1022,28 +1041,23 @@ def handle_ride_booking_request(request, trip_id):
             # trip.available_seats -= number_of_seats  # Removed - only deduct when confirmed
             # trip.save()  # Removed - no need to save trip here
             
-            # Add to bargaining history if negotiated
+            # Append to negotiation log if negotiated
             if is_negotiated:
-                bargaining_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'passenger_id': passenger_id,
-                    'passenger_name': passenger.name,
-                    'original_fare': float(original_fare),
-                    'proposed_fare': float(proposed_fare),
-                    'status': 'PENDING'
-                }
-                
-                if not trip.bargaining_history:
-                    trip.bargaining_history = []
-                trip.bargaining_history.append(bargaining_entry)
-                trip.save()
+                NegotiationEvent.record(
+                    trip, booking, 'OFFER',
+                    amount=booking.passenger_offer,
+                    original_fare=booking.original_fare,
+                )
+            else:
+                publish_booking_request(trip, booking)
             
             return JsonResponse({
                 'success': True, 
                 'message': 'Ride booking request submitted successfully',
                 'booking_id': booking.booking_id,
                 'bargaining_status': booking.bargaining_status,
-                'total_fare': float(booking.total_fare)
+                'total_fare': final_fare.to_float(),
+                'segment': from_stop.segment_to(to_stop),
             }, status=201)
             
         except json.JSONDecodeError:
@@ -1196,57 +1210,87 @@ def create_route(request):
             destination_name = location_names[-1] if len(location_names) > 1 else "Destination"
             route_name = f"{origin_name} to {destination_name}"
             
+            # Validate every stop before writing anything
+            points = []
+            for i, coord in enumerate(coordinates):
+                try:
+                    lat, lng = float(coord['lat']), float(coord['lng'])
+                except (KeyError, TypeError, ValueError):
+                    return JsonResponse({'success': False, 'error': f'Invalid coordinate at index {i}'}, status=400)
+                if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                    return JsonResponse({'success': False, 'error': f'Coordinate out of range at index {i}'}, status=400)
+                points.append((lat, lng))
+            
+            # Road geometry between the stops, if the client sent it; otherwise the stops are the path
+            path = []
+            for i, point in enumerate(route_points or []):
+                try:
+                    if isinstance(point, dict):
+                        path.append((float(point['lat']), float(point['lng'])))
+                    else:
+                        path.append((float(point[0]), float(point[1])))
+                except (KeyError, IndexError, TypeError, ValueError):
+                    return JsonResponse({'success': False, 'error': f'Invalid route point at index {i}'}, status=400)
+            if len(path) < 2:
+                path = points
+            
+            # The same stops in the same order (to within ~100 m) reuse the existing route
+            geometry_hash = route_geometry_hash(points)
+            existing = Route.objects.filter(geometry_hash=geometry_hash).first()
+            if existing is not None and existing.is_active:
+                if not existing.route_polyline:
+                    existing.set_path(path)
+                    existing.save(update_fields=['route_polyline', 'polyline_levels', 'updated_at'])
+                return _route_created_response(existing, len(points), reused=True)
+            
+            # Cumulative distance and ETA per stop; the last row is the route total
+            legs = leg_table(points)
+            total_distance, total_minutes = legs[-1]
+            
             # Generate unique route ID
             import uuid
             route_id = f"R{str(uuid.uuid4())[:8].upper()}"
             
-            # Create the route
-            route = Route.objects.create(
-                route_id=route_id,
-                route_name=route_name,
-                route_description=f"Route from {origin_name} to {destination_name}",
-                is_active=True
-            )
-            
-            # Create route stops from coordinates
-            for i, coord in enumerate(coordinates):
-                stop_name = location_names[i] if i < len(location_names) else f"Stop {i+1}"
-                RouteStop.objects.create(
-                    route=route,
-                    stop_name=stop_name,
-                    stop_order=i+1,
-                    latitude=coord.get('lat'),
-                    longitude=coord.get('lng'),
-                    address=stop_name,
-                    is_active=True
-                )
-            
-            # Calculate total distance (simplified - sum of distances between consecutive points)
-            total_distance = 0
-            for i in range(len(coordinates) - 1):
-                from_coord = coordinates[i]
-                to_coord = coordinates[i + 1]
-                distance = _calculate_distance(
-                    from_coord.get('lat'), from_coord.get('lng'),
-                    to_coord.get('lat'), to_coord.get('lng')
-                )
-                total_distance += distance
-            
-            # Update route with calculated distance
-            route.total_distance_km = round(total_distance, 2)
-            route.estimated_duration_minutes = int(total_distance * 2)  # Rough estimate: 2 min per km
-            route.save()
-            
-            return JsonResponse({
-                'success': True,
-                'route': {
-                    'id': route.route_id,
-                    'name': route.route_name,
-                    'distance': float(route.total_distance_km),
-                    'duration': route.estimated_duration_minutes,
-                    'stops_count': len(coordinates)
-                }
-            })
+            # Route with its totals and all of its stops: two INSERTs regardless of stop count
+            try:
+                with transaction.atomic():
+                    if existing is not None:
+                        # A deactivated route gives its hash up to the replacement
+                        Route.objects.filter(pk=existing.pk).update(geometry_hash=None)
+                    route = Route.objects.create(
+                        route_id=route_id,
+                        route_name=route_name,
+                        route_description=f"Route from {origin_name} to {destination_name}",
+                        total_distance_km=total_distance,
+                        estimated_duration_minutes=max(1, total_minutes),
+                        geometry_hash=geometry_hash,
+                        route_polyline=encode_polyline(path),
+                        polyline_levels=build_polyline_levels(path),
+                        is_active=True
+                    )
+                    stops = []
+                    for i, ((lat, lng), (distance_km, minutes)) in enumerate(zip(points, legs)):
+                        stop_name = location_names[i] if i < len(location_names) else f"Stop {i+1}"
+                        stops.append(RouteStop(
+                            route=route,
+                            stop_name=stop_name,
+                            stop_order=i+1,
+                            latitude=round(lat, 8),
+                            longitude=round(lng, 8),
+                            address=stop_name,
+                            distance_from_start_km=distance_km,
+                            estimated_time_from_start=minutes,
+                            is_active=True
+                        ))
+                    RouteStop.objects.bulk_create(stops, batch_size=BULK_BATCH_SIZE)
+            except IntegrityError:
+                # Lost a race with an identical create_route
+                route = Route.objects.filter(geometry_hash=geometry_hash).first()
+                if route is None:
+                    raise
+                return _route_created_response(route, len(points), reused=True)
+            
+            return _route_created_response(route, len(points), reused=False)
             
         except Exception as e:
             import traceback
@@ -1255,20 +1299,26 @@ def create_route(request):
     
     return JsonResponse({'error': 'Invalid request method'}, status=400)
 
+def _route_created_response(route, stops_count, reused):
+    return JsonResponse({
+        'success': True,
+        'route': {
+            'id': route.route_id,
+            'name': route.route_name,
+            'distance': float(route.total_distance_km or 0),
+            'duration': route.estimated_duration_minutes,
+            'stops_count': stops_count,
+            'reused': reused,
+            'polyline': route.route_polyline,
+        }
+    })
+
 def calculate_estimated_arrival(departure_time, route):
-    """Calculate estimated arrival time based on route distance and average speed"""
-    if not route.total_distance_km:
-        # If no distance available, add 2 hours as default
-        departure_minutes = departure_time.hour * 60 + departure_time.minute
-        arrival_minutes = departure_minutes + 120  # 2 hours
-        arrival_hour = (arrival_minutes // 60) % 24  # Ensure hour is within 0-23
-        arrival_minute = arrival_minutes % 60
-        return time(arrival_hour, arrival_minute)
-    
-    # Assume average speed of 50 km/h for better time estimates (was too slow at 30)
-    average_speed_kmh = 50
-    travel_time_hours = route.total_distance_km / average_speed_kmh
-    travel_time_minutes = int(travel_time_hours * 60)
+    """Departure time plus the route's travel time from the leg table (2 hours if unknown)"""
+    travel_time_minutes = route_duration_minutes(route.id)
+    if travel_time_minutes is None:
+        # Stops without a leg table: fall back to the route distance at the planning speed
+        travel_time_minutes = minutes_for_km(route.total_distance_km) if route.total_distance_km else 120
     
     departure_minutes = departure_time.hour * 60 + departure_time.minute
     arrival_minutes = departure_minutes + travel_time_minutes
@@ -1276,39 +1326,11 @@ def calculate_estimated_arrival(departure_time, route):
     arrival_minute = arrival_minutes % 60
     
     print(f"Departure: {departure_time.hour}:{departure_time.minute}")
-    print(f"Travel time: {travel_time_hours:.2f} hours ({travel_time_minutes} minutes)")
+    print(f"Travel time: {travel_time_minutes} minutes")
     print(f"Calculated arrival: {arrival_hour}:{arrival_minute:02d}")
     
     return time(arrival_hour, arrival_minute)
 
-def _calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    print(f"  _calculate_distance called with: lat1={lat1}, lon1={lon1}, lat2={lat2}, lon2={lon2}")
-    
-    try:
-        from math import radians, cos, sin, asin, sqrt
-        
-        # Convert to radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        print(f"  Converted to radians: lat1={lat1}, lon1={lon1}, lat2={lat2}, lon2={lon2}")
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        
-        # Radius of earth in kilometers
-        r = 6371
-        
-        distance = c * r
-        print(f"  Calculated distance: {distance} km")
-        return distance
-    except Exception as e:
-        print(f"  Error in _calculate_distance: {e}")
-        return 0
-
-
 @csrf_exempt
 def get_trip_breakdown(request, trip_id):
     """Get detailed breakdown for a specific trip"""
@@ -1381,11 +1403,13 @@ def update_trip_status_automatically(trip):
         trip.trip_status = 'COMPLETED'
         trip.completed_at = now
         trip.save()
+        publish_trip_status(trip)
     # If trip is currently happening (within 2 hours of departure), mark as in progress
     elif (trip_datetime - timedelta(hours=2)) <= now <= (trip_datetime + timedelta(hours=8)) and trip.trip_status == 'SCHEDULED':
         trip.trip_status = 'IN_PROGRESS'
         trip.started_at = now
         trip.save()
+        publish_trip_status(trip)
     
     return trip
 
@@ -1446,6 +1470,13 @@ def get_user_rides(request, user_id):
             mode = (request.GET.get('mode') or '').lower()
             is_summary = mode == 'summary'
 
+            # geometry=polyline: encoded strings instead of route_coordinates lists (detail mode only)
+            use_polyline = (request.GET.get('geometry') or '').lower() == 'polyline' and not is_summary
+            try:
+                zoom = int(request.GET['zoom']) if request.GET.get('zoom') else None
+            except ValueError:
+                zoom = None
+
             # Prefetch minimal related data only when not in summary mode
             route_stops_prefetch = None
             stop_breakdowns_prefetch = None
@@ -1460,22 +1491,26 @@ def get_user_rides(request, user_id):
                 )
 
             # Optimized trips queryset
+            trip_fields = [
+                'id', 'trip_id', 'trip_date', 'departure_time', 'created_at', 'updated_at', 'trip_status',
+                'total_seats', 'available_seats', 'base_fare', 'gender_preference', 'notes', 'is_negotiable',
+                'total_distance_km', 'total_duration_minutes',
+                'route__route_id', 'route__route_name', 'route__route_description', 'route__total_distance_km', 'route__estimated_duration_minutes',
+                'vehicle__id', 'vehicle__model_number', 'vehicle__company_name', 'vehicle__plate_number', 'vehicle__vehicle_type', 'vehicle__color', 'vehicle__seats', 'vehicle__fuel_type',
+            ]
+            if use_polyline:
+                trip_fields += ['route__route_polyline', 'route__polyline_levels']
             trips_qs = (
                 Trip.objects.filter(driver=user)
                 .select_related('route', 'vehicle')
-                .only(
-                    'id', 'trip_id', 'trip_date', 'departure_time', 'created_at', 'updated_at', 'trip_status',
-                    'total_seats', 'available_seats', 'base_fare', 'gender_preference', 'notes', 'is_negotiable',
-                    'total_distance_km', 'total_duration_minutes',
-                    'route__route_id', 'route__route_name', 'route__route_description', 'route__total_distance_km', 'route__estimated_duration_minutes',
-                    'vehicle__id', 'vehicle__model_number', 'vehicle__company_name', 'vehicle__plate_number', 'vehicle__vehicle_type', 'vehicle__color', 'vehicle__seats', 'vehicle__fuel_type',
-                )
+                .only(*trip_fields)
                 .annotate(booking_count=Count('trip_bookings', filter=Q(trip_bookings__booking_status='CONFIRMED')))
                 .order_by('-created_at')
             )
             if not is_summary:
                 trips_qs = trips_qs.prefetch_related(route_stops_prefetch, stop_breakdowns_prefetch)
 
+
             trips_qs = trips_qs[offset:offset + limit]
 
             rides_list = []
@@ -1518,6 +1553,15 @@ def get_user_rides(request, user_id):
                     for stop in route.route_stops.all():
                         if stop.latitude and stop.longitude:
                             route_coordinates.append({'lat': float(stop.latitude), 'lng': float(stop.longitude), 'name': stop.stop_name, 'order': stop.stop_order})
+                if use_polyline:
+                    geometry = {
+                        'route_polyline': encode_polyline((c['lat'], c['lng']) for c in route_coordinates),
+                        'route_path': route.polyline_for_zoom(zoom) if route else None,
+                    }
+                elif not is_summary:
+                    geometry = {'route_coordinates': route_coordinates}
+                else:
+                    geometry = {}
 
                 # Stop breakdowns (heavy) only in detail mode
                 stop_breakdown = []
@@ -1550,7 +1594,7 @@ def get_user_rides(request, user_id):
                     'from_location': route_names[0] if route_names else 'Unknown',
                     'to_location': route_names[-1] if route_names else 'Unknown',
                     'route_names': route_names,
-                    **({'route_coordinates': route_coordinates} if not is_summary else {}),
+                    **geometry,
                     'distance': float(trip.total_distance_km) if trip.total_distance_km is not None else None,
                     'duration': trip.total_duration_minutes,
                     'custom_price': float(trip.base_fare) if trip.base_fare is not None else None,
@@ -1805,7 +1849,7 @@ def update_trip(request, trip_id):
                 trip.available_seats = data['total_seats']  # Reset available seats
             
             if 'base_fare' in data:
-                trip.base_fare = Decimal(str(data['base_fare']))
+                trip.base_fare = Money.parse(data['base_fare']).to_decimal()
             
             if 'gender_preference' in data:
                 trip.gender_preference = data['gender_preference']
@@ -1822,46 +1866,13 @@ def update_trip(request, trip_id):
                 trip.total_distance_km = data['fare_calculation'].get('total_distance_km')
                 trip.total_duration_minutes = data['fare_calculation'].get('total_duration_minutes')
             
-            # Update stop breakdowns if provided
+            # Validate replacement stop breakdowns (new or legacy keys) before touching the existing ones
+            stop_breakdowns = None
             if 'stop_breakdown' in data:
-                # Delete existing breakdowns
-                trip.stop_breakdowns.all().delete()
-                
-                # Create new breakdowns
-                for idx, stop_data in enumerate(data['stop_breakdown'] or []):
-                    try:
-                        # Coalesce legacy and new keys
-                        from_order = stop_data.get('from_stop') if stop_data.get('from_stop') is not None else stop_data.get('from_stop_order')
-                        to_order = stop_data.get('to_stop') if stop_data.get('to_stop') is not None else stop_data.get('to_stop_order')
-                        distance = stop_data.get('distance') if stop_data.get('distance') is not None else stop_data.get('distance_km')
-                        duration = stop_data.get('duration') if stop_data.get('duration') is not None else stop_data.get('duration_minutes')
-                        # Final fallbacks
-                        if duration is None:
-                            duration = 0
-                        if distance is None:
-                            distance = 0.0
-
-                        print(f"[UPDATE_TRIP][SB#{idx+1}] from={from_order} to={to_order} km={distance} min={duration} price={stop_data.get('price')}")
-                        print(f"[UPDATE_TRIP][SB#{idx+1}] names=({stop_data.get('from_stop_name')} -> {stop_data.get('to_stop_name')})")
-
-                        TripStopBreakdown.objects.create(
-                            trip=trip,
-                            from_stop_order=from_order,
-                            to_stop_order=to_order,
-                            from_stop_name=stop_data.get('from_stop_name'),
-                            to_stop_name=stop_data.get('to_stop_name'),
-                            distance_km=distance,
-                            duration_minutes=duration,
-                            price=stop_data.get('price'),
-                            from_latitude=(stop_data.get('from_coordinates') or {}).get('lat'),
-                            from_longitude=(stop_data.get('from_coordinates') or {}).get('lng'),
-                            to_latitude=(stop_data.get('to_coordinates') or {}).get('lat'),
-                            to_longitude=(stop_data.get('to_coordinates') or {}).get('lng'),
-                            price_breakdown=stop_data.get('price_breakdown', {}),
-                        )
-                    except Exception as _ex:
-                        print(f"[UPDATE_TRIP][SB#{idx+1}] ERROR while creating breakdown:", _ex)
-                        raise
+                try:
+                    stop_breakdowns = TripStopBreakdown.build_from_payload(trip, data['stop_breakdown'] or [])
+                except ValueError as e:
+                    return JsonResponse({'success': False, 'error': f'Invalid stop breakdown: {e}'}, status=400)
             
             # Safety: ensure gender_preference is never null to satisfy NOT NULL constraint
             try:
@@ -1870,7 +1881,11 @@ def update_trip(request, trip_id):
             except Exception:
                 trip.gender_preference = 'Any'
             
-            trip.save()
+            with transaction.atomic():
+                trip.save()
+                if stop_breakdowns is not None:
+                    trip.stop_breakdowns.all().delete()
+                    TripStopBreakdown.objects.bulk_create(stop_breakdowns, batch_size=BULK_BATCH_SIZE)
             
             return JsonResponse({
                 'success': True,
@@ -1916,42 +1931,29 @@ def delete_trip(request, trip_id):
 
 @csrf_exempt
 def cancel_trip(request, trip_id):
-    """Cancel a trip"""
+    """Cancel a trip together with all its open bookings"""
     if request.method == 'POST':
         try:
-            data = json.loads(request.body.decode('utf-8'))
+            data = json.loads(request.body.decode('utf-8') or '{}')
             reason = data.get('reason', 'Cancelled by driver')
+            driver_id = data.get('driver_id')
+            if driver_id in (None, ''):
+                return JsonResponse({'success': False, 'error': 'driver_id is required'}, status=400)
             
-            trip = Trip.objects.get(trip_id=trip_id)
-            
-            # Check if trip can be cancelled
-            if not can_cancel_trip(trip):
-                return JsonResponse({
-                    'success': False, 
-                    'error': 'Trip cannot be cancelled. It may already be cancelled or completed.'
-                }, status=400)
-            
-            # Cancel the trip
-            trip.trip_status = 'CANCELLED'
-            trip.cancellation_reason = reason
-            trip.cancelled_at = timezone.now()
-            trip.save()
-            
-            # Cancel all confirmed bookings
-            confirmed_bookings = trip.trip_bookings.filter(booking_status='CONFIRMED')
-            for booking in confirmed_bookings:
-                booking.booking_status = 'CANCELLED'
-                booking.cancelled_at = timezone.now()
-                booking.save()
+            result = cancel_trip_with_bookings(trip_id, driver_id, reason=reason)
             
             return JsonResponse({
                 'success': True,
                 'message': 'Trip cancelled successfully',
-                'cancelled_bookings_count': confirmed_bookings.count(),
+                **result,
             })
             
         except Trip.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Trip not found'}, status=404)
+        except TripCancellationForbidden as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=403)
+        except TripCancellationError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=500)
     
@@ -1964,12 +1966,17 @@ def get_route_details(request, route_id):
     if request.method == 'GET':
         try:
             route = Route.objects.get(id=route_id)
+            try:
+                zoom = int(request.GET['zoom']) if request.GET.get('zoom') else None
+            except ValueError:
+                zoom = None
             route_data = {
                 'id': route.route_id,
                 'name': route.route_name,
                 'description': route.route_description,
                 'total_distance_km': float(route.total_distance_km) if route.total_distance_km else None,
                 'estimated_duration_minutes': route.estimated_duration_minutes,
+                'polyline': route.polyline_for_zoom(zoom),
                 'stops': [
                     {
                         'name': stop.stop_name,
@@ -1977,6 +1984,7 @@ def get_route_details(request, route_id):
                         'latitude': float(stop.latitude) if stop.latitude else None,
                         'longitude': float(stop.longitude) if stop.longitude else None,
                         'address': stop.address,
+                        'distance_from_start_km': float(stop.distance_from_start_km) if stop.distance_from_start_km is not None else None,
                         'estimated_time_from_start': stop.estimated_time_from_start,
                     }
                     for stop in route.route_stops.all().order_by('stop_order')
@@ -1995,19 +2003,23 @@ def get_route_statistics(request, route_id):
     """Get route statistics"""
     if request.method == 'GET':
         try:
-            route = Route.objects.get(id=route_id)
-            trips = Trip.objects.filter(route=route)
+            stats = RouteStatistics.for_route(route_id)
+            if stats is None:
+                return JsonResponse({'success': False, 'error': 'Route not found'}, status=404)
             
             statistics = {
-                'total_trips': trips.count(),
-                'completed_trips': trips.filter(trip_status='COMPLETED').count(),
-                'cancelled_trips': trips.filter(trip_status='CANCELLED').count(),
-                'total_bookings': sum(trip.trip_bookings.count() for trip in trips),
-                'total_revenue': float(sum(trip.base_fare for trip in trips if trip.base_fare)),
+                'total_trips': stats.total_trips,
+                'scheduled_trips': stats.scheduled_trips,
+                'in_progress_trips': stats.in_progress_trips,
+                'completed_trips': stats.completed_trips,
+                'cancelled_trips': stats.cancelled_trips,
+                'total_bookings': stats.total_bookings,
+                'confirmed_bookings': stats.confirmed_bookings,
+                'total_revenue': money_json(stats.trip_fare_total),
+                'booking_revenue': money_json(stats.booking_revenue),
+                'refreshed_at': stats.refreshed_at.isoformat() if stats.refreshed_at else None,
             }
             return JsonResponse({'success': True, 'statistics': statistics})
-        except Route.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'Route not found'}, status=404)
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=500)
     
@@ -2086,7 +2098,7 @@ def create_booking(request):
             
             # This is a placeholder - implement actual booking logic
             booking_data = {
-                'booking_id': f"B{random.randint(100, 999)}-{datetime.now().strftime('%Y-%m-%d-%H%M')}",
+                'booking_id': generate_booking_id(),
                 'success': True,
                 'message': 'Booking created successfully',
             }
@@ -0,0 +1,212 @@
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from datetime import datetime
+import json
+from .models import RecurringTripTemplate, Route, TripStopBreakdown, UsersData, Vehicle
+from .utils.money import Money
+from .utils.trip_templates import materialize_template, MATERIALIZE_HORIZON_DAYS
+from .views_rideposting import calculate_pakistan_fare, calculate_estimated_arrival
+
+WEEKDAY_CODES = {name: i for i, name in enumerate(RecurringTripTemplate.WEEKDAY_NAMES)}
+
+
+def _parse_weekdays(value):
+    """Accept [0, 1, 2] or ["MO", "TU"]; returns sorted unique ints or raises ValueError"""
+    if not isinstance(value, list) or not value:
+        raise ValueError('weekdays must be a non-empty list')
+    days = set()
+    for day in value:
+        if isinstance(day, str) and day.upper() in WEEKDAY_CODES:
+            days.add(WEEKDAY_CODES[day.upper()])
+        elif isinstance(day, int) and 0 <= day <= 6:
+            days.add(day)
+        else:
+            raise ValueError(f'Invalid weekday: {day}')
+    return sorted(days)
+
+
+def _serialize_template(t):
+    return {
+        'id': t.id,
+        'route_id': t.route.route_id if t.route_id else None,
+        'vehicle_id': t.vehicle_id,
+        'driver_id': t.driver_id,
+        'weekdays': t.weekdays,
+        'rrule': t.rrule,
+        'departure_time': t.departure_time.strftime('%H:%M'),
+        'start_date': t.start_date.isoformat(),
+        'end_date': t.end_date.isoformat() if t.end_date else None,
+        'total_seats': t.total_seats,
+        'base_fare': float(t.base_fare),
+        'custom_price': float(t.custom_price) if t.custom_price is not None else None,
+        'is_active': t.is_active,
+        'materialized_until': t.materialized_until.isoformat() if t.materialized_until else None,
+    }
+
+
+@csrf_exempt
+def trip_templates(request):
+    """
+    GET ?driver_id=: list a driver's recurring trip templates.
+    POST: create a template and generate its upcoming trips.
+
+    POST body: same fields as create_trip (route_id, vehicle_id, driver_id, departure_time,
+    total_seats, custom_price, stop_breakdown, notes, gender_preference, is_negotiable,
+    minimum_acceptable_fare) plus weekdays ([0-6] or ["MO", ...]), start_date, end_date and
+    materialize_days (default 14).
+    """
+    if request.method == 'GET':
+        try:
+            driver_id = int(request.GET.get('driver_id'))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'driver_id is required'}, status=400)
+        templates = RecurringTripTemplate.objects.filter(driver_id=driver_id).select_related('route').only(
+            'id', 'route__route_id', 'vehicle_id', 'driver_id', 'weekdays', 'departure_time', 'start_date',
+            'end_date', 'total_seats', 'base_fare', 'custom_price', 'is_active', 'materialized_until'
+        )
+        return JsonResponse({'success': True, 'templates': [_serialize_template(t) for t in templates]})
+
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only GET and POST allowed'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+        try:
+            weekdays = _parse_weekdays(data.get('weekdays'))
+            departure_time = datetime.strptime(data.get('departure_time') or '', '%H:%M').time()
+            start_date = (
+                datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+                if data.get('start_date') else datetime.now().date()
+            )
+            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date() if data.get('end_date') else None
+            total_seats = int(data.get('total_seats', 1))
+            materialize_days = int(data.get('materialize_days', MATERIALIZE_HORIZON_DAYS))
+        except (ValueError, TypeError) as e:
+            return JsonResponse({'success': False, 'error': f'Invalid schedule: {e}'}, status=400)
+        if end_date and end_date < start_date:
+            return JsonResponse({'success': False, 'error': 'end_date cannot be before start_date'}, status=400)
+        if total_seats < 1:
+            return JsonResponse({'success': False, 'error': 'total_seats must be at least 1'}, status=400)
+        stop_breakdown = data.get('stop_breakdown') or []
+        try:
+            TripStopBreakdown.build_from_payload(None, stop_breakdown)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': f'Invalid stop breakdown: {e}'}, status=400)
+
+        try:
+            route = Route.objects.only('id', 'route_id', 'route_name').get(route_id=data.get('route_id'))
+            vehicle = (
+                Vehicle.objects
+                .only('id', 'model_number', 'company_name', 'plate_number', 'vehicle_type', 'color', 'seats', 'fuel_type')
+                .get(id=data.get('vehicle_id'))
+            )
+            driver = UsersData.objects.only('id').get(id=data.get('driver_id'))
+        except (Route.DoesNotExist, Vehicle.DoesNotExist, UsersData.DoesNotExist, ValueError, TypeError):
+            return JsonResponse({'success': False, 'error': 'Route, vehicle or driver not found'}, status=404)
+        if vehicle.owner_id != driver.id:
+            return JsonResponse({'success': False, 'error': 'Vehicle does not belong to this driver'}, status=403)
+
+        # Quote for the first occurrence; materialize_template quotes each trip date
+        fare_data = calculate_pakistan_fare(route, vehicle, departure_time, total_seats, trip_date=start_date)
+        custom_price = None
+        if data.get('custom_price') is not None:
+            try:
+                custom_price = Money.parse(data['custom_price'])
+            except (TypeError, ValueError):
+                return JsonResponse({'success': False, 'error': 'Invalid custom_price'}, status=400)
+            fare_data['base_fare'] = custom_price.to_float()
+
+        with transaction.atomic():
+            template = RecurringTripTemplate.objects.create(
+                driver=driver,
+                route=route,
+                vehicle=vehicle,
+                weekdays=weekdays,
+                departure_time=departure_time,
+                estimated_arrival_time=calculate_estimated_arrival(departure_time, route),
+                start_date=start_date,
+                end_date=end_date,
+                total_seats=total_seats,
+                base_fare=fare_data['base_fare'],
+                custom_price=custom_price.to_decimal() if custom_price is not None else None,
+                total_distance_km=fare_data.get('total_distance_km'),
+                total_duration_minutes=fare_data.get('total_duration_minutes'),
+                fare_calculation=fare_data,
+                stop_breakdown=stop_breakdown,
+                notes=data.get('notes', ''),
+                gender_preference=data.get('gender_preference', 'Any'),
+                is_negotiable=data.get('is_negotiable', True),
+                minimum_acceptable_fare=data.get('minimum_acceptable_fare'),
+            )
+            trips = materialize_template(template.id, materialize_days)
+        template.refresh_from_db(fields=['materialized_until', 'base_fare'])
+
+        return JsonResponse({
+            'success': True,
+            'template': _serialize_template(template),
+            'created_trip_ids': [t.trip_id for t in trips],
+        }, status=201)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+def _get_driver_template(template_id, data):
+    template = RecurringTripTemplate.objects.select_related('route').get(id=template_id)
+    if str(template.driver_id) != str(data.get('driver_id')):
+        return template, JsonResponse({'success': False, 'error': 'Only the template owner can do this'}, status=403)
+    return template, None
+
+
+@csrf_exempt
+def materialize_trip_template(request, template_id):
+    """POST {"driver_id": 1, "days": 14}: generate any missing trips within the horizon"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST allowed'}, status=405)
+    try:
+        data = json.loads(request.body or '{}')
+        template, error = _get_driver_template(template_id, data)
+        if error:
+            return error
+        if not template.is_active:
+            return JsonResponse({'success': False, 'error': 'Template is not active'}, status=400)
+        try:
+            days = int(data.get('days', MATERIALIZE_HORIZON_DAYS))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'days must be an integer'}, status=400)
+        trips = materialize_template(template.id, days)
+        template.refresh_from_db(fields=['materialized_until'])
+        return JsonResponse({
+            'success': True,
+            'template': _serialize_template(template),
+            'created_trip_ids': [t.trip_id for t in trips],
+        })
+    except RecurringTripTemplate.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Template not found'}, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+def deactivate_trip_template(request, template_id):
+    """POST {"driver_id": 1}: stop generating trips; already generated trips are kept"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Only POST allowed'}, status=405)
+    try:
+        data = json.loads(request.body or '{}')
+        template, error = _get_driver_template(template_id, data)
+        if error:
+            return error
+        template.is_active = False
+        template.save(update_fields=['is_active', 'updated_at'])
+        return JsonResponse({'success': True, 'template': _serialize_template(template)})
+    except RecurringTripTemplate.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Template not found'}, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)